@@ -0,0 +1,54 @@
+import argparse
+import sys
+from metal.benchmark import (BenchmarkSuite, DEADLINE_MS, DEFAULT_RESOLUTIONS, compare, deadline_violations,
+                             format_report, load_report, save_report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de los métodos de preprocesado, detectores y pipeline completo.")
+    parser.add_argument("--config", help="Configuración JSON para el caso de extremo a extremo (por defecto, la predeterminada).")
+    parser.add_argument("--resolutions", nargs="+", default=list(DEFAULT_RESOLUTIONS),
+                        help="Resoluciones a evaluar: 200, 720p, 1080p, 4k, 8k o ALTOxANCHO.")
+    parser.add_argument("--cases", nargs="+", help="Patrones de casos a ejecutar (p. ej. 'preprocessing.*').")
+    parser.add_argument("--repeats", type=int, default=10, help="Repeticiones cronometradas por caso.")
+    parser.add_argument("--warmup", type=int, default=2, help="Ejecuciones de calentamiento por caso.")
+    parser.add_argument("--scratch-density", type=float, default=20.0, help="Rayones por megapíxel.")
+    parser.add_argument("--patch-density", type=float, default=20.0, help="Manchas por megapíxel.")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla de las placas sintéticas.")
+    parser.add_argument("--output", help="Guarda el informe en esta ruta (JSON).")
+    parser.add_argument("--baseline", help="Línea base con la que comparar los resultados.")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="Empeoramiento relativo de p50 a partir del cual se considera regresión.")
+    parser.add_argument("--deadline-ms", type=float, default=DEADLINE_MS,
+                        help="Tiempo máximo (p95) por imagen en los casos de extremo a extremo.")
+    parser.add_argument("--deadline-fatal", action="store_true",
+                        help="Termina con error si algún caso de extremo a extremo supera --deadline-ms.")
+
+    args = parser.parse_args()
+
+    suite = BenchmarkSuite(resolutions=args.resolutions, repeats=args.repeats, warmup=args.warmup,
+                           scratch_density=args.scratch_density, patch_density=args.patch_density,
+                           seed=args.seed, config_path=args.config, patterns=args.cases)
+    report = suite.run(progress=lambda key, stats: print(f"{key}: {stats.get('p50_ms', 0):.2f} ms",
+                                                         file=sys.stderr))
+    print(format_report(report))
+
+    if args.output:
+        save_report(report, args.output)
+
+    failed = False
+    for key in deadline_violations(report, args.deadline_ms):
+        failed = failed or args.deadline_fatal
+        print(f"deadline={key} p95={report['results'][key]['p95_ms']:.2f} ms > {args.deadline_ms:.0f} ms")
+
+    if args.baseline:
+        for regression in compare(report, load_report(args.baseline), args.threshold):
+            failed = True
+            print(f"regression={regression['case']} {regression['baseline']:.2f} ms -> "
+                  f"{regression['current']:.2f} ms (x{regression['ratio']:.2f})")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+package com.metalgroup;
+
+import java.awt.Rectangle;
+import java.io.*;
+import java.net.Socket;
+import java.nio.ByteBuffer;
+import java.nio.ByteOrder;
+import java.nio.charset.StandardCharsets;
+import java.util.ArrayList;
+import java.util.List;
+import java.util.Map;
+import java.util.concurrent.CompletableFuture;
+import java.util.concurrent.ConcurrentHashMap;
+import java.util.concurrent.TimeUnit;
+import java.util.concurrent.atomic.AtomicInteger;
+
+/**
+ * Cliente del modo servicio (python main.py --serve --port N --protocol binary).
+ * Mantiene una única conexión abierta y permite enviar muchas peticiones sin esperar
+ * a las respuestas; cada respuesta se asocia a su petición por el identificador.
+ */
+public class InspectionClient implements Closeable {
+    // Cabecera <IBI: identificador, tipo/estado, longitud de la carga
+    private static final int HEADER_SIZE = 9;
+    private static final byte KIND_PATH = 0;
+    private static final byte STATUS_OK = 0;
+    // Registro DETECTION_DTYPE empaquetado: px, py, width, height (int32), area, score, clase, origen
+    private static final int RECORD_SIZE = 31;
+    // Espera máxima de processImage por una respuesta
+    private static final long RESPONSE_TIMEOUT_SECONDS = 60;
+
+    private final Socket socket;
+    private final DataOutputStream output;
+    private final DataInputStream input;
+    private final Map<Integer, CompletableFuture<List<Rectangle>>> pending = new ConcurrentHashMap<>();
+    private final AtomicInteger nextId = new AtomicInteger();
+    private final Thread reader;
+    // Lo activa el hilo lector cuando la conexión se cierra: ya no llegarán más respuestas
+    private volatile IOException closedCause;
+
+    public InspectionClient(String host, int port) throws IOException {
+        socket = new Socket(host, port);
+        socket.setTcpNoDelay(true);
+        output = new DataOutputStream(new BufferedOutputStream(socket.getOutputStream()));
+        input = new DataInputStream(new BufferedInputStream(socket.getInputStream()));
+
+        reader = new Thread(this::readResponses, "inspection-client-reader");
+        reader.setDaemon(true);
+        reader.start();
+    }
+
+    public CompletableFuture<List<Rectangle>> submit(String imagePath) throws IOException {
+        int id = nextId.getAndIncrement();
+        byte[] payload = imagePath.getBytes(StandardCharsets.UTF_8);
+        CompletableFuture<List<Rectangle>> future = new CompletableFuture<>();
+        pending.put(id, future);
+
+        // Comprobar después de registrar la petición: si el lector ya ha vaciado pending, nadie la completaría
+        IOException cause = closedCause;
+        if (cause != null) {
+            pending.remove(id);
+            throw new IOException("Conexión con el servicio cerrada", cause);
+        }
+
+        ByteBuffer header = ByteBuffer.allocate(HEADER_SIZE).order(ByteOrder.LITTLE_ENDIAN);
+        header.putInt(id).put(KIND_PATH).putInt(payload.length);
+        try {
+            synchronized (output) {
+                output.write(header.array());
+                output.write(payload);
+                output.flush();
+            }
+        } catch (IOException e) {
+            // La petición no se ha enviado: no habrá respuesta para ella
+            pending.remove(id);
+            throw e;
+        }
+        return future;
+    }
+
+    public List<Rectangle> processImage(String imagePath) throws Exception {
+        return submit(imagePath).get(RESPONSE_TIMEOUT_SECONDS, TimeUnit.SECONDS);
+    }
+
+    private void readResponses() {
+        byte[] headerBytes = new byte[HEADER_SIZE];
+        try {
+            while (true) {
+                input.readFully(headerBytes);
+                ByteBuffer header = ByteBuffer.wrap(headerBytes).order(ByteOrder.LITTLE_ENDIAN);
+                int id = header.getInt();
+                byte status = header.get();
+                byte[] payload = new byte[header.getInt()];
+                input.readFully(payload);
+
+                CompletableFuture<List<Rectangle>> future = pending.remove(id);
+                if (future == null) continue;
+
+                if (status == STATUS_OK) {
+                    future.complete(parseRecords(payload));
+                } else {
+                    future.completeExceptionally(new IOException(new String(payload, StandardCharsets.UTF_8)));
+                }
+            }
+        } catch (IOException e) {
+            // Conexión cerrada: las peticiones pendientes y las siguientes no tendrán respuesta
+            closedCause = e;
+            for (Integer id : pending.keySet()) {
+                CompletableFuture<List<Rectangle>> future = pending.remove(id);
+                if (future != null) {
+                    future.completeExceptionally(e);
+                }
+            }
+        }
+    }
+
+    private static List<Rectangle> parseRecords(byte[] payload) {
+        List<Rectangle> rectangles = new ArrayList<>();
+        ByteBuffer records = ByteBuffer.wrap(payload).order(ByteOrder.LITTLE_ENDIAN);
+
+        for (int offset = 0; offset + RECORD_SIZE <= payload.length; offset += RECORD_SIZE) {
+            rectangles.add(new Rectangle(records.getInt(offset), records.getInt(offset + 4),
+                    records.getInt(offset + 8), records.getInt(offset + 12)));
+        }
+        return rectangles;
+    }
+
+    @Override
+    public void close() throws IOException {
+        socket.close();
+    }
+}
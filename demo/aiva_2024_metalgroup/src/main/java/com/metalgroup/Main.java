@@ -11,11 +11,19 @@ import org.apache.commons.csv.*;
 
 public class Main {
     private static final double IOU_THRESHOLD = 0.75;
+    // Con METAL_PORT se usa el modo servicio ya arrancado en lugar de un contenedor por imagen
+    private static InspectionClient client;
 
     public static void main(String[] args) throws Exception {
         List<DetectionResult> results = new ArrayList<>();
         File datasetDir = new File("dataset");
 
+        String port = System.getenv("METAL_PORT");
+        if (port != null) {
+            client = new InspectionClient(System.getenv().getOrDefault("METAL_HOST", "127.0.0.1"),
+                    Integer.parseInt(port));
+        }
+
         ExecutorService executor = Executors.newFixedThreadPool(Runtime.getRuntime().availableProcessors());
         List<Future<DetectionResult>> futures = new ArrayList<>();
 
@@ -29,6 +37,9 @@ public class Main {
 
         executor.shutdown();
         executor.awaitTermination(1, TimeUnit.HOURS);
+        if (client != null) {
+            client.close();
+        }
 
         Map<String, Double> globalMetrics = MetricsCalculator.calculateGlobalMetrics(results);
         generateReports(results, globalMetrics);
@@ -52,7 +63,9 @@ public class Main {
         long startTime = System.nanoTime();
 
         try {
-            List<Rectangle> predictions = DockerExecutor.processImage(imageFile.getAbsolutePath());
+            List<Rectangle> predictions = client != null
+                    ? client.processImage(imageFile.getAbsolutePath())
+                    : DockerExecutor.processImage(imageFile.getAbsolutePath());
             File xmlFile = new File(imageFile.getAbsolutePath().replace(".jpg", ".xml"));
             List<Rectangle> groundTruth = XmlParser.parseGroundTruth(xmlFile);
 
@@ -0,0 +1,41 @@
+import argparse
+import json
+import sys
+from metal.benchmark import DEADLINE_MS
+from metal.evaluation import Evaluator, IOU_THRESHOLD, calibrate_gate, format_report, save_report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluación de precisión (F1) y latencia sobre un conjunto anotado.")
+    parser.add_argument("--config", required=True, help="Ruta al archivo de configuración JSON.")
+    parser.add_argument("--dataset", required=True,
+                        help="Directorio con las imágenes y sus anotaciones Pascal VOC (.xml con el mismo nombre).")
+    parser.add_argument("--workers", type=int, default=None, help="Número de procesos (por defecto, uno por núcleo).")
+    parser.add_argument("--iou", type=float, default=IOU_THRESHOLD, help="Umbral de IoU para contar un acierto.")
+    parser.add_argument("--deadline-ms", type=float, default=DEADLINE_MS, help="Tiempo máximo por imagen.")
+    parser.add_argument("--output", help="Guarda el informe completo (con el detalle por imagen) en esta ruta (JSON).")
+    parser.add_argument("--calibrate-gate", type=float, metavar="FNR",
+                        help="En lugar de evaluar, calibra los umbrales de la sección gate para una tasa "
+                             "máxima de falsos negativos (p. ej. 0.01) y muestra el resultado.")
+
+    args = parser.parse_args()
+
+    if args.calibrate_gate is not None:
+        report = calibrate_gate(args.config, Evaluator.list_images(args.dataset), args.calibrate_gate)
+        print(json.dumps(report, indent=2))
+        if args.output:
+            save_report(report, args.output)
+        sys.exit(0)
+
+    evaluator = Evaluator(args.config, workers=args.workers, iou_threshold=args.iou, deadline_ms=args.deadline_ms)
+    report = evaluator.evaluate_directory(args.dataset)
+    print(format_report(report))
+
+    if args.output:
+        save_report(report, args.output)
+
+    sys.exit(1 if report["images"] == 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
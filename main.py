@@ -1,5 +1,11 @@
 import argparse
+import sys
+from metal.batch import BatchManager
 from metal.manager import MainManager
+from metal.output import FORMATS, create_writer
+from metal.profiling import Profiler
+from metal.service import InspectionService
+from metal.tiling import TiledInspector, open_scan
 import cv2
 
 def dibujar_rectangulos_y_guardar(imagen_path, objetos, salida_path):
@@ -27,18 +33,83 @@ def dibujar_rectangulos_y_guardar(imagen_path, objetos, salida_path):
     print(f"Imagen guardada en: {salida_path}")
 
 
+def save_profile(manager, path):
+    """Guarda las métricas por etapa si se pidió con --profile"""
+    if path and manager.profiler is not None:
+        manager.profiler.save(path)
+
+
 def main():
     parser = argparse.ArgumentParser(description="Sistema de análisis de imágenes para detectar imperfecciones.")
     parser.add_argument("--config", required=True, help="Ruta al archivo de configuración JSON.")
-    parser.add_argument("--image", required=True, help="Ruta a la imagen a analizar.")
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument("--image", help="Ruta a la imagen a analizar.")
+    mode.add_argument("--image-dir", help="Directorio de imágenes a analizar en lote.")
+    mode.add_argument("--serve", action="store_true",
+                      help="Modo servicio: carga los pipelines una vez y procesa las imágenes recibidas.")
+    parser.add_argument("--socket", help="Ruta del socket Unix en modo servicio (por defecto stdin/stdout).")
+    parser.add_argument("--port", type=int, default=None,
+                        help="Puerto TCP en modo servicio (solo conexiones locales salvo que se indique --host).")
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección en la que escucha el servicio TCP.")
+    parser.add_argument("--protocol", choices=("text", "ndjson", "binary"), default="text",
+                        help="Protocolo del modo servicio: líneas de texto, NDJSON o tramas binarias.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Número de procesos en modo lote (por defecto, uno por núcleo).")
+    parser.add_argument("--tile-size", type=int, default=None,
+                        help="Procesa --image por teselas solapadas de este tamaño (escaneos de gran resolución).")
+    parser.add_argument("--format", choices=FORMATS, default="text",
+                        help="Formato de salida en los modos --image e --image-dir: text (x=..., y=...), "
+                             "jsonl (un objeto JSON por imagen) o binary (registros empaquetados).")
+    parser.add_argument("--profile",
+                        help="Guarda las métricas por etapa en esta ruta (JSON, o Prometheus si termina en .prom). "
+                             "Solo en los modos --image y --serve.")
 
     args = parser.parse_args()
+    if args.profile and args.image_dir:
+        # Cada trabajador del lote tiene su propio manager: no hay un profiler común que guardar
+        parser.error("--profile no está disponible con --image-dir")
+
+    # --profile activa la instrumentación aunque la configuración no lo haga
+    profiler = Profiler() if args.profile else None
+
+    if args.serve:
+        manager = MainManager(config_path=args.config, profiler=profiler)
+        service = InspectionService(manager, protocol=args.protocol)
+        try:
+            if args.socket:
+                service.serve_socket(args.socket)
+            elif args.port is not None:
+                service.serve_tcp(args.port, args.host)
+            elif service.protocol.binary:
+                service.serve_stream(sys.stdin.buffer, sys.stdout.buffer)
+            else:
+                service.serve_stream(sys.stdin, sys.stdout)
+        finally:
+            service.close()
+            save_profile(manager, args.profile)
+        return
+
+    if args.image_dir:
+        batch = BatchManager(config_path=args.config, workers=args.workers)
+        writer = create_writer(args.format, sys.stdout, batch=True)
+        for image_path, detections in batch.run_directory(args.image_dir):
+            writer.write(detections, image_path)
+        sys.stdout.flush()
+        return
+
+    with MainManager(config_path=args.config, image_path=args.image, profiler=profiler) as manager:
+        if args.tile_size:
+            detections = TiledInspector(manager, tile_size=args.tile_size).inspect(open_scan(args.image))
+        elif args.format == "text":
+            detections = manager.start()
+        else:
+            # Los formatos estructurados conservan la clase de defecto y la puntuación
+            detections = manager.inspect_source(args.image, array=True)
 
-    manager = MainManager(config_path=args.config, image_path=args.image)
-    detections = manager.start()
+    create_writer(args.format, sys.stdout).write(detections, args.image)
+    sys.stdout.flush()
 
-    for detection in detections:
-        print(f"x={detection.px}, y={detection.py}, w={detection.width}, h={detection.height}")
+    save_profile(manager, args.profile)
 
     #dibujar_rectangulos_y_guardar(args.image, detections, "output.jpg")
 
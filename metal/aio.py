@@ -0,0 +1,184 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing import util
+
+from metal.manager import MainManager
+
+# Manager propio de cada hilo o proceso trabajador (se construye una vez en el inicializador)
+_local = threading.local()
+
+
+def _init_worker(config):
+    _local.manager = MainManager(config).load()
+
+
+def _init_process(config):
+    """Inicializador de los procesos del pool: el manager se libera al terminar el proceso"""
+    _init_worker(config)
+    util.Finalize(_local.manager, _local.manager.close, exitpriority=10)
+
+
+def _inspect_source(source):
+    """Inspecciona una imagen (array, bytes codificados o ruta) dentro del trabajador"""
+    return _local.manager.inspect_source(source, array=True)
+
+
+class Overloaded(RuntimeError):
+    """La cola de peticiones pendientes está llena: el llamante debe descartar o reintentar"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """La petición se descartó sin procesarla porque no iba a terminar antes de su plazo"""
+
+
+class AsyncInspector:
+    """
+    Punto de entrada asyncio para varias fuentes concurrentes (p. ej. varias cámaras):
+
+        async with AsyncInspector(config, workers=4, deadline=0.2) as inspector:
+            detections = await inspector.inspect(frame)     # DetectionSet
+
+    Las inspecciones se ejecutan en un pool de hilos (``executor="thread"``, OpenCV libera el
+    GIL) o de procesos (``"process"``); cada trabajador construye sus pipelines una sola vez.
+
+    - Como mucho ``max_in_flight`` imágenes se procesan a la vez; el resto espera turno.
+    - Si ya esperan ``max_queue`` peticiones, ``inspect`` lanza ``Overloaded`` de inmediato en
+      lugar de acumular fotogramas que llegarían tarde.
+    - Con un plazo (``deadline`` en segundos, global o por petición) una petición se descarta con
+      ``DeadlineExceeded`` si vence mientras espera o si el tiempo que le queda es menor que la
+      latencia media reciente de una inspección. Una vez iniciada, siempre se completa.
+    - ``close`` deja de aceptar peticiones, espera a que terminen las pendientes y cierra el pool.
+    """
+
+    def __init__(self, config=None, executor="thread", workers=None, max_in_flight=None,
+                 max_queue=64, deadline=None):
+        self.config = config if config is not None else {}
+        self.workers = workers or os.cpu_count() or 1
+        self.max_in_flight = max_in_flight or self.workers
+        self.max_queue = max_queue
+        self.deadline = deadline
+
+        if executor == "process":
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_process,
+                                                initargs=(self.config,))
+        elif executor == "thread":
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, initializer=self._init_thread)
+        else:
+            raise ValueError(f"Tipo de ejecutor desconocido: {executor}")
+
+        # Managers de los hilos trabajadores, para liberarlos al cerrar
+        self._managers = []
+        self._managers_lock = threading.Lock()
+
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self._waiting = 0
+        self._active = 0
+        self._closing = False
+
+        # Latencia media de una inspección (media móvil exponencial, en segundos)
+        self.service_time = None
+        self.counters = {"submitted": 0, "completed": 0, "failed": 0, "dropped": 0, "rejected": 0}
+
+    def _init_thread(self):
+        _init_worker(self.config)
+        with self._managers_lock:
+            self._managers.append(_local.manager)
+
+    @property
+    def queue_depth(self):
+        """Peticiones esperando un hueco de ejecución"""
+        return self._waiting
+
+    @property
+    def in_flight(self):
+        return self._active - self._waiting
+
+    def stats(self):
+        return {**self.counters, "queue_depth": self.queue_depth, "in_flight": self.in_flight,
+                "service_ms": None if self.service_time is None else self.service_time * 1e3}
+
+    async def inspect(self, image, deadline=None):
+        """
+        Inspecciona una imagen (array, bytes codificados o ruta) y devuelve un DetectionSet.
+
+        :param deadline: plazo en segundos desde la llamada; por defecto el del inspector.
+        """
+        if self._closing:
+            raise RuntimeError("El inspector se está cerrando")
+        if self._waiting >= self.max_queue:
+            self.counters["rejected"] += 1
+            raise Overloaded(f"{self._waiting} peticiones en espera")
+
+        loop = asyncio.get_running_loop()
+        budget = deadline if deadline is not None else self.deadline
+        expires = None if budget is None else loop.time() + budget
+
+        self.counters["submitted"] += 1
+        self._active += 1
+        self._drained.clear()
+        try:
+            await self._acquire(loop, expires)
+            try:
+                if expires is not None and self.service_time is not None \
+                        and loop.time() + self.service_time > expires:
+                    self.counters["dropped"] += 1
+                    raise DeadlineExceeded("No queda tiempo suficiente para procesar la imagen")
+
+                started = loop.time()
+                try:
+                    detections = await loop.run_in_executor(self.executor, _inspect_source, image)
+                except Exception:
+                    self.counters["failed"] += 1
+                    raise
+                self._observe(loop.time() - started)
+                self.counters["completed"] += 1
+                return detections
+            finally:
+                self._slots.release()
+        finally:
+            self._active -= 1
+            if self._active == 0:
+                self._drained.set()
+
+    async def _acquire(self, loop, expires):
+        """Espera un hueco de ejecución, como mucho hasta el plazo de la petición"""
+        self._waiting += 1
+        try:
+            if expires is None:
+                await self._slots.acquire()
+                return
+            try:
+                await asyncio.wait_for(self._slots.acquire(), max(expires - loop.time(), 0))
+            except asyncio.TimeoutError:
+                self.counters["dropped"] += 1
+                raise DeadlineExceeded("El plazo venció esperando turno") from None
+        finally:
+            self._waiting -= 1
+
+    def _observe(self, seconds, alpha=0.2):
+        if self.service_time is None:
+            self.service_time = seconds
+        else:
+            self.service_time += alpha * (seconds - self.service_time)
+
+    async def close(self):
+        """Deja de aceptar peticiones, espera a las pendientes y libera los trabajadores"""
+        self._closing = True
+        await self._drained.wait()
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self.executor.shutdown)
+        with self._managers_lock:
+            for manager in self._managers:
+                manager.close()
+            self._managers.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
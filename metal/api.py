@@ -0,0 +1,64 @@
+import numpy as np
+
+from metal.detection import DETECTION_DTYPE
+from metal.manager import MainManager
+
+# Registro de un lote: las columnas de DETECTION_DTYPE más el índice de la imagen en el lote
+BATCH_DTYPE = np.dtype([("image", np.int32)] + DETECTION_DTYPE.descr)
+
+
+class Pipeline:
+    """
+    API en proceso. Los pipelines se construyen una sola vez a partir de un diccionario de
+    configuración (o de la ruta a un JSON) y se aplican directamente a imágenes en memoria, sin
+    pasar por disco ni por la salida de texto de ``main.py``.
+
+        pipeline = Pipeline({"defect_type": "auto"})
+        detections = pipeline.detect(frame)        # DetectionSet
+        detections.records                         # array estructurado (DETECTION_DTYPE)
+
+    Las detecciones no incluyen la detección vacía de relleno: una placa sin defectos devuelve
+    un DetectionSet vacío. Las coordenadas son siempre las de la imagen recibida.
+    """
+
+    def __init__(self, config=None, profiler=None):
+        self.manager = MainManager(config if config is not None else {}, profiler=profiler).load()
+
+    def detect(self, image):
+        """Inspecciona una imagen (array, bytes codificados o ruta) y devuelve un DetectionSet"""
+        return self.manager.inspect_source(image, array=True)
+
+    __call__ = detect
+
+    def detect_batch(self, images):
+        """
+        Inspecciona una secuencia de imágenes (o un array apilado (N, H, W[, C])) y devuelve
+        un DetectionSet por imagen, en el mismo orden.
+        """
+        return [self.detect(image) for image in images]
+
+    def detect_batch_array(self, images):
+        """Igual que ``detect_batch`` pero con todas las detecciones en un único array ``BATCH_DTYPE``"""
+        return batch_records(self.detect_batch(images))
+
+    def close(self):
+        self.manager.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def batch_records(detection_sets):
+    """Une los DetectionSet de un lote en un array ``BATCH_DTYPE`` con el índice de cada imagen"""
+    records = np.zeros(sum(len(s) for s in detection_sets), dtype=BATCH_DTYPE)
+    start = 0
+    for index, detections in enumerate(detection_sets):
+        end = start + len(detections)
+        records["image"][start:end] = index
+        for name in DETECTION_DTYPE.names:
+            records[name][start:end] = detections.records[name]
+        start = end
+    return records
@@ -0,0 +1,105 @@
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import util
+
+from metal.detection import DetectionSet
+from metal.manager import MainManager
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff")
+
+# Manager propio de cada proceso trabajador (se construye una vez en el inicializador)
+_worker_manager = None
+
+
+def _init_worker(config_path):
+    """Inicializador de cada proceso: construye los pipelines una única vez"""
+    global _worker_manager
+    _worker_manager = MainManager(config_path).load()
+
+
+def _init_process(config_path):
+    """Inicializador de los procesos del pool: el manager se libera al terminar el proceso"""
+    _init_worker(config_path)
+    util.Finalize(_worker_manager, _worker_manager.close, exitpriority=10)
+
+
+def _close_worker():
+    """Libera el manager construido con ``_init_worker`` en el propio proceso"""
+    global _worker_manager
+    if _worker_manager is not None:
+        _worker_manager.close()
+        _worker_manager = None
+
+
+def _inspect_path(image_path):
+    """
+    Procesa una imagen dentro del trabajador. La imagen se decodifica en el propio proceso
+    y solo se devuelven los registros de las detecciones (coordenadas, clase y puntuación),
+    de modo que nunca se envían píxeles al padre.
+    """
+    try:
+        return _worker_manager.inspect_source(image_path, array=True).records, None
+    except Exception as e:
+        return None, str(e)
+
+
+def _inspect_loaded(image):
+    """Procesa una imagen ya decodificada (o la excepción producida al leerla)"""
+    try:
+        if isinstance(image, Exception):
+            raise image
+        return _worker_manager.loader.scale_results(_worker_manager.inspect_array(image)).records, None
+    except Exception as e:
+        return None, str(e)
+
+
+class BatchManager:
+    def __init__(self, config_path, workers=None, prefetch=4):
+        self.config_path = config_path
+        self.workers = workers or os.cpu_count() or 1
+        self.prefetch = prefetch
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def list_images(image_dir):
+        """Devuelve las imágenes de un directorio ordenadas por nombre"""
+        names = sorted(n for n in os.listdir(image_dir) if n.lower().endswith(IMAGE_EXTENSIONS))
+        return [os.path.join(image_dir, n) for n in names]
+
+    def run(self, image_paths):
+        """
+        Procesa una lista de imágenes y devuelve una lista de (ruta, DetectionSet) en el mismo
+        orden de entrada. Las imágenes que no se pueden procesar devuelven detecciones None.
+        """
+        image_paths = list(image_paths)
+
+        if self.workers == 1:
+            # En el propio proceso se decodifica la siguiente imagen mientras se procesa la actual
+            _init_worker(self.config_path)
+            try:
+                images = _worker_manager.loader.prefetch(image_paths, depth=self.prefetch)
+                outputs = (_inspect_loaded(image) for _, image in images)
+                return self._collect(image_paths, outputs)
+            finally:
+                _close_worker()
+
+        # Repartir en bloques para amortizar la comunicación entre procesos
+        chunksize = max(1, len(image_paths) // (self.workers * 4))
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_process,
+                                 initargs=(self.config_path,)) as executor:
+            outputs = executor.map(_inspect_path, image_paths, chunksize=chunksize)
+            return self._collect(image_paths, outputs)
+
+    def run_directory(self, image_dir):
+        return self.run(self.list_images(image_dir))
+
+    def _collect(self, image_paths, outputs):
+        results = []
+        for image_path, (records, error) in zip(image_paths, outputs):
+            if error is not None:
+                self.logger.error(f"Error procesando {image_path}: {error}")
+                results.append((image_path, None))
+            else:
+                results.append((image_path, DetectionSet(records)))
+        return results
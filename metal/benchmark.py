@@ -0,0 +1,313 @@
+import fnmatch
+import inspect
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from metal import detection, preprocessing
+from metal.manager import MainManager
+
+# Resoluciones (alto, ancho) de las placas sintéticas
+RESOLUTIONS = {
+    "200": (200, 200),
+    "720p": (720, 1280),
+    "1080p": (1080, 1920),
+    "4k": (2160, 3840),
+    "8k": (4320, 7680),
+}
+DEFAULT_RESOLUTIONS = ("200", "1080p", "4k")
+
+# Requisito del proyecto: el 95 % de las imágenes en menos de 200 ms
+DEADLINE_MS = 200
+
+
+class SyntheticPlate:
+    """Placa sintética: imagen en gris, máscara binaria de los defectos y cajas (x, y, w, h)"""
+
+    def __init__(self, image, mask, boxes, classes):
+        self.image = image
+        self.mask = mask
+        self.boxes = boxes
+        self.classes = classes
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+
+def synthetic_plate(height, width, scratch_density=20.0, patch_density=20.0, seed=0):
+    """
+    Genera una placa metálica sintética con textura de laminado, rayones claros y manchas oscuras.
+
+    Las densidades se expresan en defectos por megapíxel (al menos uno de cada tipo si la densidad
+    es positiva), de modo que la carga de defectos es comparable entre resoluciones.
+    """
+    rng = np.random.default_rng(seed)
+    megapixels = height * width / 1e6
+
+    # Textura de laminado: bandas horizontales suaves más ruido
+    rows = cv2.GaussianBlur(rng.normal(0, 8, (height, 1)).astype(np.float32), (1, 0), 5)
+    plate = np.full((height, width), 120, dtype=np.float32)
+    plate += rows
+    plate += rng.normal(0, 5, (height, width)).astype(np.float32)
+
+    mask = np.zeros((height, width), dtype=np.uint8)
+    boxes = []
+    classes = []
+    scale = min(height, width)
+
+    n_scratches = max(1, round(scratch_density * megapixels)) if scratch_density > 0 else 0
+    for _ in range(n_scratches):
+        length = rng.uniform(0.15, 0.5) * scale
+        angle = rng.uniform(0, np.pi)
+        thickness = int(rng.integers(1, 4))
+        x0, y0 = rng.uniform(0, width), rng.uniform(0, height)
+        x1 = int(np.clip(x0 + length * np.cos(angle), 0, width - 1))
+        y1 = int(np.clip(y0 + length * np.sin(angle), 0, height - 1))
+        x0, y0 = int(x0), int(y0)
+
+        cv2.line(plate, (x0, y0), (x1, y1), float(rng.uniform(190, 230)), thickness)
+        cv2.line(mask, (x0, y0), (x1, y1), 255, thickness)
+
+        margin = thickness // 2 + 1
+        bx, by = max(min(x0, x1) - margin, 0), max(min(y0, y1) - margin, 0)
+        boxes.append((bx, by, min(max(x0, x1) + margin, width - 1) - bx + 1,
+                      min(max(y0, y1) + margin, height - 1) - by + 1))
+        classes.append(detection.DEFECT_SCRATCH)
+
+    n_patches = max(1, round(patch_density * megapixels)) if patch_density > 0 else 0
+    for _ in range(n_patches):
+        axes = (int(rng.uniform(0.02, 0.08) * scale) + 4, int(rng.uniform(0.02, 0.08) * scale) + 4)
+        center = (int(rng.uniform(0, width)), int(rng.uniform(0, height)))
+        angle = int(rng.integers(0, 180))
+
+        cv2.ellipse(plate, center, axes, angle, 0, 360, float(rng.uniform(40, 70)), -1)
+        cv2.ellipse(mask, center, axes, angle, 0, 360, 255, -1)
+
+        x, y, w, h = cv2.boundingRect(cv2.ellipse2Poly(center, axes, angle, 0, 360, 5))
+        x0, y0 = max(x, 0), max(y, 0)
+        boxes.append((x0, y0, min(x + w, width) - x0, min(y + h, height) - y0))
+        classes.append(detection.DEFECT_PATCH)
+
+    image = np.clip(plate, 0, 255).astype(np.uint8)
+    return SyntheticPlate(image, mask, np.array(boxes, dtype=np.int32).reshape(-1, 4),
+                          np.array(classes, dtype=np.int8))
+
+
+def concrete_subclasses(module, base):
+    """Clases instanciables de un módulo que heredan de ``base``"""
+    return [cls for _, cls in inspect.getmembers(module, inspect.isclass)
+            if issubclass(cls, base) and cls is not base and cls.__module__ == module.__name__
+            and not inspect.isabstract(cls)]
+
+
+def default_cases(config_path=None):
+    """
+    Casos del benchmark: todos los métodos de preprocesado (sobre la placa en gris), todos los
+    detectores (sobre la máscara binaria de defectos) y ``MainManager.start`` de extremo a extremo.
+
+    Cada caso es un par (nombre, fábrica); la fábrica recibe la placa y el directorio temporal
+    de la ejecución y devuelve la función sin argumentos que se cronometra.
+    """
+    cases = []
+
+    for cls in concrete_subclasses(preprocessing, preprocessing.PreprocessingMethod):
+        if issubclass(cls, preprocessing.PlanStep):
+            # Los pasos combinados solo existen dentro de un plan compilado
+            continue
+
+        def make(plate, workdir, cls=cls):
+            method = cls()
+            return lambda: method.process(plate.image)
+        cases.append((f"preprocessing.{cls.__name__}", make))
+
+    for cls in concrete_subclasses(detection, detection.DetectionMethod):
+        def make(plate, workdir, cls=cls):
+            if cls is detection.MultiDefectDetectionMethod:
+                method = cls(detection.ScratchDetectionMethod(),
+                             detection.EnhancedConnectedComponentsDetectionMethod())
+            else:
+                method = cls()
+            return lambda: method.detect(plate.mask)
+        cases.append((f"detection.{cls.__name__}", make))
+
+    def make_pipeline(plate, workdir):
+        # La placa se guarda en disco para incluir la lectura de la imagen, como en main.py
+        image_path = os.path.join(workdir, f"plate_{plate.shape[0]}x{plate.shape[1]}.png")
+        cv2.imwrite(image_path, cv2.cvtColor(plate.image, cv2.COLOR_GRAY2BGR))
+        manager = MainManager(config_path, image_path).load()
+
+        def run():
+            return manager.start()
+        run.close = manager.close
+        return run
+    cases.append(("pipeline.MainManager.start", make_pipeline))
+
+    return cases
+
+
+def measure(function, repeats=10, warmup=2, trace_memory=True):
+    """Cronometra ``function`` y devuelve latencias, rendimiento y pico de memoria"""
+    for _ in range(warmup):
+        function()
+
+    latencies = np.empty(repeats, dtype=np.float64)
+    for i in range(repeats):
+        start = time.perf_counter()
+        function()
+        latencies[i] = time.perf_counter() - start
+
+    stats = {
+        "repeats": repeats,
+        "mean_ms": 1000 * float(latencies.mean()),
+        "p50_ms": 1000 * float(np.percentile(latencies, 50)),
+        "p95_ms": 1000 * float(np.percentile(latencies, 95)),
+        "p99_ms": 1000 * float(np.percentile(latencies, 99)),
+        "max_ms": 1000 * float(latencies.max()),
+        "throughput_ips": float(repeats / latencies.sum()) if latencies.sum() > 0 else float("inf"),
+    }
+
+    # El pico de memoria se mide en una ejecución aparte para no alterar los tiempos.
+    # tracemalloc solo ve las reservas hechas desde Python/NumPy, no las internas de OpenCV.
+    if trace_memory:
+        was_tracing = tracemalloc.is_tracing()
+        if not was_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        function()
+        stats["peak_bytes"] = max(tracemalloc.get_traced_memory()[1] - baseline, 0)
+        if not was_tracing:
+            tracemalloc.stop()
+
+    return stats
+
+
+class BenchmarkSuite:
+    def __init__(self, resolutions=DEFAULT_RESOLUTIONS, repeats=10, warmup=2, scratch_density=20.0,
+                 patch_density=20.0, seed=0, config_path=None, patterns=None, trace_memory=True):
+        self.resolutions = list(resolutions)
+        self.repeats = repeats
+        self.warmup = warmup
+        self.scratch_density = scratch_density
+        self.patch_density = patch_density
+        self.seed = seed
+        self.config_path = config_path
+        self.patterns = patterns
+        self.trace_memory = trace_memory
+
+    def cases(self):
+        """Casos seleccionados por los patrones (estilo fnmatch) o todos si no hay patrones"""
+        cases = default_cases(self.config_path)
+        if not self.patterns:
+            return cases
+        return [(name, make) for name, make in cases
+                if any(fnmatch.fnmatch(name, pattern) for pattern in self.patterns)]
+
+    def metadata(self):
+        return {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+            "cpu_count": os.cpu_count(),
+            "opencv_threads": cv2.getNumThreads(),
+            "repeats": self.repeats,
+            "warmup": self.warmup,
+            "scratch_density": self.scratch_density,
+            "patch_density": self.patch_density,
+            "seed": self.seed,
+            "config": self.config_path,
+        }
+
+    def run(self, progress=None):
+        """Ejecuta todos los casos en todas las resoluciones y devuelve el informe"""
+        results = {}
+        cases = self.cases()
+
+        with tempfile.TemporaryDirectory() as workdir:
+            for resolution in self.resolutions:
+                height, width = RESOLUTIONS.get(resolution) or parse_resolution(resolution)
+                plate = synthetic_plate(height, width, self.scratch_density, self.patch_density, self.seed)
+
+                for name, make in cases:
+                    key = f"{name}@{resolution}"
+                    function = None
+                    try:
+                        function = make(plate, workdir)
+                        stats = measure(function, self.repeats, self.warmup, self.trace_memory)
+                    except Exception as e:
+                        stats = {"error": str(e)}
+                    else:
+                        stats["megapixels_per_s"] = stats["throughput_ips"] * height * width / 1e6
+                    finally:
+                        # Los casos que reservan recursos (hilos de las ramas) los liberan con close
+                        close = getattr(function, "close", None)
+                        if close is not None:
+                            close()
+                    results[key] = stats
+
+                    if progress is not None:
+                        progress(key, stats)
+
+        return {"metadata": self.metadata(), "results": results}
+
+
+def parse_resolution(text):
+    """Convierte ``ALTOxANCHO`` en una tupla (alto, ancho)"""
+    height, width = text.lower().split("x")
+    return int(height), int(width)
+
+
+def save_report(report, path):
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+
+
+def load_report(path):
+    with open(path) as file:
+        return json.load(file)
+
+
+def compare(report, baseline, threshold=0.10, metric="p50_ms"):
+    """
+    Compara un informe con una línea base. Devuelve las regresiones: casos presentes en ambos
+    cuya métrica empeora más de ``threshold`` (fracción) respecto a la línea base.
+    """
+    regressions = []
+    for key, stats in report["results"].items():
+        reference = baseline["results"].get(key)
+        if reference is None or metric not in stats or metric not in reference or reference[metric] <= 0:
+            continue
+        ratio = stats[metric] / reference[metric]
+        if ratio > 1 + threshold:
+            regressions.append({"case": key, "baseline": reference[metric], "current": stats[metric],
+                                "ratio": ratio})
+    return sorted(regressions, key=lambda r: r["ratio"], reverse=True)
+
+
+def deadline_violations(report, deadline_ms=DEADLINE_MS, pattern="pipeline.*", metric="p95_ms"):
+    """Casos de extremo a extremo cuyo p95 supera el tiempo máximo por imagen"""
+    return [key for key, stats in report["results"].items()
+            if fnmatch.fnmatch(key, pattern) and stats.get(metric, 0) > deadline_ms]
+
+
+def format_report(report):
+    """Tabla de texto con una línea por caso"""
+    lines = [f"{'caso':<70} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'img/s':>9} {'MP/s':>9} {'pico MB':>8}"]
+    for key, stats in report["results"].items():
+        if "error" in stats:
+            lines.append(f"{key:<70} error={stats['error']}")
+            continue
+        peak = stats.get("peak_bytes")
+        lines.append(f"{key:<70} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f} "
+                     f"{stats['throughput_ips']:>9.1f} {stats['megapixels_per_s']:>9.1f} "
+                     f"{(peak / 2 ** 20 if peak is not None else float('nan')):>8.1f}")
+    return "\n".join(lines)
@@ -0,0 +1,281 @@
+import hashlib
+import inspect
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from metal.detection import DETECTION_DTYPE, DetectionResult, DetectionSet
+
+
+def image_digest(image):
+    """Hash del contenido de una imagen decodificada (forma, dtype y píxeles)"""
+    # SHA-256 suele estar acelerado por hardware y es más rápido que blake2b en imágenes grandes
+    digest = hashlib.sha256(f"{image.shape}{image.dtype}".encode())
+    digest.update(np.ascontiguousarray(image).data)
+    return digest.hexdigest()[:32]
+
+
+def describe(value, depth=0):
+    """
+    Descripción serializable de un objeto del pipeline: clase y atributos públicos, recorridos
+    recursivamente. Los arrays se resumen con un hash de su contenido.
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return {"array": hashlib.blake2b(np.ascontiguousarray(value).data, digest_size=8).hexdigest(),
+                "shape": list(value.shape), "dtype": str(value.dtype)}
+    if depth > 8:
+        return type(value).__qualname__
+    if isinstance(value, (list, tuple)):
+        return [describe(v, depth + 1) for v in value]
+    if isinstance(value, dict):
+        return {str(k): describe(v, depth + 1) for k, v in value.items()}
+    if inspect.ismethod(value) or inspect.isfunction(value) or inspect.isbuiltin(value):
+        return f"{value.__module__}.{value.__qualname__}"
+    if hasattr(value, "__dict__"):
+        attributes = {k: describe(v, depth + 1) for k, v in vars(value).items() if not k.startswith("_")}
+        return {"class": f"{type(value).__module__}.{type(value).__qualname__}", "params": attributes}
+    return type(value).__qualname__
+
+
+def pipeline_fingerprint(manager):
+    """
+    Hash de la configuración efectiva de un MainManager cargado: tipo de defecto y, para cada
+    rama, la clase y los parámetros de cada método y del detector, más los de la pirámide y la
+    puerta de placas limpias.
+    """
+    def describe_preprocessing(preprocessing_manager):
+        if preprocessing_manager is None:
+            return None
+        return {"methods": describe(preprocessing_manager.methods),
+                "approximate": preprocessing_manager.plans is not None and preprocessing_manager.approximate}
+
+    def describe_detector(detector_manager):
+        return None if detector_manager is None else describe(detector_manager.method)
+
+    description = {
+        "defect_type": manager.defect_type,
+        "scratches": describe_preprocessing(manager.scratches_manager),
+        "patches": describe_preprocessing(manager.patches_manager),
+        "detector": describe_detector(manager.detector_manager),
+        "scratches_detector": describe_detector(manager.scratches_detector_manager),
+        "patches_detector": describe_detector(manager.patches_detector_manager),
+        "merger": describe(manager.branch_merger),
+        "pyramid": None if manager.pyramid is None else manager.pyramid.parameters(),
+        "gate": None if manager.gate is None else manager.gate.parameters(),
+    }
+    serialized = json.dumps(description, sort_keys=True, default=str)
+    return hashlib.blake2b(serialized.encode(), digest_size=16).hexdigest()
+
+
+def encode_results(results):
+    """
+    Serializa el resultado de una inspección (DetectionSet, lista de DetectionResult o un único
+    DetectionResult) como un byte de tipo seguido de los registros. None si no se puede guardar.
+    """
+    if isinstance(results, DetectionSet):
+        return b"S" + results.records.tobytes()
+    if isinstance(results, DetectionResult):
+        return b"R" + DetectionSet.from_results(results).records.tobytes()
+    if isinstance(results, list) and all(isinstance(r, DetectionResult) for r in results):
+        return b"L" + DetectionSet.from_results(results).records.tobytes()
+    return None
+
+
+def decode_results(data):
+    kind, records = data[:1], np.frombuffer(data[1:], dtype=DETECTION_DTYPE).copy()
+    detections = DetectionSet(records)
+    if kind == b"S":
+        return detections
+    if kind == b"R":
+        return detections[0]
+    return list(detections)
+
+
+class DiskCache:
+    """
+    Nivel persistente de la caché en SQLite. Cuando el tamaño total supera ``max_bytes`` se
+    eliminan las entradas usadas hace más tiempo. Puede compartirse entre procesos.
+
+    El tamaño total se mantiene en una tabla ``meta`` de una sola fila, actualizada por triggers
+    en cada alta, cambio y baja, así que comprobar el límite no recorre la tabla de resultados.
+    Las fechas de acceso de los aciertos se acumulan en memoria y se escriben en bloque cada
+    ``ACCESS_BATCH`` aciertos y antes de cada expulsión.
+    """
+
+    ACCESS_BATCH = 64
+
+    def __init__(self, path, max_bytes=256 * 2 ** 20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._accessed = {}
+        self.connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.executescript("""
+            BEGIN IMMEDIATE;
+            CREATE TABLE IF NOT EXISTS results (
+                key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, accessed REAL NOT NULL);
+            CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+            CREATE TABLE IF NOT EXISTS meta (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER NOT NULL);
+            INSERT OR IGNORE INTO meta (id, total) SELECT 0, COALESCE(SUM(size), 0) FROM results;
+            CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results
+                BEGIN UPDATE meta SET total = total + NEW.size WHERE id = 0; END;
+            CREATE TRIGGER IF NOT EXISTS results_update AFTER UPDATE OF size ON results
+                BEGIN UPDATE meta SET total = total + NEW.size - OLD.size WHERE id = 0; END;
+            CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results
+                BEGIN UPDATE meta SET total = total - OLD.size WHERE id = 0; END;
+            COMMIT;
+        """)
+
+    def get(self, key):
+        with self._lock:
+            row = self.connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._accessed[key] = time.time()
+            if len(self._accessed) >= self.ACCESS_BATCH:
+                with self.connection:
+                    self.connection.execute("BEGIN")
+                    self._flush_accessed()
+            return bytes(row[0])
+
+    def put(self, key, value):
+        with self._lock, self.connection:
+            self.connection.execute("BEGIN IMMEDIATE")
+            # UPSERT en lugar de INSERT OR REPLACE: el reemplazo no dispara el trigger de borrado
+            self.connection.execute("INSERT INTO results (key, value, size, accessed) VALUES (?, ?, ?, ?) "
+                                    "ON CONFLICT (key) DO UPDATE SET value = excluded.value, "
+                                    "size = excluded.size, accessed = excluded.accessed",
+                                    (key, value, len(value), time.time()))
+            self._evict()
+
+    def _flush_accessed(self):
+        if self._accessed:
+            self.connection.executemany("UPDATE results SET accessed = ? WHERE key = ?",
+                                        [(accessed, key) for key, accessed in self._accessed.items()])
+            self._accessed.clear()
+
+    def _total(self):
+        return self.connection.execute("SELECT total FROM meta WHERE id = 0").fetchone()[0]
+
+    def _evict(self):
+        excess = self._total() - self.max_bytes
+        if excess <= 0:
+            return
+
+        # Eliminar solo las entradas menos usadas recientemente necesarias para volver al límite
+        self._flush_accessed()
+        keys = []
+        for key, size in self.connection.execute("SELECT key, size FROM results ORDER BY accessed"):
+            keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        self.connection.executemany("DELETE FROM results WHERE key = ?", keys)
+
+    def size(self):
+        with self._lock:
+            return self._total()
+
+    def clear(self):
+        with self._lock:
+            self._accessed.clear()
+            self.connection.execute("DELETE FROM results")
+
+    def close(self):
+        with self._lock:
+            if self._accessed:
+                with self.connection:
+                    self.connection.execute("BEGIN")
+                    self._flush_accessed()
+            self.connection.close()
+
+
+class ResultCache:
+    """
+    Caché de resultados de inspección. La clave combina el hash del contenido de la imagen, la
+    huella de la configuración efectiva del pipeline y el tipo de resultado, de modo que cualquier
+    cambio de parámetros produce claves nuevas y las entradas antiguas dejan de usarse.
+
+    Un nivel en memoria (LRU de ``max_entries`` entradas) delante de un nivel opcional en disco
+    (SQLite, ``path``) con expulsión por tamaño (``max_bytes``). Los resultados se guardan
+    serializados: cada acierto devuelve objetos nuevos que el llamador puede modificar.
+    """
+
+    def __init__(self, max_entries=1024, path=None, max_bytes=256 * 2 ** 20):
+        self.max_entries = max_entries
+        self.memory = OrderedDict()
+        self.disk = DiskCache(path, max_bytes) if path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """Crea la caché a partir de la sección ``cache`` de la configuración (o None)"""
+        cache = config.get("cache") or {}
+        if not cache.get("enabled", False):
+            return None
+        return cls(max_entries=cache.get("max_entries", 1024), path=cache.get("path"),
+                   max_bytes=cache.get("max_bytes", 256 * 2 ** 20))
+
+    @staticmethod
+    def key(image, fingerprint, kind="inspect"):
+        return f"{fingerprint}:{kind}:{image_digest(image)}"
+
+    def get(self, key):
+        with self._lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.memory.move_to_end(key)
+                self.hits += 1
+                return decode_results(data)
+
+        data = self.disk.get(key) if self.disk is not None else None
+        with self._lock:
+            if data is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._remember(key, data)
+        return decode_results(data)
+
+    def put(self, key, results):
+        data = encode_results(results)
+        if data is None:
+            return
+        with self._lock:
+            self._remember(key, data)
+        if self.disk is not None:
+            self.disk.put(key, data)
+
+    def _remember(self, key, data):
+        self.memory[key] = data
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_entries:
+            self.memory.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "entries": len(self.memory)}
+
+    def clear(self):
+        with self._lock:
+            self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
+            self.disk = None
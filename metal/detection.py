@@ -2,8 +2,36 @@ import numpy as np
 from abc import ABC, abstractmethod
 import cv2
 from scipy import ndimage
+from metal.kernels import structuring_element
+from metal.nms import non_max_suppression, IOMIN
+
+# Clases de defecto almacenadas en DetectionSet
+DEFECT_UNKNOWN = 0
+DEFECT_SCRATCH = 1
+DEFECT_PATCH = 2
+DEFECT_CLASSES = ("unknown", "scratch", "patch")
+
+# Detectores que pueden generar detecciones (se registran al definir cada DetectionMethod)
+DETECTION_SOURCES = ["unknown"]
+# Dimensión de la puntuación de cada origen (2 si es un área, 1 si es una longitud), para
+# reescalarla junto con las coordenadas; sin detector la puntuación es el área de la caja
+SCORE_DIMENSIONS = [2]
+
+DETECTION_DTYPE = np.dtype([
+    ("px", np.int32),
+    ("py", np.int32),
+    ("width", np.int32),
+    ("height", np.int32),
+    ("area", np.int64),
+    ("score", np.float32),
+    ("defect_class", np.int8),
+    ("source", np.int16),
+])
+
 
 class DetectionResult:
+    __slots__ = ("px", "py", "width", "height")
+
     def __init__(self, px, py, width, height):
         self.px = px
         self.py = py
@@ -13,270 +41,306 @@ class DetectionResult:
     def __iter__(self):
         return iter((self.px, self.py, self.width, self.height))
 
+
+class DetectionSet:
+    """
+    Colección compacta de detecciones respaldada por un array estructurado de NumPy
+    (``DETECTION_DTYPE``). Ordenación, filtrado, top-k y concatenación son vectorizados;
+    los DetectionResult solo se crean al iterar o al convertir con ``to_results``.
+    """
+
+    def __init__(self, records=None):
+        self.records = np.zeros(0, dtype=DETECTION_DTYPE) if records is None else records
+
+    @classmethod
+    def from_boxes(cls, boxes, score=None, defect_class=DEFECT_UNKNOWN, source=0):
+        """Crea la colección a partir de un array (N, 4) de cajas (x, y, w, h)"""
+        boxes = np.asarray(boxes).reshape(-1, 4)
+        records = np.zeros(len(boxes), dtype=DETECTION_DTYPE)
+        records["px"] = boxes[:, 0]
+        records["py"] = boxes[:, 1]
+        records["width"] = boxes[:, 2]
+        records["height"] = boxes[:, 3]
+        records["area"] = records["width"].astype(np.int64) * records["height"]
+        records["score"] = records["area"] if score is None else score
+        records["defect_class"] = defect_class
+        records["source"] = source
+        return cls(records)
+
+    @classmethod
+    def from_results(cls, results):
+        """Convierte una lista de DetectionResult (o un DetectionSet) en DetectionSet"""
+        if isinstance(results, DetectionSet):
+            return results
+        if isinstance(results, DetectionResult):
+            results = [results]
+        return cls.from_boxes([tuple(r) for r in results])
+
+    @classmethod
+    def concatenate(cls, sets):
+        return cls(np.concatenate([s.records for s in sets]))
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        for record in self.records:
+            yield DetectionResult(int(record["px"]), int(record["py"]), int(record["width"]), int(record["height"]))
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            record = self.records[index]
+            return DetectionResult(int(record["px"]), int(record["py"]), int(record["width"]), int(record["height"]))
+        return DetectionSet(self.records[index])
+
+    @property
+    def boxes(self):
+        """Cajas (x, y, w, h) como array (N, 4)"""
+        return np.stack([self.records["px"], self.records["py"],
+                         self.records["width"], self.records["height"]], axis=1)
+
+    def filter(self, mask):
+        return DetectionSet(self.records[mask])
+
+    def valid(self):
+        """Descarta las detecciones vacías (ancho o alto nulos)"""
+        return self.filter((self.records["width"] > 0) & (self.records["height"] > 0))
+
+    def sort(self, key="area", descending=True):
+        """Ordenación estable: a igual clave se conserva el orden actual"""
+        values = self.records[key]
+        order = np.argsort(-values if descending else values, kind="stable")
+        return DetectionSet(self.records[order])
+
+    def top_k(self, k, key="area"):
+        """Las k detecciones de mayor clave, en orden descendente (mismo resultado que sort()[:k])"""
+        if k <= 0:
+            return DetectionSet(self.records[:0])
+        if len(self) <= k:
+            return self.sort(key)
+
+        values = self.records[key]
+        kth = values[np.argpartition(values, len(values) - k)[len(values) - k:]].min()
+
+        # Todos los valores mayores que el k-ésimo y, de los empates, los primeros en orden
+        above = np.flatnonzero(values > kth)
+        ties = np.flatnonzero(values == kth)[:k - len(above)]
+        selected = np.sort(np.concatenate([above, ties]))
+        return DetectionSet(self.records[selected]).sort(key)
+
+    def nms(self, threshold=0.5, criterion="iou", key="area", max_results=None):
+        keep = non_max_suppression(self.boxes, threshold, criterion, self.records[key], max_results)
+        return DetectionSet(self.records[keep])
+
+    def to_results(self, empty_result=True):
+        """
+        Lista de DetectionResult. Si no hay detecciones y ``empty_result`` es True se
+        devuelve ``[DetectionResult(0, 0, 0, 0)]``, como hacen los detectores.
+        """
+        results = list(self)
+        if not results and empty_result:
+            return [DetectionResult(0, 0, 0, 0)]
+        return results
+
+
 class DetectionMethod(ABC):
+    defect_class = DEFECT_UNKNOWN
+    source_id = 0
+    score_dimension = 2
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # Registrar el detector para poder identificar el origen de cada detección
+        DETECTION_SOURCES.append(cls.__name__)
+        SCORE_DIMENSIONS.append(cls.score_dimension)
+        cls.source_id = len(DETECTION_SOURCES) - 1
 
     @abstractmethod
     def detect(self, image):
         """Método que debe implementar el algoritmo de detección"""
         pass
 
+    def halo(self):
+        """Radio de la vecindad usada por el detector (ver PreprocessingMethod.halo)"""
+        return 0
+
+    def select(self, detections):
+        """
+        Selección final del detector (supresión de solapes y límite de resultados). Se aplica
+        también a la unión de detecciones de varias teselas o regiones de una misma imagen.
+        """
+        max_results = getattr(self, "max_results", None)
+        return detections if max_results is None else detections.top_k(max_results)
+
+    def detect_array(self, image):
+        """Detecciones como DetectionSet (sin la detección vacía de relleno)"""
+        results = self.detect(image)
+        if isinstance(results, DetectionResult):
+            results = [results]
+        boxes = [tuple(r) for r in results]
+        return DetectionSet.from_boxes(boxes, defect_class=self.defect_class, source=self.source_id).valid()
+
 class ContrastMethod(DetectionMethod):
     def detect(self, image):
+        zonas_filtradas = self.detect_array(image)
+        return DetectionResult(0, 0, 0, 0) if len(zonas_filtradas) == 0 else list(zonas_filtradas)
+
+    def detect_array(self, image):
         # Encontrar los contornos en la imagen de bordes
         contornos, _ = cv2.findContours(image, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
 
-        # Lista para almacenar las zonas detectadas como objetos DetectionResult
-        zonas_detectadas = []
-
-        for contorno in contornos:
-            # Calcular el rectángulo delimitador para cada contorno
-            x, y, w, h = cv2.boundingRect(contorno)
-            zonas_detectadas.append(DetectionResult(x, y, w, h))
-
-        # Ordenar las zonas detectadas por área en orden descendente
-        zonas_detectadas.sort(key=lambda zona: zona.width * zona.height, reverse=True)
-
-        # Filtrar zonas que se superponen
-        zonas_filtradas = []
-        for i, zona in enumerate(zonas_detectadas):
-            x1, y1, w1, h1 = zona.px, zona.py, zona.width, zona.height
-            area1 = w1 * h1
-
-            superpuesto = False
-            for j in range(i):
-                x2, y2, w2, h2 = zonas_detectadas[j].px, zonas_detectadas[j].py, zonas_detectadas[j].width, \
-                zonas_detectadas[j].height
-                area2 = w2 * h2
-
-                # Calcular intersección entre las dos áreas
-                inter_x1 = max(x1, x2)
-                inter_y1 = max(y1, y2)
-                inter_x2 = min(x1 + w1, x2 + w2)
-                inter_y2 = min(y1 + h1, y2 + h2)
-
-                if inter_x1 < inter_x2 and inter_y1 < inter_y2:
-                    inter_area = (inter_x2 - inter_x1) * (inter_y2 - inter_y1)
-                    if inter_area / area1 > 0.7 or inter_area / area2 > 0.7:
-                        superpuesto = True
-                        break
-
-            if not superpuesto:
-                zonas_filtradas.append(zona)
+        # Calcular el rectángulo delimitador para cada contorno
+        zonas_detectadas = DetectionSet.from_boxes(
+            [cv2.boundingRect(contorno) for contorno in contornos],
+            defect_class=self.defect_class, source=self.source_id
+        )
 
-            if len(zonas_filtradas) == 5:
-                break
+        return self.select(zonas_detectadas)
 
-        return DetectionResult(0, 0, 0, 0) if len(zonas_filtradas) == 0 else zonas_filtradas
+    def select(self, detections):
+        # Ordenar por área descendente y filtrar zonas que se superponen más de un 70%
+        # del área de la menor (máximo 5 zonas)
+        return detections.nms(0.7, criterion=IOMIN, max_results=5)
 
 class ConnectedComponentsDetectionMethod(DetectionMethod):
+    defect_class = DEFECT_PATCH
+
     def __init__(self, area_min=50, area_max=5000, max_results=5):
         self.area_min = area_min
         self.area_max = area_max
         self.max_results = max_results
 
     def detect(self, image):
+        return self.detect_array(image).to_results()
+
+    def detect_array(self, image):
         # Asegurar que la imagen es binaria
         imagen_binaria = image > 0
 
         # Etiquetar componentes conectados
         etiquetada, num_componentes = ndimage.label(imagen_binaria)
 
-        # Calcular propiedades de los objetos
+        # Calcular propiedades de todos los objetos en una sola pasada: área con bincount
+        # y rectángulo delimitador a partir de find_objects
+        areas = np.bincount(etiquetada.ravel(), minlength=num_componentes + 1)[1:]
         objetos = ndimage.find_objects(etiquetada)
+        limites = np.array([(obj[1].start, obj[0].start, obj[1].stop, obj[0].stop) for obj in objetos],
+                           dtype=np.int64).reshape(-1, 4)
+        boxes = np.concatenate([limites[:, :2], limites[:, 2:] - limites[:, :2]], axis=1)
 
-        # Filtrar objetos por área y crear DetectionResult
-        zonas_detectadas = []
-        for i, obj in enumerate(objetos):
-            if obj is not None:
-                area = np.sum(etiquetada[obj] == i + 1)
-                if self.area_min <= area <= self.area_max:
-                    y_min, x_min = obj[0].start, obj[1].start
-                    y_max, x_max = obj[0].stop, obj[1].stop
-                    w = x_max - x_min
-                    h = y_max - y_min
-                    zonas_detectadas.append(DetectionResult(x_min, y_min, w, h))
+        # Filtrar objetos por área
+        mask = (areas >= self.area_min) & (areas <= self.area_max)
+        zonas_detectadas = DetectionSet.from_boxes(boxes[mask], score=areas[mask], defect_class=self.defect_class,
+                                                   source=self.source_id)
 
         # Ordenar por área descendente y limitar a max_results
-        zonas_detectadas.sort(key=lambda zona: zona.width * zona.height, reverse=True)
-        zonas_filtradas = zonas_detectadas[:self.max_results]
-
-        # Si no hay detecciones, devolver una lista con un DetectionResult vacío
-        if not zonas_filtradas:
-            return [DetectionResult(0, 0, 0, 0)]
-        return zonas_filtradas
+        return self.select(zonas_detectadas)
 
 
 class EnhancedConnectedComponentsDetectionMethod(DetectionMethod):
+    defect_class = DEFECT_PATCH
+
     def __init__(self, area_min=200, area_max=20000, max_results=5, border_threshold=10, aspect_ratio_limit=8):
         self.area_min = area_min
         self.area_max = area_max
         self.max_results = max_results
         self.border_threshold = border_threshold
         self.aspect_ratio_limit = aspect_ratio_limit
+        self.kernel = structuring_element(cv2.MORPH_ELLIPSE, (5, 5))
+
+    def halo(self):
+        # Cierre previo con elipse 5x5
+        return 4
 
     def detect(self, image):
-        # Asegurar que la imagen es binaria
+        return self.detect_array(image).to_results()
+
+    def detect_array(self, image):
+        # Asegurar que la imagen es binaria (0/1)
         imagen_binaria = (image > 0).astype(np.uint8)
 
         # Preprocesar la imagen con operación de cierre para unir regiones cercanas
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
-        imagen_cerrada = cv2.morphologyEx(imagen_binaria * 255, cv2.MORPH_CLOSE, kernel)
-
-        # Convertir explícitamente a uint8
-        imagen_cerrada_uint8 = (imagen_cerrada > 0).astype(np.uint8)
+        # (sobre una imagen 0/1 el cierre devuelve directamente otra imagen 0/1)
+        imagen_cerrada = cv2.morphologyEx(imagen_binaria, cv2.MORPH_CLOSE, self.kernel)
 
         # Usar connectedComponentsWithStats directamente
-        retval, etiquetada, stats, centroids = cv2.connectedComponentsWithStats(
-            imagen_cerrada_uint8, 8, cv2.CV_32S
-        )
-
-        # Asegurar que num_componentes sea un entero escalar
-        num_componentes = int(retval)
-
-        # Filtrar componentes por área y posición
-        zonas_detectadas = []
-        for i in range(1, num_componentes):  # Ahora num_componentes es un entero
-            x = stats[i, cv2.CC_STAT_LEFT]
-            y = stats[i, cv2.CC_STAT_TOP]
-            w = stats[i, cv2.CC_STAT_WIDTH]
-            h = stats[i, cv2.CC_STAT_HEIGHT]
-            area = stats[i, cv2.CC_STAT_AREA]
-
-            # Calcular relación de aspecto
-            aspect_ratio = max(w, h) / (min(w, h) + 1e-5)
-
-            # Verificar si es un componente en el borde
-            is_border = (x < self.border_threshold or
-                         y < self.border_threshold or
-                         x + w > image.shape[1] - self.border_threshold or
-                         y + h > image.shape[0] - self.border_threshold)
-
-            # Filtrar por área, relación de aspecto y posición en el borde
-            if (self.area_min <= area <= self.area_max and
-                    aspect_ratio <= self.aspect_ratio_limit and
-                    (not is_border or area > self.area_min * 3)):  # Permitir componentes de borde solo si son grandes
-                zonas_detectadas.append(DetectionResult(x, y, w, h))
-
-        # Aplicar Non-Maximum Suppression para eliminar detecciones redundantes
-        if len(zonas_detectadas) > 1:
-            zonas_detectadas = self._non_max_suppression(zonas_detectadas, 0.5)
-
-        # Ordenar por área descendente
-        zonas_detectadas.sort(key=lambda zona: zona.width * zona.height, reverse=True)
-        zonas_detectadas = zonas_detectadas[:self.max_results]
-
-        # Si no hay detecciones válidas, devolver una lista con un DetectionResult vacío
-        if not zonas_detectadas:
-            return [DetectionResult(0, 0, 0, 0)]
-        return zonas_detectadas
-
-    def _non_max_suppression(self, boxes, overlap_thresh):
-        """Aplica non-maximum suppression para eliminar detecciones redundantes"""
-        if len(boxes) == 0:
-            return []
-
-        # Convertir a formato de coordenadas para NMS
-        rects = [(box.px, box.py, box.px + box.width, box.py + box.height) for box in boxes]
-
-        # Calcular áreas
-        areas = [(x2 - x1) * (y2 - y1) for (x1, y1, x2, y2) in rects]
-
-        # Ordenar por área descendente
-        indices = sorted(range(len(areas)), key=lambda i: areas[i], reverse=True)
-
-        keep = []
-        while indices:
-            i = indices[0]
-            keep.append(i)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(imagen_cerrada, 8, cv2.CV_32S)
 
-            indices.pop(0)
+        # Estadísticas de todos los componentes (sin el fondo) como columnas
+        stats = stats[1:]
+        x = stats[:, cv2.CC_STAT_LEFT]
+        y = stats[:, cv2.CC_STAT_TOP]
+        w = stats[:, cv2.CC_STAT_WIDTH]
+        h = stats[:, cv2.CC_STAT_HEIGHT]
+        area = stats[:, cv2.CC_STAT_AREA]
 
-            if not indices:
-                break
+        # Calcular relación de aspecto
+        aspect_ratio = np.maximum(w, h) / (np.minimum(w, h) + 1e-5)
 
-            x1i, y1i, x2i, y2i = rects[i]
-            areai = areas[i]
+        # Verificar qué componentes están en el borde
+        is_border = ((x < self.border_threshold) |
+                     (y < self.border_threshold) |
+                     (x + w > image.shape[1] - self.border_threshold) |
+                     (y + h > image.shape[0] - self.border_threshold))
 
-            # Calcular solapamiento con todas las restantes
-            indices_to_remove = []
-            for j_idx, j in enumerate(indices):
-                x1j, y1j, x2j, y2j = rects[j]
+        # Filtrar por área, relación de aspecto y posición en el borde
+        mask = ((area >= self.area_min) & (area <= self.area_max) &
+                (aspect_ratio <= self.aspect_ratio_limit) &
+                (~is_border | (area > self.area_min * 3)))  # Permitir componentes de borde solo si son grandes
 
-                # Calcular intersección
-                xx1 = max(x1i, x1j)
-                yy1 = max(y1i, y1j)
-                xx2 = min(x2i, x2j)
-                yy2 = min(y2i, y2j)
+        zonas_detectadas = DetectionSet.from_boxes(stats[mask, :4], score=area[mask],
+                                                   defect_class=self.defect_class, source=self.source_id)
 
-                # Calcular área de intersección
-                w = max(0, xx2 - xx1)
-                h = max(0, yy2 - yy1)
-                inter_area = w * h
+        return self.select(zonas_detectadas)
 
-                # Calcular IoU
-                iou = inter_area / (areai + areas[j] - inter_area)
-
-                if iou > overlap_thresh:
-                    indices_to_remove.append(j_idx)
-
-            # Eliminar índices en orden inverso para no afectar los índices anteriores
-            for idx in sorted(indices_to_remove, reverse=True):
-                indices.pop(idx)
-
-        return [boxes[i] for i in keep]
+    def select(self, detections):
+        # Aplicar Non-Maximum Suppression para eliminar detecciones redundantes y
+        # quedarse con las max_results de mayor área
+        return detections.nms(0.5, max_results=self.max_results)
 
 
 class ScratchDetectionMethod(DetectionMethod):
+    defect_class = DEFECT_SCRATCH
+    # Puntuación: longitud del rayón
+    score_dimension = 1
+
     def __init__(self, min_length=30, max_width=20, max_results=5):
         self.min_length = min_length
         self.max_width = max_width
         self.max_results = max_results
 
     def detect(self, image):
+        return self.detect_array(image).to_results()
+
+    def detect_array(self, image):
         # Asegurar que la imagen sea binaria
         imagen_binaria = (image > 0).astype(np.uint8)
 
         # Usar connectedComponentsWithStats
-        retval, etiquetada, stats, centroids = cv2.connectedComponentsWithStats(
-            imagen_binaria, 8, cv2.CV_32S
-        )
-        num_componentes = int(retval)
+        _, _, stats, _ = cv2.connectedComponentsWithStats(imagen_binaria, 8, cv2.CV_32S)
+
+        # Estadísticas de todos los componentes (sin el fondo) como columnas
+        stats = stats[1:]
+        w = stats[:, cv2.CC_STAT_WIDTH]
+        h = stats[:, cv2.CC_STAT_HEIGHT]
+
+        # Para rayones, queremos estructuras largas pero no muy anchas
+        length = np.maximum(h, w)
+        width = np.minimum(h, w)
+
+        # Los rayones típicamente son líneas alargadas (relación de aspecto alta)
+        is_line_like = length / (width + 1e-5) > 3
 
         # Filtrar componentes para identificar líneas (rayones)
-        zonas_detectadas = []
-        for i in range(1, num_componentes):
-            x = stats[i, cv2.CC_STAT_LEFT]
-            y = stats[i, cv2.CC_STAT_TOP]
-            w = stats[i, cv2.CC_STAT_WIDTH]
-            h = stats[i, cv2.CC_STAT_HEIGHT]
-            area = stats[i, cv2.CC_STAT_AREA]
-
-            # Calcular relación de aspecto y cobertura
-            aspect_ratio = max(h, w) / (min(h, w) + 1e-5)
-            area_ratio = area / (w * h)
-
-            # Los rayones típicamente son líneas alargadas (relación de aspecto alta)
-            is_line_like = aspect_ratio > 3
-
-            # Para rayones, queremos estructuras largas pero no muy anchas
-            length = max(h, w)
-            width = min(h, w)
-
-            if (length >= self.min_length and width <= self.max_width and is_line_like):
-                # Si el rayón es horizontal, asegurar que x,y,w,h representen correctamente su orientación
-                if w > h:  # Horizontal
-                    zonas_detectadas.append(DetectionResult(x, y, w, h))
-                else:  # Vertical u orientación arbitraria
-                    zonas_detectadas.append(DetectionResult(x, y, w, h))
+        mask = (length >= self.min_length) & (width <= self.max_width) & is_line_like
+        zonas_detectadas = DetectionSet.from_boxes(stats[mask, :4], score=length[mask],
+                                                   defect_class=self.defect_class, source=self.source_id)
 
-        # Ordenar por tamaño (priorizando los rayones más largos)
-        zonas_detectadas.sort(key=lambda zona: max(zona.width, zona.height), reverse=True)
-        zonas_detectadas = zonas_detectadas[:self.max_results]
+        return self.select(zonas_detectadas)
 
-        # Si no hay detecciones válidas, devolver una lista con un DetectionResult vacío
-        if not zonas_detectadas:
-            return [DetectionResult(0, 0, 0, 0)]
-        return zonas_detectadas
+    def select(self, detections):
+        # Ordenar por tamaño (priorizando los rayones más largos)
+        return detections.top_k(self.max_results, key="score")
 
 
 class MultiDefectDetectionMethod(DetectionMethod):
@@ -285,6 +349,9 @@ class MultiDefectDetectionMethod(DetectionMethod):
         self.patch_detector = patch_detector
         self.combine_results = combine_results
 
+    def halo(self):
+        return max(self.scratch_detector.halo(), self.patch_detector.halo())
+
     def detect(self, image):
 
 
@@ -293,94 +360,61 @@ class MultiDefectDetectionMethod(DetectionMethod):
         patch_image = image.copy()
 
         # Aplicar detectores especializados
-        scratch_results = self.scratch_detector.detect(scratch_image)
-        patch_results = self.patch_detector.detect(patch_image)
+        scratch_results = self.scratch_detector.detect_array(scratch_image)
+        patch_results = self.patch_detector.detect_array(patch_image)
 
-        # Eliminar detecciones vacías (0,0,0,0)
-        valid_scratch_results = [r for r in scratch_results if r.width > 0 and r.height > 0]
-        valid_patch_results = [r for r in patch_results if r.width > 0 and r.height > 0]
+        return self.combine(scratch_results, patch_results)
 
-        if not self.combine_results:
-            # Devolver ambos resultados separados
-            return valid_scratch_results, valid_patch_results
+    def detect_array(self, image):
+        scratch_results = self.scratch_detector.detect_array(image.copy())
+        patch_results = self.patch_detector.detect_array(image.copy())
+        return self.merge(scratch_results, patch_results)
 
-        # Combinar resultados
-        combined_results = valid_scratch_results + valid_patch_results
+    def merge(self, scratch_results, patch_results):
+        """Fusiona las detecciones válidas de ambos detectores en un único DetectionSet"""
+        # Eliminar detecciones vacías (0,0,0,0)
+        valid_scratch_results = DetectionSet.from_results(scratch_results).valid()
+        valid_patch_results = DetectionSet.from_results(patch_results).valid()
 
-        # Ordenar por área
-        combined_results.sort(key=lambda r: r.width * r.height, reverse=True)
+        # Combinar resultados
+        return self.select(DetectionSet.concatenate([valid_scratch_results, valid_patch_results]))
 
-        # Aplicar non-maximum suppression para eliminar solapamientos
-        filtered_results = self._non_max_suppression(combined_results, 0.5)
+    def select(self, detections):
+        # Ordenar por área, aplicar non-maximum suppression para eliminar solapamientos
+        # y limitar a máximo 5 resultados
+        return detections.valid().nms(0.5, max_results=5)
 
-        # Limitar a máximo 5 resultados
-        final_results = filtered_results[:5]
+    def combine(self, scratch_results, patch_results):
+        """Fusiona las detecciones de rayones y manchas obtenidas por separado"""
+        if not self.combine_results:
+            # Devolver ambos resultados separados, sin detecciones vacías
+            return (DetectionSet.from_results(scratch_results).valid().to_results(empty_result=False),
+                    DetectionSet.from_results(patch_results).valid().to_results(empty_result=False))
 
         # Si no hay detecciones, devolver una vacía
-        if not final_results:
-            return [DetectionResult(0, 0, 0, 0)]
-
-        return final_results
-
-    def _non_max_suppression(self, boxes, overlap_thresh):
-        """Elimina detecciones redundantes mediante NMS"""
-        if len(boxes) == 0:
-            return []
-
-        # Convertir a formato de coordenadas para NMS
-        rects = [(box.px, box.py, box.px + box.width, box.py + box.height) for box in boxes]
-
-        # Calcular áreas
-        areas = [(x2 - x1) * (y2 - y1) for (x1, y1, x2, y2) in rects]
-
-        # Ordenar por área descendente
-        indices = sorted(range(len(areas)), key=lambda i: areas[i], reverse=True)
-
-        keep = []
-        while indices:
-            i = indices[0]
-            keep.append(i)
-
-            indices.pop(0)
-
-            if not indices:
-                break
-
-            x1i, y1i, x2i, y2i = rects[i]
-            areai = areas[i]
-
-            # Calcular solapamiento con las restantes
-            indices_to_remove = []
-            for j_idx, j in enumerate(indices):
-                x1j, y1j, x2j, y2j = rects[j]
-
-                # Calcular intersección
-                xx1 = max(x1i, x1j)
-                yy1 = max(y1i, y1j)
-                xx2 = min(x2i, x2j)
-                yy2 = min(y2i, y2j)
-
-                # Calcular área de intersección
-                w = max(0, xx2 - xx1)
-                h = max(0, yy2 - yy1)
-                inter_area = w * h
-
-                # Calcular IoU
-                iou = inter_area / (areai + areas[j] - inter_area)
-
-                if iou > overlap_thresh:
-                    indices_to_remove.append(j_idx)
-
-            # Eliminar índices en orden inverso
-            for idx in sorted(indices_to_remove, reverse=True):
-                indices.pop(idx)
-
-        return [boxes[i] for i in keep]
+        return self.merge(scratch_results, patch_results).to_results()
 
 
 class DetectorManager:
-    def __init__(self, method: DetectionMethod):
+    def __init__(self, method: DetectionMethod, profiler=None, name="detector"):
         self.method = method
+        self.profiler = profiler
+        self.name = name
 
     def execute(self, image):
-        return self.method.detect(image)
+        if self.profiler is None:
+            return self.method.detect(image)
+
+        token = self.profiler.start()
+        results = self.method.detect(image)
+        self.profiler.stop(token, f"{self.name}.{type(self.method).__name__}", results)
+        return results
+
+    def execute_array(self, image):
+        if self.profiler is None:
+            return self.method.detect_array(image)
+
+        token = self.profiler.start()
+        results = self.method.detect_array(image)
+        self.profiler.stop(token, f"{self.name}.{type(self.method).__name__}", results)
+        return results
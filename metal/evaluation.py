@@ -0,0 +1,215 @@
+import json
+import logging
+import os
+import time
+import xml.etree.ElementTree as ElementTree
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from metal import batch
+from metal.benchmark import DEADLINE_MS
+from metal.detection import DetectionSet
+from metal.gate import CleanPlateGate
+from metal.manager import MainManager
+from metal.nms import iou_matrix
+
+# Requisito del proyecto: F1 medido con un umbral del 80 % en la IoU
+IOU_THRESHOLD = 0.8
+
+
+def ground_truth_path(image_path):
+    """Anotación Pascal VOC asociada a una imagen (mismo nombre con extensión .xml)"""
+    return os.path.splitext(image_path)[0] + ".xml"
+
+
+def parse_ground_truth(xml_path):
+    """Cajas ``bndbox`` de una anotación Pascal VOC como array (N, 4) de (x, y, w, h)"""
+    boxes = []
+    for box in ElementTree.parse(xml_path).getroot().iter("bndbox"):
+        xmin, ymin, xmax, ymax = (int(float(box.findtext(tag))) for tag in ("xmin", "ymin", "xmax", "ymax"))
+        boxes.append((xmin, ymin, xmax - xmin, ymax - ymin))
+    return np.array(boxes, dtype=np.int64).reshape(-1, 4)
+
+
+def load_ground_truth(image_paths, workers=8):
+    """Lee en paralelo las anotaciones de una lista de imágenes: lista de arrays (N, 4)"""
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(parse_ground_truth, map(ground_truth_path, image_paths)))
+
+
+def match_detections(ground_truth, predictions, iou_threshold=IOU_THRESHOLD):
+    """
+    Empareja predicciones y anotaciones de una imagen como la demo Java: cada predicción, en
+    orden, se asigna a la primera anotación libre con IoU >= ``iou_threshold``.
+
+    :return: (TP, FP, FN, matriz IoU (predicciones, anotaciones)).
+    """
+    ious = iou_matrix(predictions, ground_truth)
+    hits = ious >= iou_threshold
+
+    matched = np.zeros(ious.shape[1], dtype=bool)
+    for row in hits:
+        candidates = np.flatnonzero(row & ~matched)
+        if len(candidates):
+            matched[candidates[0]] = True
+
+    true_positives = int(matched.sum())
+    return true_positives, len(ious) - true_positives, ious.shape[1] - true_positives, ious
+
+
+def latency_stats(latencies, deadline_ms=DEADLINE_MS):
+    latencies = 1000 * np.asarray(latencies, dtype=np.float64)
+    if len(latencies) == 0:
+        return {}
+    return {
+        "mean_ms": float(latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "max_ms": float(latencies.max()),
+        "within_deadline": float(np.mean(latencies <= deadline_ms)),
+    }
+
+
+def _ratio(numerator, denominator):
+    return numerator / denominator if denominator > 0 else 0.0
+
+
+def _detect_timed(image_path):
+    """Detección dentro del trabajador de ``metal.batch``, con la latencia de la imagen (lectura incluida)"""
+    start = time.perf_counter()
+    records, error = batch._inspect_path(image_path)
+    boxes = DetectionSet(records).valid().boxes if error is None else None
+    return boxes, error, time.perf_counter() - start
+
+
+class Evaluator:
+    """
+    Evaluación de precisión y rendimiento en un solo proceso, sin lanzar la demo Java ni un
+    contenedor por imagen. Las anotaciones se leen en hilos mientras un pool de procesos (los
+    trabajadores de ``BatchManager``, con los pipelines construidos una vez) detecta los defectos.
+    """
+
+    def __init__(self, config_path, workers=None, iou_threshold=IOU_THRESHOLD, deadline_ms=DEADLINE_MS):
+        self.config_path = config_path
+        self.workers = workers or os.cpu_count() or 1
+        self.iou_threshold = iou_threshold
+        self.deadline_ms = deadline_ms
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def list_images(dataset_dir):
+        """Imágenes del directorio que tienen anotación"""
+        return [path for path in batch.BatchManager.list_images(dataset_dir)
+                if os.path.exists(ground_truth_path(path))]
+
+    def detect(self, image_paths):
+        """Lista de (cajas o None si hubo error, segundos) en el orden de entrada"""
+        if self.workers == 1:
+            batch._init_worker(self.config_path)
+            try:
+                outputs = map(_detect_timed, image_paths)
+                return [(boxes if error is None else None, seconds) for boxes, error, seconds in outputs]
+            finally:
+                batch._close_worker()
+
+        chunksize = max(1, len(image_paths) // (self.workers * 4))
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=batch._init_process,
+                                 initargs=(self.config_path,)) as executor:
+            outputs = executor.map(_detect_timed, image_paths, chunksize=chunksize)
+            return [(boxes if error is None else None, seconds) for boxes, error, seconds in outputs]
+
+    def evaluate_directory(self, dataset_dir):
+        return self.evaluate(self.list_images(dataset_dir))
+
+    def evaluate(self, image_paths):
+        image_paths = list(image_paths)
+
+        # Las anotaciones se leen mientras se procesan las imágenes
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            ground_truth = executor.submit(load_ground_truth, image_paths)
+            detections = self.detect(image_paths)
+            ground_truth = ground_truth.result()
+
+        images = []
+        totals = np.zeros(3, dtype=np.int64)
+        iou_sum, iou_count = 0.0, 0
+        for image_path, truth, (boxes, seconds) in zip(image_paths, ground_truth, detections):
+            if boxes is None:
+                self.logger.error(f"Error procesando {image_path}")
+                images.append({"image": image_path, "error": True, "ms": 1000 * seconds})
+                continue
+
+            tp, fp, fn, ious = match_detections(truth, boxes, self.iou_threshold)
+            totals += (tp, fp, fn)
+            iou_sum += float(ious.sum())
+            iou_count += ious.size
+            images.append({"image": image_path, "tp": tp, "fp": fp, "fn": fn, "ms": 1000 * seconds})
+
+        tp, fp, fn = (int(v) for v in totals)
+        precision = _ratio(tp, tp + fp)
+        recall = _ratio(tp, tp + fn)
+        return {
+            "config": self.config_path if isinstance(self.config_path, str) else None,
+            "iou_threshold": self.iou_threshold,
+            "images": len(image_paths),
+            "errors": sum(1 for image in images if image.get("error")),
+            "tp": tp,
+            "fp": fp,
+            "fn": fn,
+            "precision": precision,
+            "recall": recall,
+            "f1": _ratio(2 * precision * recall, precision + recall),
+            # Media de la IoU de todos los pares (anotación, predicción), como la demo Java
+            "mean_iou": _ratio(iou_sum, iou_count),
+            "latency": latency_stats([seconds for _, seconds in detections], self.deadline_ms),
+            "per_image": images,
+        }
+
+
+def calibrate_gate(config, image_paths, target_fnr=None):
+    """
+    Calibra la puerta de placas limpias con un conjunto anotado: las imágenes con alguna anotación
+    son las defectuosas y el resto se usa para medir cuántas placas limpias se descartarían.
+    Usa los umbrales y el ``target_fnr`` de la sección ``gate`` de la configuración como punto de
+    partida (esté o no activada) y devuelve el informe de ``CleanPlateGate.calibrate``.
+    """
+    manager = MainManager(config).load()
+    manager.close()
+    section = manager.config.get("gate", {})
+    gate = CleanPlateGate.from_config({"gate": {**section, "enabled": True}})
+
+    image_paths = list(image_paths)
+    defective = [len(boxes) > 0 for boxes in load_ground_truth(image_paths)]
+
+    # Las imágenes se leen de una en una a medida que se puntúan
+    def images(wanted):
+        return (manager.loader.load(path) for path, is_defective in zip(image_paths, defective)
+                if is_defective == wanted)
+
+    report = gate.calibrate(images(True), images(False), target_fnr)
+    report["defective_images"] = sum(defective)
+    report["clean_images"] = len(defective) - sum(defective)
+    return report
+
+
+def save_report(report, path):
+    with open(path, "w") as file:
+        json.dump(report, file, indent=2, sort_keys=True)
+
+
+def format_report(report):
+    """Resumen de texto del informe de evaluación"""
+    lines = [
+        f"imagenes={report['images']} errores={report['errors']} iou>={report['iou_threshold']:.2f}",
+        f"TP={report['tp']} FP={report['fp']} FN={report['fn']}",
+        f"precision={report['precision']:.4f} recall={report['recall']:.4f} f1={report['f1']:.4f} "
+        f"iou_media={report['mean_iou']:.4f}",
+    ]
+    latency = report["latency"]
+    if latency:
+        lines.append(f"latencia p50={latency['p50_ms']:.2f} ms p95={latency['p95_ms']:.2f} ms "
+                     f"p99={latency['p99_ms']:.2f} ms max={latency['max_ms']:.2f} ms "
+                     f"en_plazo={100 * latency['within_deadline']:.1f} %")
+    return "\n".join(lines)
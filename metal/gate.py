@@ -0,0 +1,121 @@
+import cv2
+import numpy as np
+
+# Umbrales por defecto de cada etapa, en niveles de gris (placas sintéticas de ``metal.benchmark``)
+DEFAULT_THRESHOLDS = {"blocks": 10, "pixels": 18}
+
+
+class CleanPlateGate:
+    """
+    Cascada de estadísticas baratas delante del preprocesado para dar por limpias las placas sin
+    defectos sin ejecutar los pipelines. Trabaja sobre la imagen en gris reducida ``factor`` veces:
+
+    1. ``blocks``: media de cada bloque de ``block_size`` píxeles frente a la mediana de sus
+       vecinos (fondo local). Detecta manchas y cambios de tono que ocupan bloques enteros.
+    2. ``pixels``: desviación máxima de cada píxel frente a ese fondo. Detecta rayones y defectos
+       pequeños que apenas mueven la media del bloque.
+
+    Una imagen es limpia si ninguna etapa alcanza su umbral; en cuanto una lo alcanza se deja de
+    evaluar la cascada y la imagen pasa por el pipeline completo, así que el peor caso solo añade
+    el coste de la puerta. Un umbral ``None`` desactiva su etapa.
+
+    Los umbrales dependen de la iluminación y la textura de la línea; ``calibrate`` los ajusta con
+    placas defectuosas conocidas para no descartar más de ``target_fnr`` de ellas.
+    """
+
+    STAGES = ("blocks", "pixels")
+
+    def __init__(self, factor=4, block_size=64, thresholds=None, target_fnr=0.01):
+        self.factor = factor
+        self.block_size = block_size
+        self.thresholds = {**DEFAULT_THRESHOLDS, **(thresholds or {})}
+        self.target_fnr = target_fnr
+        self.counters = {"images": 0, "rejected": 0, **{stage: 0 for stage in self.STAGES}}
+
+    @classmethod
+    def from_config(cls, config):
+        """Sección ``gate`` de la configuración; None si no está activada"""
+        section = config.get("gate", {})
+        if not section.get("enabled", False):
+            return None
+        return cls(factor=section.get("factor", 4), block_size=section.get("block_size", 64),
+                   thresholds=section.get("thresholds"), target_fnr=section.get("target_fnr", 0.01))
+
+    def parameters(self):
+        """Parámetros que influyen en el resultado (forman parte de la huella de la caché)"""
+        return {"factor": self.factor, "block_size": self.block_size, "thresholds": self.thresholds}
+
+    def _stage_scores(self, image):
+        """Genera (etapa, puntuación) en orden; cada etapa solo se calcula si se pide"""
+        height, width = image.shape[:2]
+        small = cv2.resize(image, (max(width // self.factor, 1), max(height // self.factor, 1)),
+                           interpolation=cv2.INTER_AREA)
+        if small.ndim > 2:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        if small.dtype != np.uint8:
+            small = cv2.normalize(small, None, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
+
+        # Medias de bloque (al menos 3x3 para que cada bloque tenga vecinos) y fondo local
+        block = max(self.block_size // self.factor, 1)
+        grid = (max(small.shape[1] // block, 3), max(small.shape[0] // block, 3))
+        means = cv2.resize(small, grid, interpolation=cv2.INTER_AREA)
+        background = cv2.medianBlur(means, 3)
+        yield "blocks", int(cv2.absdiff(means, background).max())
+
+        background = cv2.resize(background, (small.shape[1], small.shape[0]), interpolation=cv2.INTER_LINEAR)
+        yield "pixels", int(cv2.absdiff(small, background).max())
+
+    def scores(self, image):
+        """Puntuación de todas las etapas, sin cortar la cascada"""
+        return dict(self._stage_scores(image))
+
+    def is_clean(self, image):
+        """True si la imagen se puede dar por limpia sin ejecutar los pipelines"""
+        self.counters["images"] += 1
+        for stage, score in self._stage_scores(image):
+            threshold = self.thresholds.get(stage)
+            if threshold is not None and score >= threshold:
+                self.counters[stage] += 1
+                return False
+
+        self.counters["rejected"] += 1
+        return True
+
+    def calibrate(self, defective, clean=(), target_fnr=None):
+        """
+        Escala los umbrales de todas las etapas por un mismo factor para que la puerta descarte
+        como mucho ``target_fnr`` de las imágenes ``defective`` (falsos negativos).
+
+        :param defective: imágenes con defectos conocidos.
+        :param clean: imágenes sin defectos, solo para medir la tasa de descarte resultante.
+        :return: diccionario con los umbrales y las tasas obtenidas sobre las imágenes dadas.
+        """
+        target_fnr = self.target_fnr if target_fnr is None else target_fnr
+        stages = [stage for stage in self.STAGES if self.thresholds.get(stage) is not None]
+        if not stages:
+            raise ValueError("La puerta no tiene ninguna etapa activa")
+
+        defective_scores = [self.scores(image) for image in defective]
+        clean_scores = [self.scores(image) for image in clean]
+        if not defective_scores:
+            raise ValueError("Hacen falta imágenes con defectos para calibrar la puerta")
+
+        # Una imagen pasa al pipeline si alguna etapa alcanza su umbral: ratio máximo >= 1
+        ratios = np.sort([max(scores[stage] / self.thresholds[stage] for stage in stages)
+                          for scores in defective_scores])
+
+        # Con k = floor(target_fnr * n) se admiten como mucho k imágenes por debajo del umbral.
+        # Las puntuaciones son enteras: redondear hacia abajo no deja escapar la imagen k-ésima
+        allowed = int(np.floor(target_fnr * len(ratios)))
+        scale = ratios[min(allowed, len(ratios) - 1)]
+        self.thresholds.update({stage: int(np.floor(self.thresholds[stage] * scale + 1e-9)) for stage in stages})
+
+        def rejected(scores):
+            return np.mean([all(s[stage] < self.thresholds[stage] for stage in stages) for s in scores])
+
+        return {
+            "thresholds": dict(self.thresholds),
+            "target_fnr": target_fnr,
+            "false_negative_rate": float(rejected(defective_scores)),
+            "clean_rejection_rate": float(rejected(clean_scores)) if clean_scores else None,
+        }
@@ -0,0 +1,161 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from metal.detection import SCORE_DIMENSIONS, DetectionResult, DetectionSet
+from metal.tools import Tools
+
+RAW_EXTENSIONS = (".npy", ".raw", ".bin")
+
+# Flags de decodificación con reducción de resolución integrada en el decodificador
+REDUCED_FLAGS = {
+    (False, 2): cv2.IMREAD_REDUCED_COLOR_2, (False, 4): cv2.IMREAD_REDUCED_COLOR_4,
+    (False, 8): cv2.IMREAD_REDUCED_COLOR_8, (True, 2): cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    (True, 4): cv2.IMREAD_REDUCED_GRAYSCALE_4, (True, 8): cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+
+class ImageLoader:
+    """
+    Capa de entrada de imágenes.
+
+    - ``grayscale``: decodifica directamente a un canal (``IMREAD_GRAYSCALE``), sin pasar por BGR.
+    - ``reduce``: factor 2, 4 u 8 de reducción en la propia decodificación (``IMREAD_REDUCED_*``);
+      las detecciones se devuelven a coordenadas de la imagen original con ``scale_results``.
+    - Acepta rutas, imágenes codificadas en memoria (bytes), arrays ya decodificados y fotogramas
+      sin cabecera proyectados en memoria (``.npy``, o ``.raw``/``.bin`` con ``raw_shape``).
+
+    Con los valores por defecto se comporta exactamente igual que ``Tools.read_image``.
+    """
+
+    def __init__(self, grayscale=False, reduce=1, raw_shape=None, raw_dtype=np.uint8):
+        if reduce not in (1, 2, 4, 8):
+            raise ValueError("El factor de reducción debe ser 1, 2, 4 u 8")
+        self.grayscale = grayscale
+        self.reduce = reduce
+        self.raw_shape = tuple(raw_shape) if raw_shape is not None else None
+        self.raw_dtype = np.dtype(raw_dtype)
+
+        if reduce > 1:
+            self.flags = REDUCED_FLAGS[(grayscale, reduce)]
+        else:
+            self.flags = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+
+    @classmethod
+    def from_config(cls, config):
+        """Crea el cargador a partir de la sección ``ingest`` de la configuración"""
+        ingest = config.get("ingest") or {}
+        return cls(grayscale=ingest.get("grayscale", False), reduce=ingest.get("reduce", 1),
+                   raw_shape=ingest.get("raw_shape"), raw_dtype=ingest.get("raw_dtype", "uint8"))
+
+    @property
+    def channels(self):
+        """Número de canales de las imágenes decodificadas"""
+        return 1 if self.grayscale else 3
+
+    @property
+    def is_default(self):
+        return self.flags == cv2.IMREAD_COLOR
+
+    def read(self, path):
+        """Lee y decodifica una imagen de disco"""
+        if path.lower().endswith(RAW_EXTENSIONS):
+            return self.adapt(self.read_raw(path))
+
+        if self.is_default:
+            image = Tools.read_image(path)
+        else:
+            image = cv2.imread(path, self.flags)
+        if image is None:
+            raise ValueError(f"No se pudo leer la imagen {path}")
+        return image
+
+    def read_raw(self, path):
+        """Proyecta en memoria un fotograma ``.npy`` o sin cabecera (``.raw``/``.bin``)"""
+        if path.lower().endswith(".npy"):
+            return np.load(path, mmap_mode="r")
+        if self.raw_shape is None:
+            raise ValueError("Los ficheros raw necesitan la forma de la imagen (raw_shape)")
+        return np.memmap(path, dtype=self.raw_dtype, mode="r", shape=self.raw_shape)
+
+    def decode(self, data):
+        """Decodifica una imagen codificada (jpg, png...) recibida en memoria"""
+        if self.is_default:
+            image = Tools.decode_image(data)
+        else:
+            image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), self.flags)
+        if image is None:
+            raise ValueError("No se pudo decodificar la imagen")
+        return image
+
+    def adapt(self, image):
+        """Aplica a una imagen ya decodificada la conversión a gris y la reducción configuradas"""
+        if self.grayscale and image.ndim == 3:
+            image = cv2.cvtColor(np.asarray(image), cv2.COLOR_BGR2GRAY)
+        if self.reduce > 1:
+            height, width = image.shape[:2]
+            size = ((width + self.reduce - 1) // self.reduce, (height + self.reduce - 1) // self.reduce)
+            image = cv2.resize(np.asarray(image), size, interpolation=cv2.INTER_AREA)
+        return image
+
+    def load(self, source):
+        """Obtiene la imagen de una ruta, de bytes codificados o de un array"""
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            return self.decode(source)
+        if isinstance(source, np.ndarray):
+            return self.adapt(source)
+        return self.read(os.fspath(source))
+
+    def prefetch(self, sources, depth=4):
+        """
+        Generador de pares (fuente, imagen) en el orden de entrada. Un hilo en segundo plano
+        decodifica por adelantado hasta ``depth`` imágenes mientras se procesa la actual (la
+        decodificación de OpenCV libera el GIL). Si una imagen no se puede leer, la imagen es
+        la excepción producida.
+        """
+        sources = iter(sources)
+        pending = deque()
+
+        def load(source):
+            try:
+                return self.load(source)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            for source in sources:
+                pending.append((source, executor.submit(load, source)))
+                if len(pending) > depth:
+                    source, future = pending.popleft()
+                    yield source, future.result()
+
+            while pending:
+                source, future = pending.popleft()
+                yield source, future.result()
+
+    def scale_results(self, results):
+        """
+        Pasa detecciones de la imagen reducida a coordenadas de la imagen original, junto con
+        las puntuaciones que dependen de la escala (áreas y longitudes)
+        """
+        factor = self.reduce
+        if factor == 1:
+            return results
+
+        if isinstance(results, DetectionSet):
+            records = results.records.copy()
+            for field in ("px", "py", "width", "height"):
+                records[field] *= factor
+            records["area"] *= factor * factor
+            # Las puntuaciones que son áreas o longitudes se reescalan igual que ellas
+            records["score"] *= np.power(factor, np.take(SCORE_DIMENSIONS, records["source"])).astype(np.float32)
+            return DetectionSet(records)
+
+        if isinstance(results, DetectionResult):
+            return DetectionResult(results.px * factor, results.py * factor,
+                                   results.width * factor, results.height * factor)
+
+        return type(results)(self.scale_results(result) for result in results)
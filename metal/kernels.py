@@ -0,0 +1,221 @@
+import functools
+import threading
+
+import cv2
+import numpy as np
+
+
+@functools.lru_cache(maxsize=None)
+def structuring_element(shape, size):
+    """
+    Elemento estructurante de OpenCV compartido por todos los métodos que usan los mismos
+    parámetros. Se devuelve de solo lectura porque la misma instancia se reutiliza.
+    """
+    kernel = cv2.getStructuringElement(shape, tuple(size))
+    kernel.setflags(write=False)
+    return kernel
+
+
+@functools.lru_cache(maxsize=None)
+def directional_kernel(angle, size):
+    """Kernel lineal normalizado de ``size`` píxeles en la orientación indicada (0, 45, 90 o 135)"""
+    kernel = np.zeros((size, size), dtype=np.float32)
+
+    if angle == 0:  # Horizontal
+        kernel[size // 2, :] = 1
+    elif angle == 90:  # Vertical
+        kernel[:, size // 2] = 1
+    elif angle == 45:  # Diagonal 45°
+        kernel[np.arange(size), np.arange(size)] = 1
+    elif angle == 135:  # Diagonal 135°
+        kernel[np.arange(size), size - 1 - np.arange(size)] = 1
+
+    kernel = kernel / np.sum(kernel)
+    kernel.setflags(write=False)
+    return kernel
+
+
+class ThreadLocalFactory:
+    """
+    Objeto de OpenCV construido la primera vez que lo usa cada hilo y reutilizado después.
+    Se usa para objetos con estado interno que no se pueden compartir entre hilos (p. ej. CLAHE).
+    """
+
+    def __init__(self, factory):
+        self.factory = factory
+        self._local = threading.local()
+
+    def get(self):
+        instance = getattr(self._local, "instance", None)
+        if instance is None:
+            instance = self._local.instance = self.factory()
+        return instance
+
+
+class LocalContrastKernel:
+    """
+    Normalización de contraste local: ``(x - media_local) / std_local * factor + offset``.
+
+    La media y la desviación estándar locales se calculan con filtros de caja sobre buffers
+    de trabajo float32 que se reservan una vez por forma de imagen (y por hilo) y se reutilizan
+    en cada llamada con argumentos ``dst=`` / ``out=``. El resultado uint8 se escribe
+    directamente en ``out`` si se proporciona.
+    """
+
+    def __init__(self, kernel_size, contrast_factor, offset, pre_blur=None):
+        self.kernel_size = kernel_size
+        self.contrast_factor = contrast_factor
+        self.offset = offset
+        self.pre_blur = pre_blur
+        self._local = threading.local()
+
+    def _buffers(self, shape):
+        """Buffers de trabajo del hilo actual para una forma de imagen"""
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None or buffers[0].shape != shape:
+            buffers = tuple(np.empty(shape, dtype=np.float32) for _ in range(4))
+            self._local.buffers = buffers
+        return buffers
+
+    def apply(self, image, out=None, pre_filter=None):
+        """
+        :param pre_filter: kernel 1-D separable que sustituye al suavizado previo (``pre_blur``),
+            usado para combinar en un solo paso un suavizado anterior con el propio del kernel.
+        """
+        image_float, mean_local, mean_squared, std_local = self._buffers(image.shape)
+        ksize = (self.kernel_size, self.kernel_size)
+
+        # Convertir a float32 sin reservar memoria nueva
+        np.copyto(image_float, image)
+
+        # Suavizado previo opcional para reducir ruido antes del contraste local
+        if pre_filter is not None:
+            cv2.sepFilter2D(image_float, -1, pre_filter, pre_filter, dst=std_local)
+            image_float, std_local = std_local, image_float
+        elif self.pre_blur:
+            cv2.GaussianBlur(image_float, (self.pre_blur, self.pre_blur), 0, dst=std_local)
+            image_float, std_local = std_local, image_float
+
+        # Calcular media y desviación estándar locales
+        cv2.boxFilter(image_float, -1, ksize, dst=mean_local, normalize=True)
+        np.multiply(image_float, image_float, out=mean_squared)
+        cv2.boxFilter(mean_squared, -1, ksize, dst=mean_squared, normalize=True)
+
+        np.multiply(mean_local, mean_local, out=std_local)
+        np.subtract(mean_squared, std_local, out=std_local)
+        np.maximum(std_local, 0, out=std_local)
+        np.sqrt(std_local, out=std_local)
+        std_local += 1e-5
+
+        # Realce de contraste reutilizando el buffer de la media
+        result = mean_local
+        np.subtract(image_float, mean_local, out=result)
+        np.divide(result, std_local, out=result)
+        result *= self.contrast_factor
+        result += self.offset
+
+        # Asegurar que el resultado esté en el rango 0-255 y sea uint8
+        np.clip(result, 0, 255, out=result)
+        if out is None:
+            return result.astype(np.uint8)
+        np.copyto(out, result, casting="unsafe")
+        return out
+
+    def apply_batch(self, stack, out=None):
+        """
+        Aplica el kernel a una pila (N, H, W). Las imágenes pequeñas se agrupan como canales de
+        una sola imagen (H, W, n): los filtros de OpenCV tratan cada canal por separado, así que el
+        resultado es idéntico con una llamada por filtro para todo el grupo. Con imágenes mayores
+        de ``BATCH_MAX_AREA`` píxeles los filtros multicanal son más lentos y se procesan una a una.
+        """
+        if out is None:
+            out = np.empty(stack.shape, dtype=np.uint8)
+
+        area = stack.shape[1] * stack.shape[2]
+        group = min(BATCH_MAX_GROUP, max(4, BATCH_PIXELS // area)) if area <= BATCH_MAX_AREA else 1
+
+        for start in range(0, len(stack), group):
+            chunk = stack[start:start + group]
+            if len(chunk) == 1:
+                self.apply(chunk[0], out=out[start])
+                continue
+            planes = self.apply(np.ascontiguousarray(np.moveaxis(chunk, 0, -1)))
+            np.copyto(out[start:start + len(chunk)], np.moveaxis(planes, -1, 0))
+        return out
+
+
+# Agrupación de LocalContrastKernel.apply_batch: hasta ~64K píxeles (y 32 imágenes) por grupo y
+# solo para imágenes de hasta 128x128, donde los filtros multicanal compensan
+BATCH_PIXELS = 65536
+BATCH_MAX_GROUP = 32
+BATCH_MAX_AREA = 128 * 128
+
+
+class LineFilterKernel:
+    """
+    Media de la imagen a lo largo de segmentos de ``size`` píxeles centrados en cada píxel, para
+    varias orientaciones a la vez (mismo resultado que ``filter2D`` con ``directional_kernel``).
+
+    - 0° y 90°: filtro de caja 1-D.
+    - 45° y 135°: imagen integral a lo largo de las diagonales; el coste por píxel es constante
+      y no depende de la longitud del segmento.
+    - Otros ángulos: ``filter2D`` con el kernel denso.
+
+    Todas las orientaciones se escriben en un único array apilado (orientación, alto, ancho)
+    cuyos buffers se reservan una vez por forma de imagen y por hilo.
+    """
+
+    def __init__(self, orientations, size):
+        self.orientations = list(orientations)
+        self.size = size
+        self._local = threading.local()
+
+    def _buffers(self, shape):
+        buffers = getattr(self._local, "buffers", None)
+        if buffers is None or buffers[0].shape[1:] != shape:
+            height, width = shape
+            stack = np.empty((len(self.orientations), height, width), dtype=np.float32)
+            padded = np.empty((height + self.size - 1, width + self.size - 1), dtype=np.uint8)
+            integral = np.zeros((height + self.size, width + self.size), dtype=np.int32)
+            buffers = self._local.buffers = (stack, padded, integral)
+        return buffers
+
+    def apply(self, image):
+        """Devuelve el array apilado de medias para una imagen uint8 de un canal"""
+        stack, padded, integral = self._buffers(image.shape)
+        size = self.size
+        before, after = size // 2, size - 1 - size // 2
+        padded_ready = False
+
+        for out, angle in zip(stack, self.orientations):
+            if angle == 0:
+                cv2.boxFilter(image, cv2.CV_32F, (size, 1), dst=out, borderType=cv2.BORDER_REFLECT_101)
+            elif angle == 90:
+                cv2.boxFilter(image, cv2.CV_32F, (1, size), dst=out, borderType=cv2.BORDER_REFLECT_101)
+            elif angle in (45, 135):
+                if not padded_ready:
+                    # Mismo tratamiento del borde que filter2D (BORDER_REFLECT_101)
+                    cv2.copyMakeBorder(image, before, after, before, after, cv2.BORDER_REFLECT_101, dst=padded)
+                    padded_ready = True
+                if angle == 45:
+                    self._diagonal_means(padded, integral, out)
+                else:
+                    # La antidiagonal es la diagonal de la imagen reflejada horizontalmente
+                    self._diagonal_means(padded[:, ::-1], integral, out[:, ::-1])
+            else:
+                cv2.filter2D(image.astype(np.float32), -1, directional_kernel(angle, size), dst=out)
+
+        return stack
+
+    def _diagonal_means(self, padded, integral, out):
+        size = self.size
+        height, width = out.shape
+
+        # integral[y + 1, x + 1] = suma de padded[y - i, x - i] para i >= 0 (fila y columna 0 a cero)
+        for y in range(padded.shape[0]):
+            np.add(padded[y], integral[y, :-1], out=integral[y + 1, 1:])
+
+        # Suma de los ``size`` píxeles del segmento diagonal que empieza en (y, x) del borde ampliado
+        np.subtract(integral[size:size + height, size:size + width], integral[:height, :width],
+                    out=out, casting="unsafe")
+        out /= size
@@ -1,25 +1,65 @@
 from metal.preprocessing import *
 from metal.detection import *
 from metal.tools import Tools
+from metal.profiling import Profiler
+from metal.cache import ResultCache, pipeline_fingerprint
+from metal.ingest import ImageLoader
+from metal.pyramid import PyramidInspector
+from metal.gate import CleanPlateGate
+from concurrent.futures import ThreadPoolExecutor
 import logging
 
 class MainManager:
-    def __init__(self, config_path, image_path):
+    def __init__(self, config_path, image_path=None, profiler=None):
         self.config_path = config_path
         self.image_path = image_path
         self.config = None
         self.scratches_manager = None
         self.patches_manager = None
         self.detector_manager = None
+        self.scratches_detector_manager = None
+        self.patches_detector_manager = None
+        self.defect_type = None
+        self.branch_executor = None
+        self.branch_merger = None
+        self.profiler = profiler
+        self.cache = None
+        self.loader = None
+        self.pyramid = None
+        self.gate = None
+        self.loaded = False
         logging.basicConfig(level=logging.ERROR)
         self.logger = logging.getLogger(__name__)
 
     def start(self):
-        # Leer imagen
-        image = Tools.read_image(self.image_path)
+        # Configurar pipelines (solo la primera vez)
+        self.load()
 
-        # Configurar preprocesadores
-        if self.config_path:
+        return self.inspect_source(self.image_path)
+
+    def inspect_source(self, source, array=False):
+        """
+        Inspecciona una imagen a partir de una ruta, bytes codificados o un array, decodificada
+        según la sección ``ingest`` de la configuración. Las detecciones se devuelven siempre en
+        coordenadas de la imagen original, aunque se haya decodificado a resolución reducida.
+        Con ``array`` se devuelve un DetectionSet, como en ``inspect_array``.
+        """
+        if not self.loaded:
+            self.load()
+
+        image = self.loader.load(source)
+        results = self.inspect_array(image) if array else self.inspect(image)
+        return self.loader.scale_results(results)
+
+    def load(self):
+        """Carga la configuración y construye los pipelines una única vez"""
+        if self.loaded:
+            return self
+
+        # Configurar preprocesadores (ruta a un JSON o diccionario ya construido)
+        if isinstance(self.config_path, dict):
+            self.config = self.config_path
+        elif self.config_path:
             try:
                 self.config = Tools.parse_config(self.config_path)
                 self.logger.info(f"Configuración cargada desde {self.config_path}")
@@ -29,8 +69,20 @@ class MainManager:
         else:
             self.config = {}
 
+        # Decodificación de las imágenes de entrada
+        self.loader = ImageLoader.from_config(self.config)
+
+        # Instrumentación por etapa (desactivada por defecto)
+        if self.profiler is None:
+            self.profiler = Profiler.from_config(self.config)
+
+        # Caché de resultados (desactivada por defecto)
+        if self.cache is None:
+            self.cache = ResultCache.from_config(self.config)
+
         # Determinar tipo de defecto a detectar
         defect_type = self.config.get("defect_type", "auto")
+        self.defect_type = defect_type
 
         # Inicializar managers para cada tipo de defecto
         if defect_type in ["scratches", "auto"]:
@@ -46,22 +98,175 @@ class MainManager:
         if defect_type == "patches" or defect_type == "auto":
             self._init_detector("patches")
 
+        # En modo automático cada rama se ejecuta en su propio hilo (OpenCV libera el GIL)
+        if defect_type == "auto":
+            self.branch_executor = ThreadPoolExecutor(max_workers=2)
+            self.branch_merger = MultiDefectDetectionMethod(
+                self.scratches_detector_manager.method, self.patches_detector_manager.method
+            )
+
+        # Descarte previo de placas claramente limpias (desactivado por defecto)
+        self.gate = CleanPlateGate.from_config(self.config)
+
+        # Detección en dos escalas para imágenes grandes (desactivada por defecto)
+        self.pyramid = PyramidInspector.from_config(self, self.config)
+
+        self.loaded = True
+        return self
+
+    def inspect(self, image):
+        """Ejecuta los pipelines ya construidos sobre una imagen en memoria"""
+        if not self.loaded:
+            self.load()
+
+        return self._run(self._inspect, "inspect", image)
+
+    def _inspect(self, image):
+        if self._rejected(image):
+            return [DetectionResult(0, 0, 0, 0)]
+
+        if self.pyramid is not None and self.pyramid.applies(image):
+            return self.pyramid.inspect(image).to_results()
+
+        if self.defect_type == "auto":
+            return self._inspect_branches(image).to_results()
+
+        processed_image = self._preprocess(image)
+
+        # Ejecutar detección
+        results = self.detector_manager.execute(processed_image)
+
+        return results
+
+    def inspect_array(self, image):
+        """Igual que inspect, pero devuelve un DetectionSet sin la detección vacía de relleno"""
+        if not self.loaded:
+            self.load()
+
+        return self._run(self._inspect_array, "inspect_array", image)
+
+    def _run(self, inspect, kind, image):
+        """Ejecuta una inspección pasando por la caché de resultados y el profiler si están activos"""
+        if self.cache is None and self.profiler is None:
+            return inspect(image)
+
+        token = self.profiler.start() if self.profiler is not None else None
+
+        key = None
+        results = None
+        if self.cache is not None:
+            # La huella se recalcula en cada llamada: cualquier cambio de parámetros cambia la clave
+            key = self.cache.key(image, pipeline_fingerprint(self), kind)
+            results = self.cache.get(key)
+
+        if results is None:
+            results = inspect(image)
+            if key is not None:
+                self.cache.put(key, results)
+
+        if token is not None:
+            self.profiler.stop(token, "total", results)
+        return results
+
+    def _inspect_array(self, image):
+        if self._rejected(image):
+            return DetectionSet()
+
+        if self.pyramid is not None and self.pyramid.applies(image):
+            return self.pyramid.inspect(image)
+
+        return self._inspect_full(image)
+
+    def select(self, detections):
+        """
+        Selección final de la inspección de la imagen completa (fusión de ramas en modo automático
+        o la del detector de la rama única) aplicada a detecciones de varias teselas o regiones
+        """
+        if not self.loaded:
+            self.load()
+
+        if self.defect_type == "auto":
+            return self.branch_merger.select(detections)
+        return self.detector_manager.method.select(detections)
+
+    def _rejected(self, image):
+        """True si la puerta de placas limpias descarta la imagen antes del preprocesado"""
+        if self.gate is None:
+            return False
+
+        token = self.profiler.start() if self.profiler is not None else None
+        clean = self.gate.is_clean(image)
+        if token is not None:
+            self.profiler.stop(token, "gate")
+        return clean
+
+    def _inspect_full(self, image):
+        """Pipeline completo sobre toda la imagen, como DetectionSet"""
+        if self.defect_type == "auto":
+            return self._inspect_branches(image)
+
+        return self.detector_manager.execute_array(self._preprocess(image))
+
+    def pipeline_halo(self):
+        """Margen en píxeles que necesita el pipeline para que una tesela no dependa de sus bordes"""
+        if not self.loaded:
+            self.load()
+
+        branches = [(self.scratches_manager, self.scratches_detector_manager),
+                    (self.patches_manager, self.patches_detector_manager)]
+        halos = [preprocessing.halo() + detector.method.halo()
+                 for preprocessing, detector in branches if preprocessing and detector]
+        return max(halos, default=0)
+
+    def _preprocess(self, image):
         # Ejecutar preprocesadores
         if self.scratches_manager:
             image = self.scratches_manager.execute_all(image)
         if self.patches_manager:
             image = self.patches_manager.execute_all(image)
 
-        processed_image = image
+        return image
 
-        # Ejecutar detección
-        results = self.detector_manager.execute(processed_image)
+    def _inspect_branches(self, image):
+        """Ejecuta las ramas de rayones y manchas de forma independiente sobre la imagen original"""
+        scratches = self.branch_executor.submit(
+            self._run_branch, self.scratches_manager, self.scratches_detector_manager, image
+        )
+        patches = self.branch_executor.submit(
+            self._run_branch, self.patches_manager, self.patches_detector_manager, image
+        )
 
-        return results
+        # Fusionar resultados igual que MultiDefectDetectionMethod
+        return self.branch_merger.merge(scratches.result(), patches.result())
+
+    @staticmethod
+    def _run_branch(preprocessing_manager, detector_manager, image):
+        processed_image = preprocessing_manager.execute_all(image)
+        return detector_manager.execute_array(processed_image)
+
+    def __enter__(self):
+        return self.load()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Libera los hilos usados para ejecutar las ramas en paralelo y la caché en disco"""
+        if self.branch_executor is not None:
+            self.branch_executor.shutdown(wait=True)
+            self.branch_executor = None
+            self.loaded = False
+        if self.cache is not None:
+            # Escribe las fechas de acceso pendientes del nivel en disco y cierra la conexión
+            self.cache.close()
+            self.cache = None
+            self.loaded = False
 
     def _init_preprocessing_manager(self, defect_type):
         """Inicializa un manager de preprocesamiento para un tipo de defecto"""
-        manager = PreprocessingManager()
+        # Buffers reutilizados entre imágenes (activado por defecto)
+        buffer_pool = BufferPool() if self.config.get("buffer_pool", True) else None
+        manager = PreprocessingManager(buffer_pool=buffer_pool, profiler=self.profiler, name=defect_type)
 
         # Obtener métodos configurados
         methods_config = self.config.get(f"{defect_type}_preprocessing", [])
@@ -91,6 +296,13 @@ class MainManager:
                 manager.add_method(MorphologyMethod(operation='close', kernel_size=7))
                 manager.add_method(MorphologyMethod(operation='open', kernel_size=3))
 
+        # Compilar el plan de ejecución una sola vez para el formato que produce el cargador
+        plan_config = self.config.get("plan", {})
+        if plan_config.get("enabled", True):
+            plan = manager.compile(ImageFormat(self.loader.channels, np.uint8),
+                                   approximate=plan_config.get("approximate", False))
+            self.logger.info(f"Plan de {defect_type}: {plan.describe()}")
+
         # Asignar manager a la instancia
         setattr(self, f"{defect_type}_manager", manager)
 
@@ -114,6 +326,10 @@ class MainManager:
             self.logger.info(f"Usando detector predeterminado para {defect_type}")
             self.detector_manager = self._create_default_detector(defect_type)
 
+        # Instrumentación del detector
+        self.detector_manager.profiler = self.profiler
+        self.detector_manager.name = f"{defect_type}.detector"
+
         # Asignar detector a la instancia
         setattr(self, f"{defect_type}_detector_manager", self.detector_manager)
 
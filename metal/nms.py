@@ -0,0 +1,114 @@
+import numpy as np
+
+# Criterios de solapamiento soportados
+IOU = "iou"   # Intersección sobre unión
+IOMIN = "iomin"   # Intersección sobre el área de la caja más pequeña
+
+
+def _as_boxes(boxes):
+    """Convierte cualquier secuencia de cajas (x, y, w, h) en un array (N, 4) de float64"""
+    return np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+
+
+def box_overlap(box, boxes, criterion=IOU):
+    """
+    Calcula el solapamiento de una caja (x, y, w, h) con todas las cajas de un array (N, 4)
+    en una única operación vectorizada.
+    """
+    box = np.asarray(box, dtype=np.float64)
+    boxes = _as_boxes(boxes)
+
+    # Calcular intersección con todas las cajas a la vez
+    inter_w = np.minimum(box[0] + box[2], boxes[:, 0] + boxes[:, 2]) - np.maximum(box[0], boxes[:, 0])
+    inter_h = np.minimum(box[1] + box[3], boxes[:, 1] + boxes[:, 3]) - np.maximum(box[1], boxes[:, 1])
+    inter_area = np.maximum(inter_w, 0) * np.maximum(inter_h, 0)
+
+    area = box[2] * box[3]
+    areas = boxes[:, 2] * boxes[:, 3]
+
+    if criterion == IOU:
+        denominator = area + areas - inter_area
+    elif criterion == IOMIN:
+        denominator = np.minimum(area, areas)
+    else:
+        raise ValueError(f"Criterio de solapamiento desconocido: {criterion}")
+
+    # Evitar divisiones por cero con cajas degeneradas
+    return np.divide(inter_area, denominator, out=np.zeros_like(inter_area), where=denominator > 0)
+
+
+def non_max_suppression(boxes, threshold=0.5, criterion=IOU, scores=None, max_results=None):
+    """
+    Non-maximum suppression vectorizado.
+
+    :param boxes: Cajas (x, y, w, h) como array (N, 4) o secuencia de tuplas/DetectionResult.
+    :param threshold: Se eliminan las cajas cuyo solapamiento con una caja conservada supera este valor.
+    :param criterion: ``"iou"`` (intersección sobre unión) o ``"iomin"`` (intersección sobre la menor área).
+    :param scores: Prioridad de cada caja. Por defecto, su área.
+    :param max_results: Detener la supresión al conservar este número de cajas.
+    :return: Índices de las cajas conservadas, ordenados por prioridad descendente.
+    """
+    boxes = _as_boxes([tuple(b) for b in boxes] if isinstance(boxes, list) else boxes)
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    if scores is None:
+        scores = boxes[:, 2] * boxes[:, 3]
+
+    # Orden estable: a igual prioridad se respeta el orden de entrada
+    order = np.argsort(-np.asarray(scores, dtype=np.float64), kind="stable")
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+
+        if max_results is not None and len(keep) >= max_results:
+            break
+
+        # Comparar la caja conservada con todas las restantes de una vez
+        rest = order[1:]
+        overlap = box_overlap(boxes[i], boxes[rest], criterion)
+        order = rest[overlap <= threshold]
+
+    return np.array(keep, dtype=np.intp)
+
+
+def batched_non_max_suppression(boxes, groups, threshold=0.5, criterion=IOU, scores=None):
+    """
+    Aplica NMS de forma independiente a las cajas de muchas imágenes en una sola llamada.
+
+    Las cajas de cada grupo (imagen) se desplazan a una región disjunta del plano, de forma que
+    nunca se solapan con las de otro grupo y basta una única pasada de NMS.
+
+    :param groups: Identificador entero de la imagen a la que pertenece cada caja.
+    :return: Índices conservados, agrupados por imagen y ordenados por prioridad dentro de cada una.
+    """
+    boxes = _as_boxes(boxes)
+    groups = np.asarray(groups, dtype=np.int64).reshape(-1)
+    if len(boxes) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    if scores is None:
+        scores = boxes[:, 2] * boxes[:, 3]
+
+    # Desplazar cada grupo más allá de la extensión máxima de todas las cajas
+    offset = (boxes[:, 0] + boxes[:, 2]).max() - boxes[:, 0].min() + 1
+    shifted = boxes.copy()
+    shifted[:, 0] += (groups - groups.min()) * offset
+
+    keep = non_max_suppression(shifted, threshold, criterion, scores)
+    return keep[np.argsort(groups[keep], kind="stable")]
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """IoU de cada caja (x, y, w, h) de ``boxes_a`` con cada caja de ``boxes_b``: matriz (N, M)"""
+    a = _as_boxes(boxes_a)[:, None, :]
+    b = _as_boxes(boxes_b)[None, :, :]
+
+    inter_w = np.minimum(a[..., 0] + a[..., 2], b[..., 0] + b[..., 2]) - np.maximum(a[..., 0], b[..., 0])
+    inter_h = np.minimum(a[..., 1] + a[..., 3], b[..., 1] + b[..., 3]) - np.maximum(a[..., 1], b[..., 1])
+    inter_area = np.maximum(inter_w, 0) * np.maximum(inter_h, 0)
+
+    union = a[..., 2] * a[..., 3] + b[..., 2] * b[..., 3] - inter_area
+    return np.divide(inter_area, union, out=np.zeros_like(inter_area), where=union > 0)
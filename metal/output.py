@@ -0,0 +1,106 @@
+import json
+import struct
+
+import numpy as np
+
+from metal.detection import DEFECT_CLASSES, DETECTION_DTYPE, DetectionSet
+
+FORMATS = ("text", "jsonl", "binary")
+
+# Registros del formato binario: DETECTION_DTYPE empaquetado en little-endian (31 bytes)
+BINARY_DTYPE = DETECTION_DTYPE.newbyteorder("<")
+BINARY_HEADER = struct.Struct("<II")
+
+
+def detection_dicts(detections):
+    """Detecciones como diccionarios serializables en JSON (sin la detección vacía de relleno)"""
+    records = DetectionSet.from_results(detections).valid().records
+    return [{"x": int(r["px"]), "y": int(r["py"]), "w": int(r["width"]), "h": int(r["height"]),
+             "class": DEFECT_CLASSES[r["defect_class"]], "score": float(r["score"])}
+            for r in records]
+
+
+class TextWriter:
+    """
+    Formato histórico de ``main.py``: una línea ``x=..., y=..., w=..., h=...`` por detección,
+    precedidas de ``image=<ruta>`` en modo lote.
+    """
+
+    def __init__(self, stream, batch=False):
+        self.stream = stream
+        self.batch = batch
+
+    def write(self, detections, image=None):
+        if self.batch:
+            self.stream.write(f"image={image}\n")
+        if detections is None:
+            self.stream.write("error=No se pudo procesar la imagen\n")
+            return
+        if isinstance(detections, DetectionSet):
+            # Sin detecciones se escribe la línea vacía histórica (x=0, y=0, w=0, h=0)
+            detections = detections.to_results()
+        for d in detections:
+            self.stream.write(f"x={d.px}, y={d.py}, w={d.width}, h={d.height}\n")
+
+
+class JsonLinesWriter:
+    """Un objeto JSON por imagen: ``{"image": ..., "detections": [{"x", "y", "w", "h", "class", "score"}]}``"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, detections, image=None):
+        if detections is None:
+            line = {"image": image, "error": "No se pudo procesar la imagen"}
+        else:
+            line = {"image": image, "detections": detection_dicts(detections)}
+        self.stream.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
+class BinaryWriter:
+    """
+    Un bloque por imagen: cabecera ``<II`` (longitud del nombre en bytes, número de detecciones),
+    el nombre en UTF-8 y los registros ``BINARY_DTYPE``. Un error se indica con 0xFFFFFFFF
+    detecciones. Se lee con ``np.frombuffer(data, dtype=BINARY_DTYPE)``.
+    """
+
+    ERROR_COUNT = 0xFFFFFFFF
+
+    def __init__(self, stream):
+        # Flujo binario (sys.stdout.buffer o un fichero abierto en modo "wb")
+        self.stream = stream
+
+    def write(self, detections, image=None):
+        name = (image or "").encode("utf-8")
+        if detections is None:
+            self.stream.write(BINARY_HEADER.pack(len(name), self.ERROR_COUNT) + name)
+            return
+        records = DetectionSet.from_results(detections).valid().records.astype(BINARY_DTYPE)
+        self.stream.write(BINARY_HEADER.pack(len(name), len(records)) + name + records.tobytes())
+
+
+def read_binary(data):
+    """Decodifica la salida de ``BinaryWriter``: lista de (nombre, registros o None si hubo error)"""
+    blocks = []
+    offset = 0
+    while offset < len(data):
+        name_length, count = BINARY_HEADER.unpack_from(data, offset)
+        offset += BINARY_HEADER.size
+        name = bytes(data[offset:offset + name_length]).decode("utf-8")
+        offset += name_length
+        if count == BinaryWriter.ERROR_COUNT:
+            blocks.append((name, None))
+            continue
+        size = count * BINARY_DTYPE.itemsize
+        blocks.append((name, np.frombuffer(data, dtype=BINARY_DTYPE, count=count, offset=offset)))
+        offset += size
+    return blocks
+
+
+def create_writer(output_format, text_stream, binary_stream=None, batch=False):
+    """Escritor para el formato pedido; el binario usa ``binary_stream``"""
+    if output_format == "jsonl":
+        return JsonLinesWriter(text_stream)
+    if output_format == "binary":
+        return BinaryWriter(binary_stream if binary_stream is not None else text_stream.buffer)
+    return TextWriter(text_stream, batch=batch)
@@ -1,6 +1,38 @@
+import threading
+from collections import OrderedDict, namedtuple
+
 import cv2
 import numpy as np
 from abc import ABC, abstractmethod
+from metal.kernels import LineFilterKernel, LocalContrastKernel, ThreadLocalFactory, structuring_element
+
+
+class ImageFormat(namedtuple("ImageFormat", "channels dtype binary")):
+    """
+    Contrato de formato de la imagen que circula entre dos métodos: número de canales, dtype y si
+    es binaria (solo 0 y 255). None indica que el dato no se conoce.
+    """
+    __slots__ = ()
+
+    def __new__(cls, channels=None, dtype=None, binary=None):
+        return super().__new__(cls, channels, None if dtype is None else np.dtype(dtype), binary)
+
+    @classmethod
+    def of(cls, image):
+        """Formato de una imagen concreta (sin analizar si es binaria)"""
+        return cls(1 if image.ndim == 2 else image.shape[2], image.dtype)
+
+    def derive(self, **changes):
+        return ImageFormat(**{**self._asdict(), **changes})
+
+    @property
+    def is_binary_uint8(self):
+        return self.binary is True and self.dtype == np.uint8
+
+
+GRAY_UINT8 = ImageFormat(1, np.uint8, False)
+BINARY = ImageFormat(1, np.uint8, True)
+
 
 class PreprocessingMethod(ABC):
     @abstractmethod
@@ -8,24 +40,96 @@ class PreprocessingMethod(ABC):
         """Método abstracto que debe implementar cada método de preprocesado"""
         pass
 
+    def output_spec(self, image):
+        """
+        Forma y dtype de la salida para una entrada dada si el método admite escribir su
+        resultado en un buffer ``process(image, out=...)``; None si no lo admite.
+        """
+        return None
+
+    def process_batch(self, stack, out=None):
+        """
+        Procesa una pila (N, H, W[, C]) de imágenes del mismo tamaño y devuelve la pila de
+        resultados. Por defecto aplica ``process`` a cada imagen sobre una pila de salida reservada
+        una sola vez; los métodos vectorizables operan sobre toda la pila a la vez. ``out`` solo
+        se admite si ``output_spec`` no es None (forma ``(N,) + forma``).
+        """
+        spec = self.output_spec(stack[0]) if len(stack) else None
+        if spec is not None:
+            shape, dtype = spec
+            if out is None:
+                out = np.empty((len(stack),) + tuple(shape), dtype=dtype)
+            for image, image_out in zip(stack, out):
+                result = self.process(image, out=image_out)
+                if result is not image_out:
+                    image_out[...] = result
+            return out
+
+        for index, image in enumerate(stack):
+            result = self.process(image)
+            if out is None:
+                out = np.empty((len(stack),) + result.shape, dtype=result.dtype)
+            out[index] = result
+        return out if out is not None else stack.copy()
+
+    def halo(self):
+        """
+        Radio en píxeles de la vecindad que influye en cada píxel de salida. Se usa para
+        dimensionar el margen de solape al procesar una imagen por teselas.
+        """
+        return 0
+
+    def output_format(self, input_format):
+        """Contrato de salida (ImageFormat) para una entrada del formato indicado"""
+        return ImageFormat()
+
+    def is_identity(self, input_format):
+        """True si, con entradas de este formato, el método devuelve la entrada sin cambios"""
+        return False
+
 class GaussianBlurMethod(PreprocessingMethod):
     def __init__(self, sigma=1.0):
         self.sigma = sigma
 
-    def process(self, image):
-        return cv2.GaussianBlur(image, (0, 0), self.sigma)
+    def halo(self):
+        return int(np.ceil(4 * self.sigma))
+
+    def output_spec(self, image):
+        return image.shape, image.dtype
+
+    def output_format(self, input_format):
+        return input_format.derive(binary=False)
+
+    def process(self, image, out=None):
+        return cv2.GaussianBlur(image, (0, 0), self.sigma, dst=out)
 
 class MedianBlurMethod(PreprocessingMethod):
     def __init__(self, ksize=3):
         self.ksize = ksize if ksize % 2 == 1 else ksize + 1
 
-    def process(self, image):
-        return cv2.medianBlur(image, self.ksize)
+    def halo(self):
+        return self.ksize // 2
+
+    def output_spec(self, image):
+        return image.shape, image.dtype
+
+    def output_format(self, input_format):
+        # La mediana de una imagen binaria sigue siendo binaria
+        return input_format
+
+    def process(self, image, out=None):
+        return cv2.medianBlur(image, self.ksize, dst=out)
 
 class SobelGradientMethod(PreprocessingMethod):
     def __init__(self):
         pass
 
+    def halo(self):
+        return 1
+
+    def output_format(self, input_format):
+        return input_format.derive(dtype=np.uint8, binary=False)
+
     def process(self, image):
         grad_x = cv2.Sobel(image, cv2.CV_64F, 1, 0, ksize=3)
         grad_y = cv2.Sobel(image, cv2.CV_64F, 0, 1, ksize=3)
@@ -37,9 +141,35 @@ class ThresholdMethod(PreprocessingMethod):
     def __init__(self, factor=0.2):
         self.factor = factor
 
-    def process(self, image):
-        thresh = np.max(image) * self.factor
-        return (image > thresh).astype(np.uint8) * 255
+    def output_spec(self, image):
+        return image.shape, np.uint8
+
+    def output_format(self, input_format):
+        return input_format.derive(dtype=np.uint8, binary=True)
+
+    def is_identity(self, input_format):
+        # Sobre una imagen 0/255 cualquier umbral en [0, 255) la deja igual
+        return input_format.is_binary_uint8 and 0 <= self.factor < 1
+
+    def process(self, image, out=None):
+        return self._threshold(image, np.max(image) * self.factor, out)
+
+    def process_batch(self, stack, out=None):
+        if not len(stack):
+            return super().process_batch(stack, out=out)
+
+        # Umbral de cada imagen, con forma (N, 1, 1[, 1]) para compararlo con toda la pila
+        thresh = stack.reshape(len(stack), -1).max(axis=1) * self.factor
+        return self._threshold(stack, thresh.reshape((-1,) + (1,) * (stack.ndim - 1)), out)
+
+    @staticmethod
+    def _threshold(image, thresh, out):
+        if out is None:
+            return (image > thresh).astype(np.uint8) * 255
+
+        np.greater(image, thresh, out=out.view(np.bool_))
+        out *= 255
+        return out
 
 
 class AdaptiveThresholdMethod(PreprocessingMethod):
@@ -48,7 +178,17 @@ class AdaptiveThresholdMethod(PreprocessingMethod):
         self.C = C
         self.adaptive_method = adaptive_method
 
-    def process(self, image):
+    def halo(self):
+        # Mediana 3x3 previa más el bloque de la umbralización
+        return 1 + self.block_size // 2
+
+    def output_spec(self, image):
+        return image.shape[:2], np.uint8
+
+    def output_format(self, input_format):
+        return BINARY
+
+    def process(self, image, out=None):
 
         # Asegurar que la imagen sea de tipo uint8
         if image.dtype != np.uint8:
@@ -58,12 +198,13 @@ class AdaptiveThresholdMethod(PreprocessingMethod):
         if len(image.shape) > 2:
             image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-        # Suavizado para reducir ruido antes de umbralizar
-        image = cv2.medianBlur(image, 3)
+        # Suavizado para reducir ruido antes de umbralizar (la umbralización se hace
+        # sobre el mismo buffer, adaptiveThreshold admite trabajar in situ)
+        image = cv2.medianBlur(image, 3, dst=out)
 
         return cv2.adaptiveThreshold(
             image, 255, self.adaptive_method,
-            cv2.THRESH_BINARY_INV, self.block_size, self.C
+            cv2.THRESH_BINARY_INV, self.block_size, self.C, dst=image
         )
 
 
@@ -74,25 +215,61 @@ class MorphologyMethod(PreprocessingMethod):
         # Verificar si kernel_size ya es una tupla
         if isinstance(kernel_size, tuple):
             # Usar directamente como tamaño del kernel
-            self.kernel = cv2.getStructuringElement(kernel_type, kernel_size)
+            self.kernel = structuring_element(kernel_type, kernel_size)
         else:
             # Es un valor único, crear un kernel cuadrado
-            self.kernel = cv2.getStructuringElement(kernel_type, (kernel_size, kernel_size))
-
-    def process(self, image):
+            self.kernel = structuring_element(kernel_type, (kernel_size, kernel_size))
+
+    def halo(self):
+        radius = max(self.kernel.shape) // 2
+        # Apertura y cierre encadenan dos operaciones con el mismo kernel
+        return 2 * radius if self.operation in ('open', 'close') else radius
+
+    def output_spec(self, image):
+        if self.operation not in ('erode', 'dilate', 'open', 'close'):
+            return None
+        return image.shape, np.uint8
+
+    def output_format(self, input_format):
+        if input_format.dtype == np.uint8:
+            return input_format
+        # La entrada se binariza antes de operar, también con una operación desconocida
+        # (con un tipo desconocido puede llegar ya en uint8 y no binarizarse)
+        return input_format.derive(dtype=np.uint8, binary=True if input_format.dtype is not None else None)
+
+    def is_identity(self, input_format):
+        # Una operación desconocida solo deja la imagen igual si no hay que binarizarla
+        return self.operation not in ('erode', 'dilate', 'open', 'close') and input_format.dtype == np.uint8
+
+    def primitives(self):
+        """
+        Operación como secuencia de erosiones y dilataciones elementales (función de OpenCV,
+        tamaño (alto, ancho) del kernel rectangular y ancla (x, y)), o None si el kernel no es
+        rectangular y por tanto no se puede combinar con otros.
+        """
+        if not self.kernel.all():
+            return None
+        height, width = self.kernel.shape
+        primitive = {'erode': [cv2.erode], 'dilate': [cv2.dilate],
+                     'open': [cv2.erode, cv2.dilate], 'close': [cv2.dilate, cv2.erode]}.get(self.operation)
+        if primitive is None:
+            return None
+        return [(operation, (height, width), (width // 2, height // 2)) for operation in primitive]
+
+    def process(self, image, out=None):
 
         # Asegurar que la imagen es binaria
         if image.dtype != np.uint8:
             image = (image > 0).astype(np.uint8) * 255
 
         if self.operation == 'erode':
-            return cv2.erode(image, self.kernel)
+            return cv2.erode(image, self.kernel, dst=out)
         elif self.operation == 'dilate':
-            return cv2.dilate(image, self.kernel)
+            return cv2.dilate(image, self.kernel, dst=out)
         elif self.operation == 'open':
-            return cv2.morphologyEx(image, cv2.MORPH_OPEN, self.kernel)
+            return cv2.morphologyEx(image, cv2.MORPH_OPEN, self.kernel, dst=out)
         elif self.operation == 'close':
-            return cv2.morphologyEx(image, cv2.MORPH_CLOSE, self.kernel)
+            return cv2.morphologyEx(image, cv2.MORPH_CLOSE, self.kernel, dst=out)
         else:
             return image
 
@@ -103,27 +280,39 @@ class LocalContrastMethod(PreprocessingMethod):
         self.contrast_factor = contrast_factor
         self.offset = offset
 
-    def process(self, image):
-        # Convertir a float32 para cálculos
-        image_float = image.astype(np.float32)
+        # Aplicar un suavizado gaussiano 3x3 para reducir ruido antes del contraste local
+        self.kernel = LocalContrastKernel(kernel_size, contrast_factor, offset, pre_blur=3)
 
-        # Aplicar un suavizado gaussiano para reducir ruido antes del contraste local
-        image_float = cv2.GaussianBlur(image_float, (3, 3), 0)
+    def halo(self):
+        return 1 + self.kernel_size // 2
 
-        # Calcular media y desviación estándar locales
-        mean_local = cv2.boxFilter(image_float, -1, (self.kernel_size, self.kernel_size), normalize=True)
-        squared = image_float * image_float
-        mean_squared = cv2.boxFilter(squared, -1, (self.kernel_size, self.kernel_size), normalize=True)
-        std_local = np.sqrt(np.maximum(mean_squared - mean_local * mean_local, 0))
+    def output_spec(self, image):
+        return image.shape, np.uint8
 
-        # Realce de contraste con parámetros ajustables
-        result = ((image_float - mean_local) / (std_local + 1e-5)) * self.contrast_factor + self.offset
+    def output_format(self, input_format):
+        return input_format.derive(dtype=np.uint8, binary=False)
 
-        # Asegurar que el resultado esté en el rango 0-255 y sea uint8
-        return np.uint8(np.clip(result, 0, 255))
+    def process(self, image, out=None):
+        return self.kernel.apply(image, out=out)
+
+    def process_batch(self, stack, out=None):
+        if stack.ndim != 3:
+            return super().process_batch(stack, out=out)
+        return self.kernel.apply_batch(stack, out=out)
 
 
 class EnhancedPatchMethod(PreprocessingMethod):
+    def __init__(self):
+        # Realce de contraste local ajustado para manchas
+        self.contrast_kernel = LocalContrastKernel(kernel_size=25, contrast_factor=25, offset=128)
+
+    def halo(self):
+        # Suavizado 5x5, contraste 25x25, umbral 35x35, cierre 7x7 y apertura 3x3
+        return 2 + 12 + 17 + 6 + 2
+
+    def output_format(self, input_format):
+        return BINARY
+
     def process(self, image):
 
         # Convertir a escala de grises si es necesario
@@ -133,15 +322,8 @@ class EnhancedPatchMethod(PreprocessingMethod):
         # 1. Suavizado inicial para reducir ruido
         blurred = cv2.GaussianBlur(image, (5, 5), 0)
 
-        # 2. Realce de contraste local ajustado para manchas
-        img_float = blurred.astype(np.float32)
-        mean_local = cv2.boxFilter(img_float, -1, (25, 25), normalize=True)
-        squared = img_float * img_float
-        mean_squared = cv2.boxFilter(squared, -1, (25, 25), normalize=True)
-        std_local = np.sqrt(np.maximum(mean_squared - mean_local * mean_local, 0))
-
-        contrasted = ((img_float - mean_local) / (std_local + 1e-5)) * 25 + 128
-        contrasted = np.uint8(np.clip(contrasted, 0, 255))
+        # 2. Realce de contraste local ajustado para manchas (sobre el buffer del suavizado)
+        contrasted = self.contrast_kernel.apply(blurred, out=blurred)
 
         # 3. Umbralización adaptativa con parámetros optimizados para manchas
         binary = cv2.adaptiveThreshold(
@@ -151,11 +333,11 @@ class EnhancedPatchMethod(PreprocessingMethod):
 
         # 4. Operaciones morfológicas para conectar regiones fragmentadas
         # Aplicar cierre morfológico para conectar fragmentos
-        kernel_close = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (7, 7))
+        kernel_close = structuring_element(cv2.MORPH_ELLIPSE, (7, 7))
         closed = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel_close)
 
         # Remover ruido pequeño con apertura
-        kernel_open = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+        kernel_open = structuring_element(cv2.MORPH_ELLIPSE, (3, 3))
         final = cv2.morphologyEx(closed, cv2.MORPH_OPEN, kernel_open)
 
         return final
@@ -165,8 +347,19 @@ class CLAHEMethod(PreprocessingMethod):
     def __init__(self, clip_limit=2.0, grid_size=(8, 8)):
         self.clip_limit = clip_limit
         self.grid_size = grid_size
+        # Objeto CLAHE por hilo, creado en el primer uso (no es seguro compartirlo entre hilos)
+        self.clahe = ThreadLocalFactory(self._create_clahe)
 
-    def process(self, image):
+    def _create_clahe(self):
+        return cv2.createCLAHE(clipLimit=self.clip_limit, tileGridSize=self.grid_size)
+
+    def output_spec(self, image):
+        return image.shape[:2], np.uint8
+
+    def output_format(self, input_format):
+        return GRAY_UINT8
+
+    def process(self, image, out=None):
 
         # Asegurar que la imagen es de tipo uint8 y en escala de grises
         if image.dtype != np.uint8:
@@ -176,14 +369,23 @@ class CLAHEMethod(PreprocessingMethod):
             image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
         # Aplicar CLAHE (Contrast Limited Adaptive Histogram Equalization)
-        clahe = cv2.createCLAHE(clipLimit=self.clip_limit, tileGridSize=self.grid_size)
-        return clahe.apply(image)
+        return self.clahe.get().apply(image, dst=out)
 
 
 class DirectionalFilterMethod(PreprocessingMethod):
     def __init__(self, orientations=[0, 45, 90, 135], kernel_size=15):
         self.orientations = orientations
         self.kernel_size = kernel_size
+        # Medias direccionales de todas las orientaciones en una sola pasada (coste independiente
+        # de la longitud del kernel para 0°, 45°, 90° y 135°)
+        self.line_filter = LineFilterKernel(orientations, kernel_size)
+
+    def halo(self):
+        # Filtro direccional más la dilatación 3x3 de los máximos locales
+        return self.kernel_size // 2 + 1
+
+    def output_format(self, input_format):
+        return ImageFormat(1, np.float32, False)
 
     def process(self, image):
 
@@ -194,114 +396,116 @@ class DirectionalFilterMethod(PreprocessingMethod):
         if len(image.shape) > 2:
             image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-        # Convertir a float para operaciones
+        # Media direccional por orientación, apilada en un array (orientación, alto, ancho)
+        results = self.line_filter.apply(image)
         image_float = image.astype(np.float32)
 
-        # Resultados de filtros en diferentes orientaciones
-        results = []
-
-        for angle in self.orientations:
-            # Crear kernel direccional
-            size = self.kernel_size
-            kernel = np.zeros((size, size), dtype=np.float32)
-
-            # Llenar kernel según orientación
-            if angle == 0:  # Horizontal
-                kernel[size // 2, :] = 1
-            elif angle == 90:  # Vertical
-                kernel[:, size // 2] = 1
-            elif angle == 45:  # Diagonal 45°
-                for i in range(size):
-                    if 0 <= i < size and 0 <= i < size:
-                        kernel[i, i] = 1
-            elif angle == 135:  # Diagonal 135°
-                for i in range(size):
-                    if 0 <= i < size and 0 <= size - i - 1 < size:
-                        kernel[i, size - i - 1] = 1
-
-            # Normalizar kernel
-            kernel = kernel / np.sum(kernel)
-
-            # Aplicar filtro
-            filtered = cv2.filter2D(image_float, -1, kernel)
-
+        max_positions = np.zeros(image.shape, dtype=bool)
+        local_max = np.empty(image.shape, dtype=np.float32)
+        is_peak = np.empty(image.shape, dtype=bool)
+        dilate_kernel = structuring_element(cv2.MORPH_RECT, (3, 3))
+        for result in results:
             # Restar imagen original para resaltar diferencias
-            enhanced = cv2.absdiff(filtered, image_float)
-
-            results.append(enhanced)
+            cv2.absdiff(result, image_float, dst=result)
 
-        # Combinar resultados (máximo en cada píxel)
-        max_positions = np.zeros_like(image, dtype=np.uint8)
-        for result in results:
             # Detectar picos locales (posibles centros de rayones)
-            local_max = cv2.dilate(result, np.ones((3, 3), np.uint8))
-            local_max = (result == local_max) & (result > np.mean(result) + np.std(result))
-            max_positions = np.maximum(max_positions, local_max.astype(np.uint8) * 255)
+            mean, std = cv2.meanStdDev(result)
+            cv2.dilate(result, dilate_kernel, dst=local_max)
+            np.equal(result, local_max, out=is_peak)
+            is_peak &= result > mean[0, 0] + std[0, 0]
+            max_positions |= is_peak
 
-        # Combinar información de posición con la detección final
-        combined = np.zeros_like(results[0])
-        for result in results:
-            combined = np.maximum(combined, result)
+        # Combinar orientaciones (máximo en cada píxel) con una única reducción
+        final = results.max(axis=0)
 
         # Asegurar que los centros detectados se preserven en la imagen final
-        final = np.maximum(combined, max_positions)
+        np.maximum(final, 255, out=final, where=max_positions)
 
         return final
 
 class BrightScratchMethod(PreprocessingMethod):
-    def __init__(self, contrast_enhance=1.5, threshold_factor=0.7):
+    def __init__(self, contrast_enhance=1.5, threshold_factor=0.7, bright_fraction=0.15):
+        """
+        :param bright_fraction: fracción de píxeles más brillantes (tras CLAHE) que supera el umbral.
+        """
         self.contrast_enhance = contrast_enhance
         self.threshold_factor = threshold_factor
+        self.bright_fraction = bright_fraction
+        self.clahe = ThreadLocalFactory(self._create_clahe)
+        self._local = threading.local()
 
-    def process(self, image):
+        # Kernel direccional vertical alargado (para rayones verticales)
+        self.kernel_v = structuring_element(cv2.MORPH_RECT, (1, 7))
+        # Kernel direccional horizontal (para rayones horizontales)
+        self.kernel_h = structuring_element(cv2.MORPH_RECT, (7, 1))
+        # Kernel para conectar fragmentos del mismo rayón
+        self.kernel_close = structuring_element(cv2.MORPH_RECT, (3, 9))
 
-        # Asegurar escala de grises
-        if len(image.shape) > 2:
-            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        # La dilatación del cierre se combina con la de cada apertura: dilatar dos veces con
+        # kernels rectangulares equivale a dilatar una vez con su suma de Minkowski
+        self.dilate_v = structuring_element(cv2.MORPH_RECT, (3, 15))
+        self.dilate_h = structuring_element(cv2.MORPH_RECT, (9, 9))
 
-        # 1. Mejorar contraste para resaltar elementos brillantes
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(image)
+    def _create_clahe(self):
+        return cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
 
-        # 2. Aplicar umbralización para destacar solo elementos brillantes
-        # Calcular umbral adaptativo basado en histograma
-        hist = cv2.calcHist([enhanced], [0], None, [256], [0, 256])
-        total_pixels = enhanced.shape[0] * enhanced.shape[1]
+    def _scratch(self, shape):
+        """Buffer de trabajo del hilo actual para una forma de imagen"""
+        scratch = getattr(self._local, "scratch", None)
+        if scratch is None or scratch.shape != shape:
+            scratch = self._local.scratch = np.empty(shape, dtype=np.uint8)
+        return scratch
 
-        # Encontrar umbral que separe el top 10-15% más brillante
-        cumsum = 0
-        for i in range(255, -1, -1):
-            cumsum += hist[i][0]
-            if cumsum / total_pixels > 0.15:  # Ajustar este valor según necesidades
-                threshold = i
-                break
+    def halo(self):
+        # Aperturas direccionales de 7 píxeles y cierre (3, 9)
+        return 2 * 3 + 2 * 4
 
-        binary = cv2.threshold(enhanced, threshold, 255, cv2.THRESH_BINARY)[1]
+    def output_spec(self, image):
+        return image.shape[:2], np.uint8
 
-        # 3. Aplicar operaciones morfológicas específicas para rayones
-        # Kernel direccional vertical alargado (para rayones verticales)
-        kernel_v = cv2.getStructuringElement(cv2.MORPH_RECT, (1, 7))
-        # Kernel direccional horizontal (para rayones horizontales)
-        kernel_h = cv2.getStructuringElement(cv2.MORPH_RECT, (7, 1))
+    def output_format(self, input_format):
+        return BINARY
+
+    def bright_threshold(self, image):
+        """Menor nivel de gris tal que más de ``bright_fraction`` de los píxeles lo alcanzan"""
+        hist = cv2.calcHist([image], [0], None, [256], [0, 256]).ravel()
+        # Píxeles con nivel >= 255, >= 254, ... (histograma acumulado desde el extremo brillante)
+        bright_counts = np.cumsum(hist[::-1], dtype=np.int64)
+        index = np.searchsorted(bright_counts, self.bright_fraction * image.size, side="right")
+        return 255 - min(index, 255)
+
+    def process(self, image, out=None):
+
+        # Asegurar escala de grises
+        if len(image.shape) > 2:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
 
-        # Aplicar aperturas direccionales para eliminar ruido pequeño
-        opened_v = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel_v)
-        opened_h = cv2.morphologyEx(binary, cv2.MORPH_OPEN, kernel_h)
+        # 1. Mejorar contraste para resaltar elementos brillantes
+        enhanced = self.clahe.get().apply(image, dst=out)
 
-        # Combinar resultados
-        combined = cv2.bitwise_or(opened_v, opened_h)
+        # 2. Umbral en el cuantil de los píxeles más brillantes, sobre el propio buffer de CLAHE
+        binary = cv2.threshold(enhanced, self.bright_threshold(enhanced), 255, cv2.THRESH_BINARY,
+                               dst=enhanced)[1]
 
-        # 4. Conectar fragmentos del mismo rayón
-        kernel_close = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 9))
-        closed = cv2.morphologyEx(combined, cv2.MORPH_CLOSE, kernel_close)
+        # 3. Aperturas direccionales para eliminar ruido pequeño, unidas por el máximo y cerradas
+        # para conectar fragmentos del mismo rayón:
+        #   cierre(apertura_v | apertura_h) = erosión_c(dilatación_v+c(erosión_v) | dilatación_h+c(erosión_h))
+        vertical = cv2.erode(binary, self.kernel_v, dst=self._scratch(binary.shape))
+        cv2.dilate(vertical, self.dilate_v, dst=vertical)
+        horizontal = cv2.erode(binary, self.kernel_h, dst=binary)
+        cv2.dilate(horizontal, self.dilate_h, dst=horizontal)
+        combined = cv2.max(horizontal, vertical, dst=horizontal)
 
-        return closed
+        return cv2.erode(combined, self.kernel_close, dst=combined)
 
 class AdaptiveStatsThresholdMethod(PreprocessingMethod):
     def __init__(self, std_factor=1.5, offset=0):
         self.std_factor = std_factor
         self.offset = offset
 
+    def output_format(self, input_format):
+        return BINARY
+
     def process(self, image):
 
         # Asegurar formato correcto
@@ -320,18 +524,48 @@ class AdaptiveStatsThresholdMethod(PreprocessingMethod):
 
         return binary
 
+    def process_batch(self, stack, out=None):
+        if not len(stack):
+            return super().process_batch(stack, out=out)
+
+        # Pila en color (N, H, W, C): se convierte como una sola imagen (N * H, W, C)
+        if stack.ndim > 3:
+            gray = cv2.cvtColor(np.ascontiguousarray(stack).reshape(-1, *stack.shape[2:]), cv2.COLOR_BGR2GRAY)
+            stack = gray.reshape(stack.shape[:3])
+
+        # Estadísticas globales de cada imagen
+        pixels = stack.reshape(len(stack), -1)
+        threshold = pixels.mean(axis=1) + (self.std_factor * pixels.std(axis=1)) + self.offset
+
+        return ThresholdMethod._threshold(stack, threshold[:, None, None], out)
+
 
 class InvertMethod(PreprocessingMethod):
     def __init__(self):
         pass
 
-    def process(self, image):
-        return 255 - image
+    def output_spec(self, image):
+        return image.shape, image.dtype
+
+    def output_format(self, input_format):
+        return input_format
+
+    def process(self, image, out=None):
+        if out is None:
+            return 255 - image
+        return np.subtract(255, image, out=out)
+
+    def process_batch(self, stack, out=None):
+        # Operación elemento a elemento: la pila se invierte de una vez
+        return self.process(stack, out=out)
 
 class NormalizeMethod(PreprocessingMethod):
     def __init__(self):
         pass
 
+    def output_format(self, input_format):
+        return input_format.derive(dtype=np.uint8, binary=False)
+
     def process(self, image):
         min_val = np.min(image)
         max_val = np.max(image)
@@ -341,24 +575,368 @@ class NormalizeMethod(PreprocessingMethod):
             norm = image.copy()
         return np.uint8(norm)
 
+    def process_batch(self, stack, out=None):
+        if not len(stack):
+            return super().process_batch(stack, out=out)
+
+        # Mínimo y máximo de cada imagen, con forma (N, 1, 1[, 1])
+        pixels = stack.reshape(len(stack), -1)
+        shape = (-1,) + (1,) * (stack.ndim - 1)
+        min_val = pixels.min(axis=1).reshape(shape)
+        max_val = pixels.max(axis=1).reshape(shape)
+
+        # Las imágenes de valor constante se dejan igual (rango 1 para no dividir por cero)
+        value_range = np.where(max_val > min_val, max_val - min_val, 1)
+        norm = 255.0 * (stack - min_val) / value_range
+        result = np.uint8(np.where(max_val > min_val, norm, stack))
+        if out is None:
+            return result
+        out[...] = result
+        return out
+
 class UmbralizeMethod(PreprocessingMethod):
-    def process(self, image):
-        _, processed_image = cv2.threshold(image, 200, 255, cv2.THRESH_BINARY)
+    def output_spec(self, image):
+        return image.shape, image.dtype
+
+    def output_format(self, input_format):
+        return input_format.derive(binary=True)
+
+    def is_identity(self, input_format):
+        # Umbral fijo en 200: una imagen 0/255 no cambia
+        return input_format.is_binary_uint8
+
+    def process(self, image, out=None):
+        _, processed_image = cv2.threshold(image, 200, 255, cv2.THRESH_BINARY, dst=out)
         return processed_image
 
 class CannyMethod(PreprocessingMethod):
-    def process(self, image):
-        processed_image = cv2.Canny(image, threshold1=100, threshold2=100 * 2)
+    def halo(self):
+        return 2
+
+    def output_spec(self, image):
+        return image.shape[:2], np.uint8
+
+    def output_format(self, input_format):
+        return BINARY
+
+    def process(self, image, out=None):
+        processed_image = cv2.Canny(image, threshold1=100, threshold2=100 * 2, edges=out)
         return processed_image
 
+class PlanStep(PreprocessingMethod):
+    """Paso generado al compilar un plan a partir de varios métodos configurados"""
+
+
+class FusedMorphologyStep(PlanStep):
+    """
+    Secuencia de operaciones morfológicas con kernels rectangulares. Las erosiones (o dilataciones)
+    consecutivas se combinan en una sola con el kernel suma de Minkowski: con el borde neutro de
+    OpenCV el resultado es idéntico y se ahorra una pasada por cada combinación.
+    """
+
+    def __init__(self, primitives):
+        self.primitives = []
+        for operation, (height, width), (ax, ay) in primitives:
+            if self.primitives and self.primitives[-1][0] is operation:
+                _, (h, w), (px, py) = self.primitives.pop()
+                height, width, ax, ay = h + height - 1, w + width - 1, px + ax, py + ay
+            self.primitives.append((operation, (height, width), (ax, ay)))
+
+        self.kernels = [np.ones(size, dtype=np.uint8) for _, size, _ in self.primitives]
+
+    def halo(self):
+        return sum(max(size) // 2 for _, size, _ in self.primitives)
+
+    def output_spec(self, image):
+        return image.shape, np.uint8
+
+    def output_format(self, input_format):
+        if input_format.dtype != np.uint8:
+            return input_format.derive(dtype=np.uint8, binary=True)
+        return input_format
+
+    def process(self, image, out=None):
+
+        # Asegurar que la imagen es binaria (igual que MorphologyMethod)
+        if image.dtype != np.uint8:
+            image = (image > 0).astype(np.uint8) * 255
+
+        # La primera operación escribe en la salida y las siguientes trabajan in situ
+        for (operation, _, anchor), kernel in zip(self.primitives, self.kernels):
+            image = operation(image, kernel, dst=out, anchor=anchor)
+            out = image
+        return image
+
+
+class FusedBlurContrastStep(PlanStep):
+    """
+    GaussianBlurMethod seguido de LocalContrastMethod: los dos suavizados se aplican como un único
+    filtro separable (convolución de ambos kernels) en float32, sin la imagen intermedia uint8.
+    El resultado no es idéntico bit a bit (no hay redondeo intermedio y cambia el tratamiento del
+    borde), por lo que solo se usa en planes compilados con ``approximate=True``.
+    """
+
+    def __init__(self, blur, contrast):
+        self.blur = blur
+        self.contrast = contrast
+
+        # Mismo tamaño de kernel que elige OpenCV para un GaussianBlur de sigma dado sobre uint8
+        blur_size = int(round(blur.sigma * 3 * 2 + 1)) | 1
+        blur_kernel = cv2.getGaussianKernel(blur_size, blur.sigma).ravel()
+        pre_blur = contrast.kernel.pre_blur
+        contrast_kernel = cv2.getGaussianKernel(pre_blur, 0).ravel() if pre_blur else np.ones(1)
+        self.pre_filter = np.convolve(blur_kernel, contrast_kernel).astype(np.float32)
+
+    def halo(self):
+        return self.blur.halo() + self.contrast.halo()
+
+    def output_spec(self, image):
+        return image.shape, np.uint8
+
+    def output_format(self, input_format):
+        return input_format.derive(dtype=np.uint8, binary=False)
+
+    def process(self, image, out=None):
+        return self.contrast.kernel.apply(image, out=out, pre_filter=self.pre_filter)
+
+
+# Marca de dos pasos que se anulan entre sí y se eliminan del plan
+CANCELLED = object()
+
+
+def fuse(first, second, input_format, approximate=False):
+    """
+    Intenta combinar dos pasos consecutivos del plan. Devuelve el paso combinado, CANCELLED si
+    ambos se anulan o None si no se pueden combinar. ``input_format`` es el formato de entrada
+    de ``first``.
+    """
+    # Operaciones morfológicas consecutivas con kernels rectangulares
+    first_primitives = _primitives(first)
+    second_primitives = _primitives(second)
+    if first_primitives and second_primitives:
+        return FusedMorphologyStep(first_primitives + second_primitives)
+
+    # Dos inversiones seguidas sobre uint8 dejan la imagen igual
+    if type(first) is InvertMethod and type(second) is InvertMethod and input_format.dtype == np.uint8:
+        return CANCELLED
+
+    # Suavizado gaussiano seguido del suavizado interno del contraste local (aproximado)
+    if (approximate and type(first) is GaussianBlurMethod and type(second) is LocalContrastMethod
+            and input_format.dtype == np.uint8):
+        return FusedBlurContrastStep(first, second)
+
+    return None
+
+
+def _primitives(step):
+    if isinstance(step, FusedMorphologyStep):
+        return step.primitives
+    if type(step) is MorphologyMethod:
+        return step.primitives()
+    return None
+
+
+class PipelinePlan:
+    """
+    Plan de ejecución compilado a partir de la lista de métodos de un PreprocessingManager para
+    un formato de entrada concreto. Propaga los contratos de formato de cada método para eliminar
+    los pasos que no cambian la imagen y combinar pasos consecutivos compatibles (ver ``fuse``).
+
+    ``steps`` es una lista de pares (etiqueta, paso); la etiqueta indica el índice (o rango de
+    índices) de los métodos configurados que cubre el paso.
+    """
+
+    def __init__(self, methods, input_format=None, approximate=False):
+        self.input_format = input_format or ImageFormat()
+        self.approximate = approximate
+        self.steps = []
+
+        # Entradas (primer índice, último índice, paso, formato de entrada)
+        entries = []
+        current = self.input_format
+        for index, method in enumerate(methods):
+            if not isinstance(method, PreprocessingMethod):
+                # Objeto ajeno a la jerarquía: se ejecuta tal cual y su salida es desconocida
+                entries.append((index, index, method, current))
+                current = ImageFormat()
+                continue
+
+            if method.is_identity(current):
+                continue
+
+            if entries and isinstance(entries[-1][2], PreprocessingMethod):
+                first_index, _, previous, previous_format = entries[-1]
+                fused = fuse(previous, method, previous_format, approximate)
+                if fused is CANCELLED:
+                    entries.pop()
+                    current = previous_format
+                    continue
+                if fused is not None:
+                    entries[-1] = (first_index, index, fused, previous_format)
+                    current = fused.output_format(previous_format)
+                    continue
+
+            entries.append((index, index, method, current))
+            current = method.output_format(current)
+
+        self.output_format = current
+        for first_index, last_index, step, _ in entries:
+            label = str(first_index) if first_index == last_index else f"{first_index}-{last_index}"
+            self.steps.append((f"{label}.{type(step).__name__}", step))
+
+    @classmethod
+    def plain(cls, methods):
+        """Plan sin compilar: un paso por método, en el orden configurado"""
+        plan = cls([])
+        plan.steps = [(f"{index}.{type(method).__name__}", method) for index, method in enumerate(methods)]
+        return plan
+
+    def describe(self):
+        return [label for label, _ in self.steps]
+
+
+class BufferPool:
+    """
+    Buffers de trabajo reutilizables, indexados por forma y dtype. Hay dos buffers por clave
+    para que una cadena de métodos alterne entre ellos (ping-pong) sin escribir nunca sobre
+    su propia entrada. Cada hilo tiene sus propios buffers.
+
+    Se conservan como mucho ``max_shapes`` claves por hilo (las de uso más reciente), de modo que
+    procesar regiones de tamaños variables no acumula memoria. Descartar una clave solo suelta la
+    referencia del pool: los buffers que aún se estén usando siguen siendo válidos.
+    """
+
+    def __init__(self, max_shapes=8):
+        self.max_shapes = max_shapes
+        self._local = threading.local()
+
+    def get(self, shape, dtype, avoid=None):
+        """Devuelve un buffer de la forma y dtype pedidos que no sea ``avoid``"""
+        buffers = self._local.__dict__.get("buffers")
+        if buffers is None:
+            buffers = self._local.buffers = OrderedDict()
+        key = (tuple(shape), np.dtype(dtype))
+
+        pair = buffers.get(key)
+        if pair is None:
+            pair = buffers[key] = (np.empty(shape, dtype=dtype), np.empty(shape, dtype=dtype))
+            if len(buffers) > self.max_shapes:
+                buffers.popitem(last=False)
+        else:
+            buffers.move_to_end(key)
+
+        return pair[1] if pair[0] is avoid else pair[0]
+
+    def clear(self):
+        self._local.__dict__.pop("buffers", None)
+
 class PreprocessingManager:
-    def __init__(self):
+    def __init__(self, buffer_pool=None, profiler=None, name="preprocessing"):
+        """
+        :param buffer_pool: BufferPool opcional. Si se indica, los métodos que lo admiten escriben
+            en buffers reutilizados y el resultado de ``execute_all`` solo es válido hasta la
+            siguiente llamada desde el mismo hilo.
+        :param profiler: Profiler opcional que mide cada paso con el nombre ``<name>.<i>.<Clase>``.
+        """
         self.methods = []
+        self.buffer_pool = buffer_pool
+        self.profiler = profiler
+        self.name = name
+        # Planes compilados por formato de entrada (None si no se ha llamado a compile)
+        self.plans = None
+        self.approximate = False
+        self._plain_plan = None
 
     def add_method(self, method: PreprocessingMethod):
         self.methods.append(method)
+        self._plain_plan = None
+        if self.plans is not None:
+            self.plans = {}
+
+    def halo(self):
+        """Margen acumulado de toda la cadena de métodos"""
+        return sum(method.halo() for method in self.methods)
+
+    def compile(self, input_format=None, approximate=False):
+        """
+        Activa la ejecución mediante planes compilados. Si se indica el formato de entrada esperado
+        el plan se construye ya; los planes de otros formatos se construyen la primera vez que
+        llega una imagen de ese formato y se reutilizan después.
+
+        :param approximate: permite combinaciones que no dan un resultado idéntico bit a bit.
+        """
+        self.approximate = approximate
+        self.plans = {}
+        if input_format is not None:
+            return self.plan_for(input_format)
+        return None
+
+    def plan_for(self, input_format):
+        if self.plans is None:
+            if self._plain_plan is None:
+                self._plain_plan = PipelinePlan.plain(self.methods)
+            return self._plain_plan
+
+        key = (input_format.channels, input_format.dtype)
+        plan = self.plans.get(key)
+        if plan is None:
+            plan = self.plans[key] = PipelinePlan(self.methods, ImageFormat(*key), self.approximate)
+        return plan
 
     def execute_all(self, image):
-        for method in self.methods:
-            image = method.process(image)
+        plan = self.plan_for(ImageFormat.of(image) if self.plans is not None else None)
+        for label, method in plan.steps:
+            if self.profiler is None:
+                image = self._execute(method, image)
+            else:
+                token = self.profiler.start()
+                image = self._execute(method, image)
+                self.profiler.stop(token, f"{self.name}.{label}", image)
         return image
+
+    def execute_all_batch(self, stack):
+        """
+        Igual que ``execute_all`` para una pila (N, H, W[, C]) de imágenes del mismo tamaño, con
+        una llamada ``process_batch`` por paso del plan en lugar de una por imagen y paso.
+        Una pila vacía se devuelve copiada: sin imágenes no se conoce el formato de entrada.
+        """
+        if not len(stack):
+            return stack.copy()
+
+        plan = self.plan_for(ImageFormat.of(stack[0]) if self.plans is not None else None)
+        for label, method in plan.steps:
+            if self.profiler is None:
+                stack = self._execute_batch(method, stack)
+            else:
+                token = self.profiler.start()
+                stack = self._execute_batch(method, stack)
+                self.profiler.stop(token, f"{self.name}.{label}", stack)
+        return stack
+
+    def _execute_batch(self, method, stack):
+        if not isinstance(method, PreprocessingMethod):
+            # Objeto ajeno a la jerarquía: solo se sabe procesar imagen a imagen
+            return np.stack([method.process(image) for image in stack])
+
+        spec = None
+        if self.buffer_pool is not None and len(stack):
+            spec = method.output_spec(stack[0])
+
+        if spec is None:
+            return method.process_batch(stack)
+
+        shape, dtype = spec
+        out = self.buffer_pool.get((len(stack),) + tuple(shape), dtype, avoid=stack)
+        return method.process_batch(stack, out=out)
+
+    def _execute(self, method, image):
+        spec = None
+        if self.buffer_pool is not None and isinstance(method, PreprocessingMethod):
+            spec = method.output_spec(image)
+
+        if spec is None:
+            # Método sin soporte de buffers: reserva su propia salida
+            return method.process(image)
+
+        shape, dtype = spec
+        return method.process(image, out=self.buffer_pool.get(shape, dtype, avoid=image))
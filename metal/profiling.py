@@ -0,0 +1,158 @@
+import json
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+
+class StageStats:
+    """Estadísticas acumuladas de una etapa (método de preprocesado o detector)"""
+
+    def __init__(self, window):
+        self.count = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self.output_bytes = 0
+        self.allocated_bytes = 0
+        self.output_shape = None
+        self.output_dtype = None
+        # Últimas muestras para calcular percentiles con memoria acotada
+        self.samples = deque(maxlen=window)
+
+    def add(self, seconds, output, allocated_bytes):
+        self.count += 1
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.samples.append(seconds)
+
+        if allocated_bytes is not None:
+            self.allocated_bytes += allocated_bytes
+
+        if isinstance(output, np.ndarray):
+            self.output_bytes += output.nbytes
+            self.output_shape = tuple(output.shape)
+            self.output_dtype = str(output.dtype)
+        elif output is not None and hasattr(output, "__len__"):
+            # Detecciones: se registra el número de resultados
+            self.output_shape = (len(output),)
+            self.output_dtype = type(output).__name__
+
+    def percentile(self, q):
+        return float(np.percentile(np.fromiter(self.samples, dtype=np.float64), q)) if self.samples else 0.0
+
+    def summary(self, trace_memory):
+        summary = {
+            "count": self.count,
+            "total_seconds": self.total_seconds,
+            "mean_ms": 1000 * self.total_seconds / self.count if self.count else 0.0,
+            "p50_ms": 1000 * self.percentile(50),
+            "p95_ms": 1000 * self.percentile(95),
+            "p99_ms": 1000 * self.percentile(99),
+            "max_ms": 1000 * self.max_seconds,
+            "output_bytes": self.output_bytes // self.count if self.count else 0,
+            "output_shape": list(self.output_shape) if self.output_shape is not None else None,
+            "output_dtype": self.output_dtype,
+        }
+        if trace_memory:
+            summary["allocated_bytes"] = self.allocated_bytes // self.count if self.count else 0
+        return summary
+
+
+class Profiler:
+    """
+    Instrumentación por etapa de los pipelines: tiempo de pared, bytes de salida, forma y dtype
+    de la salida y, opcionalmente, memoria reservada (con tracemalloc, que añade sobrecoste).
+
+    La memoria de una etapa es la diferencia del uso actual de tracemalloc entre ``start`` y
+    ``stop``: lo que la etapa deja reservado (su salida, buffers nuevos), no su pico transitorio.
+    El pico de tracemalloc es global al proceso, así que no se reinicia y las medidas anidadas
+    (``total`` y cada etapa) no se afectan entre sí. Con etapas concurrentes (las ramas en paralelo
+    del modo automático) cada cifra incluye también lo reservado por el otro hilo en ese intervalo.
+
+    Los managers solo llaman al profiler si está configurado; sin él no hay ningún sobrecoste.
+    """
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, trace_memory=False, window=10000):
+        self.trace_memory = trace_memory
+        self.window = window
+        self.stages = {}
+        self._lock = threading.Lock()
+
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @classmethod
+    def from_config(cls, config):
+        """Crea el profiler a partir de la sección ``profiling`` de la configuración (o None)"""
+        profiling = config.get("profiling") or {}
+        if not profiling.get("enabled", False):
+            return None
+        return cls(trace_memory=profiling.get("trace_memory", False), window=profiling.get("window", 10000))
+
+    def start(self):
+        """Marca el inicio de una medida y devuelve el instante de inicio"""
+        if self.trace_memory:
+            return time.perf_counter(), tracemalloc.get_traced_memory()[0]
+        return time.perf_counter(), None
+
+    def stop(self, token, stage, output=None):
+        """Registra la medida iniciada con ``start`` para la etapa indicada"""
+        start_time, start_memory = token
+        seconds = time.perf_counter() - start_time
+        allocated = None
+        if start_memory is not None:
+            allocated = max(tracemalloc.get_traced_memory()[0] - start_memory, 0)
+
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = StageStats(self.window)
+            stats.add(seconds, output, allocated)
+
+    def reset(self):
+        with self._lock:
+            self.stages = {}
+
+    def summary(self):
+        with self._lock:
+            return {stage: stats.summary(self.trace_memory) for stage, stats in self.stages.items()}
+
+    def to_json(self):
+        return json.dumps({"stages": self.summary()}, indent=2)
+
+    def to_prometheus(self, prefix="metal"):
+        """Volcado en formato de texto de Prometheus (métricas de tipo summary)"""
+        lines = [
+            f"# HELP {prefix}_stage_seconds Tiempo de pared por etapa del pipeline.",
+            f"# TYPE {prefix}_stage_seconds summary",
+        ]
+        with self._lock:
+            for stage, stats in self.stages.items():
+                for q in self.QUANTILES:
+                    lines.append(f'{prefix}_stage_seconds{{stage="{stage}",quantile="{q}"}} '
+                                 f'{stats.percentile(100 * q):.9f}')
+                lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {stats.total_seconds:.9f}')
+                lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {stats.count}')
+
+            lines.append(f"# HELP {prefix}_stage_output_bytes_total Bytes de salida producidos por etapa.")
+            lines.append(f"# TYPE {prefix}_stage_output_bytes_total counter")
+            for stage, stats in self.stages.items():
+                lines.append(f'{prefix}_stage_output_bytes_total{{stage="{stage}"}} {stats.output_bytes}')
+
+            if self.trace_memory:
+                lines.append(f"# HELP {prefix}_stage_allocated_bytes_total Memoria reservada por etapa.")
+                lines.append(f"# TYPE {prefix}_stage_allocated_bytes_total counter")
+                for stage, stats in self.stages.items():
+                    lines.append(f'{prefix}_stage_allocated_bytes_total{{stage="{stage}"}} {stats.allocated_bytes}')
+
+        return "\n".join(lines) + "\n"
+
+    def save(self, path):
+        """Guarda el resumen en JSON o, si la ruta termina en .prom o .txt, en formato Prometheus"""
+        content = self.to_prometheus() if path.endswith((".prom", ".txt")) else self.to_json()
+        with open(path, "w") as file:
+            file.write(content)
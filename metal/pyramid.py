@@ -0,0 +1,173 @@
+import cv2
+import numpy as np
+
+from metal.detection import DetectionSet
+
+
+class PyramidInspector:
+    """
+    Detección en dos escalas para placas grandes y mayoritariamente limpias.
+
+    1. La imagen se reduce ``factor`` veces (2 o 4) y cada rama aplica su preprocesado a la imagen
+       reducida. Los componentes conectados del resultado son los candidatos: se conservan los que,
+       llevados a resolución completa, quedan dentro de los límites de tamaño del detector de la
+       rama (``area_min``/``min_length`` multiplicados por ``margin`` y ``area_max``/``max_width``
+       divididos por ``margin``). Un ``margin`` menor da más candidatos (más recall) a cambio de
+       procesar más regiones; sin límites conocidos todos los componentes son candidatos.
+    2. Cada candidato se amplía con el halo del pipeline más ``padding`` píxeles, las regiones que
+       se solapan se unen y el pipeline completo se ejecuta solo sobre ellas. Las detecciones se
+       devuelven en coordenadas de la imagen completa.
+
+    Si las regiones cubren más de ``max_coverage`` de la imagen o son más de ``max_regions``, se
+    procesa la imagen completa: el peor caso no es más lento que sin pirámide. Las imágenes cuyo
+    lado menor es inferior a ``min_size`` se procesan siempre completas.
+
+    Como en el procesado por teselas, los métodos con estadísticas globales (CLAHE, umbrales por
+    histograma o por máximo) se evalúan con las estadísticas de cada región.
+    """
+
+    def __init__(self, manager, factor=4, margin=0.5, padding=16, min_size=512, max_coverage=0.5,
+                 max_regions=32):
+        self.manager = manager
+        self.factor = factor
+        self.margin = margin
+        self.padding = padding
+        self.min_size = min_size
+        self.max_coverage = max_coverage
+        self.max_regions = max_regions
+        self.counters = {"images": 0, "full": 0, "clean": 0, "regions": 0}
+
+    @classmethod
+    def from_config(cls, manager, config):
+        """Sección ``pyramid`` de la configuración; None si no está activada"""
+        section = config.get("pyramid", {})
+        if not section.get("enabled", False):
+            return None
+        return cls(manager, factor=section.get("factor", 4), margin=section.get("margin", 0.5),
+                   padding=section.get("padding", 16), min_size=section.get("min_size", 512),
+                   max_coverage=section.get("max_coverage", 0.5), max_regions=section.get("max_regions", 32))
+
+    def parameters(self):
+        """Parámetros que influyen en el resultado (forman parte de la huella de la caché)"""
+        return {"factor": self.factor, "margin": self.margin, "padding": self.padding, "min_size": self.min_size,
+                "max_coverage": self.max_coverage, "max_regions": self.max_regions}
+
+    def applies(self, image):
+        return min(image.shape[:2]) >= self.min_size
+
+    def branches(self):
+        """Pares (preprocesado, detector) de las ramas configuradas"""
+        manager = self.manager
+        if manager.defect_type == "auto":
+            return [(manager.scratches_manager, manager.scratches_detector_manager.method),
+                    (manager.patches_manager, manager.patches_detector_manager.method)]
+        return [(manager.scratches_manager or manager.patches_manager, manager.detector_manager.method)]
+
+    def candidates(self, image):
+        """Cajas (x, y, w, h) en resolución completa de los candidatos de la pasada reducida"""
+        height, width = image.shape[:2]
+        small = cv2.resize(image, (max(width // self.factor, 1), max(height // self.factor, 1)),
+                           interpolation=cv2.INTER_AREA)
+
+        boxes = []
+        for preprocessing, detector in self.branches():
+            binary = preprocessing.execute_all(small)
+            if binary.ndim > 2:
+                binary = cv2.cvtColor(binary, cv2.COLOR_BGR2GRAY)
+            if binary.dtype != np.uint8:
+                binary = (binary > 0).astype(np.uint8)
+
+            _, _, stats, _ = cv2.connectedComponentsWithStats(binary, connectivity=8)
+            stats = stats[1:].astype(np.int64)
+
+            # Tamaño de cada componente llevado a resolución completa
+            sides = stats[:, [cv2.CC_STAT_WIDTH, cv2.CC_STAT_HEIGHT]] * self.factor
+            keep = self._plausible(detector, stats[:, cv2.CC_STAT_AREA] * self.factor ** 2,
+                                   sides.max(axis=1), sides.min(axis=1))
+            boxes.append(stats[keep, :4] * self.factor)
+
+        return np.concatenate(boxes) if boxes else np.empty((0, 4), dtype=np.int64)
+
+    def _plausible(self, detector, areas, lengths, widths):
+        area_min = getattr(detector, "area_min", None)
+        area_max = getattr(detector, "area_max", None)
+        min_length = getattr(detector, "min_length", None)
+        max_width = getattr(detector, "max_width", None)
+
+        keep = np.ones(len(areas), dtype=bool)
+        if area_min is not None or min_length is not None:
+            large = np.zeros(len(areas), dtype=bool)
+            if area_min is not None:
+                large |= areas >= self.margin * area_min
+            if min_length is not None:
+                large |= lengths >= self.margin * min_length
+            keep &= large
+        if area_max is not None:
+            # Los componentes muy grandes (fondo, iluminación) tampoco pasarían el detector
+            keep &= areas <= area_max / self.margin
+        if max_width is not None:
+            keep &= widths <= max_width / self.margin
+        return keep
+
+    def regions(self, boxes, height, width):
+        """Regiones (y0, x0, y1, x1) ampliadas y sin solapes que cubren los candidatos"""
+        pad = self.manager.pipeline_halo() + self.padding + self.factor
+        regions = [[max(y - pad, 0), max(x - pad, 0), min(y + h + pad, height), min(x + w + pad, width)]
+                   for x, y, w, h in boxes.tolist()]
+
+        # Unir regiones solapadas hasta que no quede ninguna
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(regions)):
+                for j in range(len(regions) - 1, i, -1):
+                    a, b = regions[i], regions[j]
+                    if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                        regions[i] = [min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3])]
+                        del regions[j]
+                        merged = True
+        return regions
+
+    def inspect(self, image):
+        """DetectionSet de la imagen completa, procesando solo las regiones con candidatos"""
+        self.counters["images"] += 1
+        height, width = image.shape[:2]
+
+        profiler = self.manager.profiler
+        token = profiler.start() if profiler is not None else None
+        regions = self.regions(self.candidates(image), height, width)
+        if token is not None:
+            profiler.stop(token, "pyramid.coarse", regions)
+
+        covered = sum((y1 - y0) * (x1 - x0) for y0, x0, y1, x1 in regions)
+        if len(regions) > self.max_regions or covered > self.max_coverage * height * width:
+            self.counters["full"] += 1
+            return self.manager._inspect_full(image)
+
+        if not regions:
+            self.counters["clean"] += 1
+            return DetectionSet()
+
+        self.counters["regions"] += len(regions)
+        detections = []
+        for y0, x0, y1, x1 in regions:
+            records = self.manager._inspect_full(np.ascontiguousarray(image[y0:y1, x0:x1])).valid().records
+
+            # Los componentes que tocan un borde interior de la región están cortados por el recorte
+            # (el candidato ya incluye el margen, así que no son los defectos que se buscan)
+            cut = (((records["px"] == 0) & (x0 > 0)) | ((records["py"] == 0) & (y0 > 0)) |
+                   ((records["px"] + records["width"] >= x1 - x0) & (x1 < width)) |
+                   ((records["py"] + records["height"] >= y1 - y0) & (y1 < height)))
+            records = records[~cut]
+
+            # Pasar a coordenadas globales
+            records["px"] += x0
+            records["py"] += y0
+            detections.append(DetectionSet(records))
+
+        # En modo automático, la misma selección final que la fusión de ramas de la imagen completa;
+        # con una sola rama cada región ya pasó por la selección del detector
+        detections = DetectionSet.concatenate(detections)
+        if self.manager.defect_type == "auto":
+            return self.manager.branch_merger.select(detections)
+        return detections
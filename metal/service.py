@@ -0,0 +1,290 @@
+import base64
+import io
+import json
+import logging
+import os
+import queue
+import socketserver
+import struct
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from metal.detection import DetectionResult, DetectionSet
+from metal.output import BINARY_DTYPE, detection_dicts
+
+# Petición ya separada del flujo: ``kind`` es "path" (ruta en disco) o "data" (imagen codificada)
+Request = namedtuple("Request", ["id", "kind", "payload"])
+
+
+class TextProtocol:
+    """
+    Protocolo de texto original, una petición por línea:
+        - Ruta a una imagen en disco.
+        - ``base64:<datos>`` con la imagen codificada (jpg, png...) en base64.
+
+    Respuesta: una línea ``x=..., y=..., w=..., h=...`` por detección (mismo formato que
+    ``main.py``) o ``error=<mensaje>``, seguida siempre de una línea vacía que cierra la respuesta.
+    """
+
+    binary = False
+    structured = False
+    BASE64_PREFIX = "base64:"
+
+    def read_requests(self, stream):
+        request_id = 0
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith(self.BASE64_PREFIX):
+                try:
+                    yield Request(request_id, "data", base64.b64decode(line[len(self.BASE64_PREFIX):]))
+                except ValueError as e:
+                    yield Request(request_id, "error", f"Petición no válida: {e}")
+            else:
+                yield Request(request_id, "path", line)
+            request_id += 1
+
+    @staticmethod
+    def format_response(detections):
+        lines = [f"x={d.px}, y={d.py}, w={d.width}, h={d.height}" for d in detections]
+        return "\n".join(lines) + "\n\n"
+
+    def write_response(self, stream, request_id, detections):
+        stream.write(self.format_response(detections))
+
+    def write_error(self, stream, request_id, message):
+        stream.write(f"error={message}\n\n")
+
+
+class JsonLinesProtocol:
+    """
+    NDJSON: un objeto por línea en cada sentido.
+
+    Petición: ``{"id": 1, "path": "placa.jpg"}`` o ``{"id": 1, "image": "<base64>"}``.
+    Respuesta: ``{"id": 1, "detections": [{"x", "y", "w", "h", "class", "score"}]}`` o
+    ``{"id": 1, "error": "<mensaje>"}``. Sin ``id`` se usa el número de orden de la petición.
+    """
+
+    binary = False
+    structured = True
+
+    def read_requests(self, stream):
+        for sequence, line in enumerate(line for line in stream if line.strip()):
+            try:
+                message = json.loads(line)
+                request_id = message.get("id", sequence)
+                if "image" in message:
+                    yield Request(request_id, "data", base64.b64decode(message["image"]))
+                else:
+                    yield Request(request_id, "path", message["path"])
+            except (ValueError, KeyError, AttributeError) as e:
+                yield Request(sequence, "error", f"Petición no válida: {e}")
+
+    def write_response(self, stream, request_id, detections):
+        stream.write(json.dumps({"id": request_id, "detections": detection_dicts(detections)}) + "\n")
+
+    def write_error(self, stream, request_id, message):
+        stream.write(json.dumps({"id": request_id, "error": message}) + "\n")
+
+
+class BinaryProtocol:
+    """
+    Tramas con prefijo de longitud, little-endian.
+
+    Petición: cabecera ``<IBI`` (id, tipo, longitud) y la carga: tipo 0 ruta en UTF-8, tipo 1
+    imagen codificada (jpg, png...).
+    Respuesta: cabecera ``<IBI`` (id, estado, longitud) y la carga: estado 0 registros
+    ``BINARY_DTYPE`` (31 bytes por detección), estado 1 mensaje de error en UTF-8.
+    """
+
+    binary = True
+    structured = True
+    HEADER = struct.Struct("<IBI")
+    KINDS = {0: "path", 1: "data"}
+    OK, ERROR = 0, 1
+
+    def read_requests(self, stream):
+        while True:
+            header = self._read_exactly(stream, self.HEADER.size)
+            if header is None:
+                return
+            request_id, kind, length = self.HEADER.unpack(header)
+            payload = self._read_exactly(stream, length)
+            if payload is None:
+                return
+
+            if kind not in self.KINDS:
+                yield Request(request_id, "error", f"Tipo de petición desconocido: {kind}")
+            elif self.KINDS[kind] == "path":
+                yield Request(request_id, "path", payload.decode("utf-8"))
+            else:
+                yield Request(request_id, "data", payload)
+
+    @staticmethod
+    def _read_exactly(stream, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = stream.read(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return bytes(data)
+
+    def write_response(self, stream, request_id, detections):
+        records = DetectionSet.from_results(detections).valid().records.astype(BINARY_DTYPE).tobytes()
+        stream.write(self.HEADER.pack(request_id, self.OK, len(records)) + records)
+
+    def write_error(self, stream, request_id, message):
+        message = message.encode("utf-8")
+        stream.write(self.HEADER.pack(request_id, self.ERROR, len(message)) + message)
+
+
+PROTOCOLS = {"text": TextProtocol, "ndjson": JsonLinesProtocol, "binary": BinaryProtocol}
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class InspectionService:
+    """
+    Servicio de inspección persistente. La configuración y los pipelines se construyen
+    una única vez y se reutilizan para todas las imágenes recibidas.
+
+    Cada conexión admite peticiones encadenadas: el cliente puede enviar muchas sin esperar
+    respuesta. Un hilo lee las peticiones y las decodifica por adelantado (hasta ``max_in_flight``
+    pendientes por conexión; después deja de leer y el cliente nota la contrapresión) mientras
+    las imágenes se inspeccionan una tras otra. Las respuestas se envían en el orden de las
+    peticiones y llevan su identificador en los protocolos que lo admiten.
+
+    El protocolo (``text``, ``ndjson`` o ``binary``) se describe en ``TextProtocol``,
+    ``JsonLinesProtocol`` y ``BinaryProtocol``.
+    """
+
+    BASE64_PREFIX = TextProtocol.BASE64_PREFIX
+
+    def __init__(self, manager, protocol="text", max_in_flight=16, decode_workers=2):
+        self.manager = manager.load()
+        self.protocol = PROTOCOLS[protocol]()
+        self.max_in_flight = max_in_flight
+        self.decoder = ThreadPoolExecutor(max_workers=decode_workers)
+        # Los pipelines reutilizan buffers: varias conexiones no inspeccionan a la vez
+        self._inspect_lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def read_request(self, request):
+        """Obtiene la imagen a partir de una línea de petición"""
+        request = request.strip()
+        if request.startswith(self.BASE64_PREFIX):
+            return self.manager.loader.decode(base64.b64decode(request[len(self.BASE64_PREFIX):]))
+        return self.manager.loader.read(request)
+
+    def load_image(self, request):
+        """Obtiene la imagen de una petición ya separada del flujo"""
+        if request.kind == "error":
+            raise ValueError(request.payload)
+        if request.kind == "data":
+            return self.manager.loader.decode(request.payload)
+        return self.manager.loader.read(request.payload)
+
+    def inspect(self, image, structured=False):
+        loader = self.manager.loader
+        with self._inspect_lock:
+            if structured:
+                return loader.scale_results(self.manager.inspect_array(image))
+            detections = loader.scale_results(self.manager.inspect(image))
+
+        # Algunos detectores devuelven un único DetectionResult en lugar de una lista
+        if isinstance(detections, DetectionResult):
+            detections = [detections]
+        return detections
+
+    def handle_request(self, request):
+        """Procesa una petición y devuelve la lista de detecciones"""
+        return self.inspect(self.read_request(request))
+
+    @staticmethod
+    def format_response(detections):
+        return TextProtocol.format_response(detections)
+
+    def serve_stream(self, input_stream, output_stream, protocol=None):
+        """
+        Atiende las peticiones de un flujo hasta agotarlo. Los protocolos de texto usan flujos
+        de texto y el binario flujos de bytes.
+        """
+        protocol = protocol or self.protocol
+        pending = queue.Queue(maxsize=self.max_in_flight)
+
+        def read():
+            try:
+                for request in protocol.read_requests(input_stream):
+                    pending.put((request, self.decoder.submit(self.load_image, request)))
+            except Exception as e:
+                self.logger.error(f"Error leyendo peticiones: {e}")
+            finally:
+                pending.put(None)
+
+        reader = threading.Thread(target=read, daemon=True)
+        reader.start()
+
+        while True:
+            item = pending.get()
+            if item is None:
+                break
+
+            request, image = item
+            try:
+                detections = self.inspect(image.result(), protocol.structured)
+                protocol.write_response(output_stream, request.id, detections)
+            except Exception as e:
+                self.logger.error(f"Error procesando petición: {e}")
+                protocol.write_error(output_stream, request.id, str(e))
+            output_stream.flush()
+
+        reader.join()
+
+    def _handler(self):
+        service = self
+
+        class _Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                if service.protocol.binary:
+                    service.serve_stream(self.rfile, self.wfile)
+                    return
+                reader = io.TextIOWrapper(self.rfile, encoding="utf-8")
+                writer = io.TextIOWrapper(self.wfile, encoding="utf-8", write_through=True)
+                service.serve_stream(reader, writer)
+
+        return _Handler
+
+    def serve_socket(self, socket_path):
+        """Atiende peticiones a través de un socket Unix local (una conexión por hilo)"""
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+
+        with _UnixServer(socket_path, self._handler()) as server:
+            self.logger.info(f"Servicio de inspección escuchando en {socket_path}")
+            try:
+                server.serve_forever()
+            finally:
+                os.remove(socket_path)
+
+    def tcp_server(self, port, host="127.0.0.1"):
+        """Servidor TCP sin arrancar (por defecto solo acepta conexiones de la propia máquina)"""
+        return _TCPServer((host, port), self._handler())
+
+    def serve_tcp(self, port, host="127.0.0.1"):
+        """Atiende peticiones por TCP (una conexión por hilo)"""
+        with self.tcp_server(port, host) as server:
+            self.logger.info(f"Servicio de inspección escuchando en {host}:{server.server_address[1]}")
+            server.serve_forever()
+
+    def close(self):
+        self.decoder.shutdown(wait=True)
@@ -0,0 +1,277 @@
+import copy
+import itertools
+import json
+import logging
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from metal.cache import describe
+from metal.detection import DetectionSet
+from metal.evaluation import IOU_THRESHOLD, load_ground_truth, match_detections, _ratio
+from metal.manager import MainManager
+from metal.preprocessing import ImageFormat
+
+# Secciones que actúan fuera de los pipelines y que SweepTree no ejecuta: barrerlas o activarlas
+# daría el mismo F1 en todas las variantes (la puerta se calibra con ``calibrate_gate``)
+UNSUPPORTED_SECTIONS = ("gate", "pyramid")
+
+# Secciones comunes a todas las variantes: cada imagen se decodifica una sola vez para el árbol
+SHARED_SECTIONS = ("ingest",)
+
+
+class SearchSpace:
+    """
+    Valores a probar para cada parámetro de la configuración. Cada parámetro se indica con una ruta:
+
+    - ``<rama>_preprocessing.<índice o clase>.<parámetro>``, p. ej.
+      ``patches_preprocessing.LocalContrastMethod.contrast_factor`` (primer método de esa clase)
+      o ``patches_preprocessing.2.block_size``.
+    - ``<rama>_detector.<parámetro>``, p. ej. ``scratches_detector.min_length``.
+    - Cualquier otra clave de primer nivel, separando con puntos los niveles anidados, salvo las
+      de ``UNSUPPORTED_SECTIONS`` y ``SHARED_SECTIONS``.
+    """
+
+    def __init__(self, parameters):
+        self.parameters = {path: list(values) for path, values in parameters.items()}
+
+    def __len__(self):
+        size = 1
+        for values in self.parameters.values():
+            size *= len(values)
+        return size
+
+    def grid(self):
+        """Todas las combinaciones, como diccionarios {ruta: valor}"""
+        paths = list(self.parameters)
+        for values in itertools.product(*self.parameters.values()):
+            yield dict(zip(paths, values))
+
+    def sample(self, count, seed=0):
+        """``count`` combinaciones distintas elegidas al azar (todas si hay menos)"""
+        paths = list(self.parameters)
+        indices = random.Random(seed).sample(range(len(self)), min(count, len(self)))
+        points = []
+        for index in indices:
+            point = {}
+            for path in reversed(paths):
+                values = self.parameters[path]
+                index, position = divmod(index, len(values))
+                point[path] = values[position]
+            points.append({path: point[path] for path in paths})
+        return points
+
+
+def apply_parameters(config, point):
+    """Copia de la configuración con los valores de ``point`` aplicados"""
+    config = copy.deepcopy(config)
+    for path, value in point.items():
+        section, *rest = path.split(".")
+        if section in UNSUPPORTED_SECTIONS + SHARED_SECTIONS:
+            raise ValueError(f"El barrido no admite parámetros de {section}")
+        if section.endswith("_preprocessing"):
+            selector, name = rest
+            methods = config.get(section)
+            if not methods:
+                raise ValueError(f"La configuración no define {section}")
+            if selector.isdigit():
+                method = methods[int(selector)]
+            else:
+                method = next((m for m in methods if m.get("name") == selector), None)
+                if method is None:
+                    raise ValueError(f"{section} no contiene {selector}")
+            method.setdefault("params", {})[name] = value
+        elif section.endswith("_detector"):
+            if section not in config:
+                raise ValueError(f"La configuración no define {section}")
+            config[section].setdefault("params", {})[rest[0]] = value
+        else:
+            target = config
+            for key in [section] + rest[:-1]:
+                target = target.setdefault(key, {})
+            target[rest[-1] if rest else section] = value
+    return config
+
+
+class _Node:
+    __slots__ = ("step", "detector", "children", "targets")
+
+    def __init__(self, step=None, detector=False):
+        self.step = step
+        self.detector = detector
+        self.children = {}
+        # (variante, posición) que reciben las detecciones de una hoja
+        self.targets = []
+
+
+class SweepTree:
+    """
+    Variantes del pipeline organizadas como un árbol de prefijos. Cada variante se construye con
+    MainManager (mismos valores por defecto y mismo plan compilado que en producción) y cada paso
+    se identifica por su clase y sus parámetros, de modo que los pasos iniciales comunes a varias
+    variantes son un mismo nodo y se calculan una sola vez por imagen.
+
+    El árbol se recorre en profundidad: la salida de un nodo solo se conserva mientras se procesan
+    sus hijos, así que en memoria hay como mucho una imagen intermedia por nivel.
+    """
+
+    def __init__(self, configs):
+        self.root = _Node()
+        self.mergers = []
+        self.loader = None
+        self.nodes = 0
+
+        for variant, config in enumerate(configs):
+            manager = MainManager(config).load()
+            enabled = [section for section in UNSUPPORTED_SECTIONS if getattr(manager, section) is not None]
+            if enabled:
+                manager.close()
+                raise ValueError(f"El barrido no ejecuta {', '.join(enabled)}: desactívalo en la configuración")
+            if self.loader is None:
+                # La decodificación (sección ``ingest``) es la misma para todas las variantes
+                self.loader = manager.loader
+            elif self._loader_settings(manager.loader) != self._loader_settings(self.loader):
+                manager.close()
+                raise ValueError("Todas las variantes del barrido deben usar la misma sección ingest")
+            input_format = ImageFormat(manager.loader.channels, np.uint8)
+
+            if manager.defect_type == "auto":
+                branches = [(manager.scratches_manager, manager.scratches_detector_manager),
+                            (manager.patches_manager, manager.patches_detector_manager)]
+                self.mergers.append(manager.branch_merger)
+            else:
+                branches = [(manager.scratches_manager or manager.patches_manager, manager.detector_manager)]
+                self.mergers.append(None)
+
+            for position, (preprocessing, detector) in enumerate(branches):
+                steps = [step for _, step in preprocessing.plan_for(input_format).steps]
+                self._insert(steps, detector.method).targets.append((variant, position))
+
+            manager.close()
+
+    @staticmethod
+    def _loader_settings(loader):
+        return loader.grayscale, loader.reduce, loader.raw_shape, loader.raw_dtype
+
+    def _insert(self, steps, detector):
+        node = self.root
+        for step, is_detector in [(step, False) for step in steps] + [(detector, True)]:
+            key = (is_detector, json.dumps(describe(step), sort_keys=True, default=str))
+            child = node.children.get(key)
+            if child is None:
+                child = node.children[key] = _Node(step, is_detector)
+                self.nodes += 1
+            node = child
+        return node
+
+    def evaluate(self, image):
+        """
+        Detecciones (DetectionSet, sin la detección vacía) de cada variante para una imagen y
+        número de ejecuciones de preprocesado y de detectores que han hecho falta.
+        """
+        outputs = [[None, None] for _ in self.mergers]
+        runs = {"preprocessing": 0, "detector": 0}
+        self._visit(self.root, image, outputs, runs)
+
+        detections = []
+        for merger, (first, second) in zip(self.mergers, outputs):
+            results = merger.merge(first, second) if merger is not None else DetectionSet.from_results(first).valid()
+            detections.append(DetectionSet.from_results(self.loader.scale_results(results)))
+        return detections, runs
+
+    def _visit(self, node, image, outputs, runs):
+        for child in node.children.values():
+            if child.detector:
+                runs["detector"] += 1
+                results = child.step.detect_array(image)
+                for variant, position in child.targets:
+                    outputs[variant][position] = results
+            else:
+                runs["preprocessing"] += 1
+                self._visit(child, child.step.process(image), outputs, runs)
+
+    def score(self, image_path, ground_truth, iou_threshold=IOU_THRESHOLD):
+        """(TP, FP, FN) de cada variante para una imagen, como array (variantes, 3)"""
+        detections, runs = self.evaluate(self.loader.load(image_path))
+        counts = np.array([match_detections(ground_truth, d.boxes, iou_threshold)[:3] for d in detections],
+                          dtype=np.int64).reshape(-1, 3)
+        return counts, runs
+
+
+# Árbol propio de cada proceso trabajador (se construye una vez en el inicializador)
+_worker_tree = None
+
+
+def _init_worker(configs):
+    global _worker_tree
+    _worker_tree = SweepTree(configs)
+
+
+def _score_image(arguments):
+    image_path, ground_truth, iou_threshold = arguments
+    try:
+        return _worker_tree.score(image_path, ground_truth, iou_threshold) + (None,)
+    except Exception as e:
+        return None, None, str(e)
+
+
+class ParameterSweep:
+    """
+    Búsqueda de parámetros puntuada con F1 frente a las anotaciones. Cada imagen se lee una vez y
+    recorre el árbol de variantes (``SweepTree``): si solo varían las últimas etapas, el coste se
+    acerca al de ejecutar esas etapas por variante y no el pipeline completo.
+    """
+
+    def __init__(self, config, points, workers=1, iou_threshold=IOU_THRESHOLD):
+        base = MainManager(config).load()
+        base.close()
+        self.points = list(points)
+        self.configs = [apply_parameters(base.config, point) for point in self.points]
+        self.workers = workers or os.cpu_count() or 1
+        self.iou_threshold = iou_threshold
+        self.logger = logging.getLogger(__name__)
+
+    def run(self, image_paths, ground_truth=None):
+        """
+        Evalúa todas las variantes sobre las imágenes (anotaciones Pascal VOC junto a cada imagen si
+        no se indican) y devuelve un informe con las variantes ordenadas por F1 descendente.
+        """
+        image_paths = list(image_paths)
+        if ground_truth is None:
+            ground_truth = load_ground_truth(image_paths)
+        tasks = [(path, truth, self.iou_threshold) for path, truth in zip(image_paths, ground_truth)]
+
+        if self.workers == 1:
+            _init_worker(self.configs)
+            outputs = map(_score_image, tasks)
+            return self._report(image_paths, outputs)
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.configs,)) as executor:
+            return self._report(image_paths, executor.map(_score_image, tasks))
+
+    def _report(self, image_paths, outputs):
+        totals = np.zeros((len(self.configs), 3), dtype=np.int64)
+        runs = {"preprocessing": 0, "detector": 0}
+        errors = 0
+        for image_path, (counts, image_runs, error) in zip(image_paths, outputs):
+            if error is not None:
+                self.logger.error(f"Error procesando {image_path}: {error}")
+                errors += 1
+                continue
+            totals += counts
+            for stage, count in image_runs.items():
+                runs[stage] += count
+
+        results = []
+        for point, (tp, fp, fn) in zip(self.points, totals.tolist()):
+            precision = _ratio(tp, tp + fp)
+            recall = _ratio(tp, tp + fn)
+            results.append({"params": point, "tp": tp, "fp": fp, "fn": fn, "precision": precision,
+                            "recall": recall, "f1": _ratio(2 * precision * recall, precision + recall)})
+        results.sort(key=lambda result: result["f1"], reverse=True)
+
+        return {"images": len(image_paths), "errors": errors, "variants": len(self.configs),
+                "iou_threshold": self.iou_threshold, "stage_runs": runs, "results": results}
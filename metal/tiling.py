@@ -0,0 +1,155 @@
+import os
+
+import numpy as np
+
+from metal.detection import DetectionSet
+from metal.tools import Tools
+
+
+def open_scan(path, shape=None, dtype=np.uint8):
+    """
+    Abre un escaneo completo sin cargarlo en memoria cuando el formato lo permite.
+
+    - ``.npy``: se proyecta en memoria (memmap) y solo se leen las teselas accedidas.
+    - ``.raw`` / ``.bin``: fotograma sin cabecera; requiere ``shape`` (y ``dtype`` si no es uint8).
+    - Cualquier otro formato se decodifica completo con ``Tools.read_image``.
+    """
+    extension = os.path.splitext(path)[1].lower()
+
+    if extension == ".npy":
+        return np.load(path, mmap_mode="r")
+
+    if extension in (".raw", ".bin"):
+        if shape is None:
+            raise ValueError("Los ficheros raw necesitan la forma de la imagen")
+        return np.memmap(path, dtype=dtype, mode="r", shape=tuple(shape))
+
+    image = Tools.read_image(path)
+    if image is None:
+        raise ValueError(f"No se pudo leer la imagen {path}")
+    return image
+
+
+class TiledInspector:
+    """
+    Inspección de escaneos de gran tamaño por teselas solapadas.
+
+    La imagen se recorre por franjas horizontales de teselas de ``tile_size`` píxeles. Cada tesela
+    se amplía con un margen (halo) igual al radio acumulado de los métodos del pipeline, de modo que
+    los píxeles del núcleo se procesan igual que en la imagen completa. Las detecciones se pasan a
+    coordenadas globales, los componentes cortados por las costuras entre teselas se fusionan y al
+    resultado se le aplica la misma selección final (NMS, ``max_results``) que a la imagen completa.
+    La memoria usada depende del tamaño de tesela, no del tamaño del escaneo.
+
+    Los métodos basados en estadísticas globales (CLAHE, umbrales por histograma o por máximo)
+    se evalúan con las estadísticas de cada tesela.
+    """
+
+    def __init__(self, manager, tile_size=1024, halo=None):
+        self.manager = manager.load()
+        self.tile_size = tile_size
+        self.halo = manager.pipeline_halo() if halo is None else halo
+
+    def tiles(self, height, width):
+        """Genera pares (núcleo, tesela ampliada) como (y0, x0, y1, x1), franja a franja"""
+        for y0 in range(0, height, self.tile_size):
+            y1 = min(y0 + self.tile_size, height)
+            for x0 in range(0, width, self.tile_size):
+                x1 = min(x0 + self.tile_size, width)
+                extended = (max(y0 - self.halo, 0), max(x0 - self.halo, 0),
+                            min(y1 + self.halo, height), min(x1 + self.halo, width))
+                yield (y0, x0, y1, x1), extended
+
+    def inspect(self, image):
+        """Procesa la imagen (array o memmap) y devuelve un DetectionSet en coordenadas globales"""
+        height, width = image.shape[:2]
+
+        detections = []
+        cores = []
+        for core, extended in self.tiles(height, width):
+            ey0, ex0, ey1, ex1 = extended
+
+            # Solo se copia a memoria la tesela ampliada
+            tile = np.ascontiguousarray(image[ey0:ey1, ex0:ex1])
+            records = self.manager.inspect_array(tile).records.copy()
+
+            # Pasar a coordenadas globales
+            records["px"] += ex0
+            records["py"] += ey0
+
+            # Descartar detecciones que caen solo en el margen: pertenecen a una tesela vecina
+            y0, x0, y1, x1 = core
+            in_core = ((records["px"] < x1) & (records["px"] + records["width"] > x0) &
+                       (records["py"] < y1) & (records["py"] + records["height"] > y0))
+            records = records[in_core]
+
+            detections.append(records)
+            cores.append(np.tile(np.array(core, dtype=np.int64), (len(records), 1)))
+
+        if not detections:
+            return DetectionSet()
+
+        records = self._merge_seams(np.concatenate(detections), np.concatenate(cores))
+        return self.manager.select(DetectionSet(records))
+
+    def _merge_seams(self, records, cores):
+        """
+        Fusiona las detecciones de teselas vecinas que se solapan y que tocan la costura común
+        entre sus núcleos: son el mismo componente visto desde las dos teselas (por el halo) o
+        trozos de un componente cortado por la costura. Los defectos distintos que se solapan
+        lejos de la costura (un rayón que cruza una mancha) se conservan por separado.
+
+        :param cores: núcleo (y0, x0, y1, x1) de la tesela de cada detección.
+        """
+        x1 = records["px"].astype(np.int64)
+        y1 = records["py"].astype(np.int64)
+        x2 = x1 + records["width"]
+        y2 = y1 + records["height"]
+
+        # Unión de conjuntos disjuntos sobre las detecciones
+        parent = np.arange(len(records))
+
+        def find(i):
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for i in range(len(records)):
+            # Comparar con todas las posteriores en una sola operación
+            rest = np.arange(i + 1, len(records))
+            overlap = ((np.minimum(x2[i], x2[rest]) > np.maximum(x1[i], x1[rest])) &
+                       (np.minimum(y2[i], y2[rest]) > np.maximum(y1[i], y1[rest])))
+
+            # Costura común: los píxeles a ambos lados del borde compartido por los dos núcleos
+            # (vacía si las teselas no son vecinas o si es la misma tesela)
+            other = cores[rest]
+            sy0 = np.maximum(cores[i, 0], other[:, 0]) - 1
+            sx0 = np.maximum(cores[i, 1], other[:, 1]) - 1
+            sy1 = np.minimum(cores[i, 2], other[:, 2]) + 1
+            sx1 = np.minimum(cores[i, 3], other[:, 3]) + 1
+            same_tile = np.all(other == cores[i], axis=1)
+
+            touches = ((x1[i] < sx1) & (x2[i] > sx0) & (y1[i] < sy1) & (y2[i] > sy0) &
+                       (x1[rest] < sx1) & (x2[rest] > sx0) & (y1[rest] < sy1) & (y2[rest] > sy0))
+            for j in rest[overlap & touches & ~same_tile]:
+                parent[find(j)] = find(i)
+
+        roots = np.array([find(i) for i in range(len(records))], dtype=np.int64)
+        if len(np.unique(roots)) == len(records):
+            return records
+
+        # Caja envolvente de cada grupo; se conservan clase y origen de la detección de más puntuación
+        groups, inverse = np.unique(roots, return_inverse=True)
+        merged = np.zeros(len(groups), dtype=records.dtype)
+        for g in range(len(groups)):
+            members = np.flatnonzero(inverse == g)
+            best = members[np.argmax(records["score"][members])]
+            merged[g] = records[best]
+            merged["px"][g] = x1[members].min()
+            merged["py"][g] = y1[members].min()
+            merged["width"][g] = x2[members].max() - x1[members].min()
+            merged["height"][g] = y2[members].max() - y1[members].min()
+
+        merged["area"] = merged["width"].astype(np.int64) * merged["height"]
+        return merged
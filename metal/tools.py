@@ -9,6 +9,12 @@ class Tools:
     def read_image(file_path):
         return cv2.imread(file_path)
 
+    @staticmethod
+    def decode_image(data):
+        """Decodifica una imagen codificada (jpg, png...) recibida en memoria"""
+        buffer = np.frombuffer(data, dtype=np.uint8)
+        return cv2.imdecode(buffer, cv2.IMREAD_COLOR)
+
     @staticmethod
     def parse_config(config_path):
         with open(config_path, 'r') as file:
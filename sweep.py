@@ -0,0 +1,46 @@
+import argparse
+import json
+import sys
+from metal.evaluation import Evaluator, IOU_THRESHOLD, save_report
+from metal.sweep import ParameterSweep, SearchSpace
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Búsqueda de parámetros del pipeline puntuada con F1.")
+    parser.add_argument("--config", required=True, help="Configuración JSON de partida.")
+    parser.add_argument("--dataset", required=True,
+                        help="Directorio con las imágenes y sus anotaciones Pascal VOC (.xml con el mismo nombre).")
+    parser.add_argument("--param", nargs=2, action="append", required=True, metavar=("RUTA", "VALORES"),
+                        help="Parámetro y lista JSON de valores, p. ej. "
+                             "scratches_detector.min_length '[20, 30, 40]'. Se puede repetir.")
+    parser.add_argument("--random", type=int, default=None,
+                        help="Evalúa este número de combinaciones al azar en lugar de la rejilla completa.")
+    parser.add_argument("--seed", type=int, default=0, help="Semilla de la búsqueda aleatoria.")
+    parser.add_argument("--workers", type=int, default=None, help="Número de procesos (por defecto, uno por núcleo).")
+    parser.add_argument("--iou", type=float, default=IOU_THRESHOLD, help="Umbral de IoU para contar un acierto.")
+    parser.add_argument("--top", type=int, default=10, help="Número de variantes a mostrar.")
+    parser.add_argument("--output", help="Guarda el informe completo en esta ruta (JSON).")
+
+    args = parser.parse_args()
+
+    space = SearchSpace({path: json.loads(values) for path, values in args.param})
+    points = space.sample(args.random, args.seed) if args.random else list(space.grid())
+
+    sweep = ParameterSweep(args.config, points, workers=args.workers, iou_threshold=args.iou)
+    report = sweep.run(Evaluator.list_images(args.dataset))
+
+    runs = report["stage_runs"]
+    print(f"imagenes={report['images']} variantes={report['variants']} errores={report['errors']} "
+          f"preprocesado={runs['preprocessing']} detectores={runs['detector']}")
+    for result in report["results"][:args.top]:
+        print(f"f1={result['f1']:.4f} precision={result['precision']:.4f} recall={result['recall']:.4f} "
+              f"{json.dumps(result['params'], sort_keys=True)}")
+
+    if args.output:
+        save_report(report, args.output)
+
+    sys.exit(1 if report["images"] == 0 else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest.mock import patch
+import numpy as np
+import cv2
+from metal.aio import AsyncInspector, DeadlineExceeded, Overloaded
+from metal.api import Pipeline
+
+
+def plate_with_patch():
+    image = np.full((200, 200, 3), 150, dtype=np.uint8)
+    cv2.circle(image, (100, 100), 25, (40, 40, 40), -1)
+    return image
+
+
+class TestAsyncInspector(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {"defect_type": "patches"}
+        self.image = plate_with_patch()
+        # Inspección lenta que no termina hasta que el test lo permite
+        self.release = threading.Event()
+
+    def blocking_inspect(self, source):
+        self.release.wait(5)
+        return source
+
+    def test_inspect_matches_pipeline(self):
+        async def run():
+            async with AsyncInspector(self.config, workers=2) as inspector:
+                results = await asyncio.gather(*(inspector.inspect(self.image) for _ in range(4)))
+                return results, inspector.stats()
+
+        results, stats = asyncio.run(run())
+
+        expected = Pipeline(self.config).detect(self.image).records
+        for detections in results:
+            np.testing.assert_array_equal(detections.records, expected)
+        self.assertEqual(stats["completed"], 4)
+        self.assertEqual(stats["queue_depth"], 0)
+
+    def test_process_executor(self):
+        async def run():
+            async with AsyncInspector(self.config, executor="process", workers=1) as inspector:
+                return await inspector.inspect(self.image)
+
+        np.testing.assert_array_equal(asyncio.run(run()).records,
+                                      Pipeline(self.config).detect(self.image).records)
+
+    def test_queue_full_rejects(self):
+        async def run():
+            inspector = AsyncInspector(self.config, workers=1, max_queue=1)
+            running = asyncio.ensure_future(inspector.inspect("a"))
+            await asyncio.sleep(0.05)
+            waiting = asyncio.ensure_future(inspector.inspect("b"))
+            await asyncio.sleep(0.05)
+
+            self.assertEqual((inspector.in_flight, inspector.queue_depth), (1, 1))
+            with self.assertRaises(Overloaded):
+                await inspector.inspect("c")
+
+            self.release.set()
+            results = await asyncio.gather(running, waiting)
+            await inspector.close()
+            return results, inspector.stats()
+
+        with patch("metal.aio._inspect_source", self.blocking_inspect):
+            results, stats = asyncio.run(run())
+
+        self.assertEqual(results, ["a", "b"])
+        self.assertEqual(stats["rejected"], 1)
+
+    def test_deadline_drops_waiting_request(self):
+        async def run():
+            inspector = AsyncInspector(self.config, workers=1)
+            running = asyncio.ensure_future(inspector.inspect("a"))
+            await asyncio.sleep(0.05)
+
+            # No consigue turno antes de que venza su plazo
+            with self.assertRaises(DeadlineExceeded):
+                await inspector.inspect("b", deadline=0.05)
+
+            self.release.set()
+            await running
+
+            # Con la latencia media observada tampoco llegaría a tiempo
+            inspector.service_time = 1.0
+            with self.assertRaises(DeadlineExceeded):
+                await inspector.inspect("c", deadline=0.2)
+
+            await inspector.close()
+            return inspector.stats()
+
+        with patch("metal.aio._inspect_source", self.blocking_inspect):
+            stats = asyncio.run(run())
+
+        self.assertEqual((stats["completed"], stats["dropped"]), (1, 2))
+
+    def test_close_drains_pending(self):
+        async def run():
+            inspector = AsyncInspector(self.config, workers=1)
+            pending = [asyncio.ensure_future(inspector.inspect(i)) for i in range(3)]
+            await asyncio.sleep(0.05)
+
+            closing = asyncio.ensure_future(inspector.close())
+            await asyncio.sleep(0.05)
+            with self.assertRaises(RuntimeError):
+                await inspector.inspect(3)
+            self.assertFalse(closing.done())
+
+            self.release.set()
+            await closing
+            return [task.result() for task in pending]
+
+        with patch("metal.aio._inspect_source", self.blocking_inspect):
+            start = time.perf_counter()
+            self.assertEqual(asyncio.run(run()), [0, 1, 2])
+            self.assertLess(time.perf_counter() - start, 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
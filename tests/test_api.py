@@ -0,0 +1,99 @@
+import io
+import json
+import unittest
+import numpy as np
+import cv2
+from metal.api import Pipeline, BATCH_DTYPE
+from metal.detection import DetectionResult, DetectionSet, DEFECT_PATCH
+from metal.manager import MainManager
+from metal.output import BinaryWriter, JsonLinesWriter, TextWriter, read_binary
+
+
+def plate_with_patch():
+    image = np.full((200, 200, 3), 150, dtype=np.uint8)
+    cv2.circle(image, (100, 100), 25, (40, 40, 40), -1)
+    return image
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {"defect_type": "patches"}
+        self.image = plate_with_patch()
+
+    def test_manager_accepts_dict(self):
+        manager = MainManager(self.config).load()
+        self.assertEqual(manager.defect_type, "patches")
+        self.assertIsNone(manager.scratches_manager)
+
+    def test_detect_matches_manager(self):
+        pipeline = Pipeline(self.config)
+        detections = pipeline.detect(self.image)
+
+        self.assertIsInstance(detections, DetectionSet)
+        expected = [tuple(r) for r in MainManager(self.config).load().inspect(self.image)]
+        self.assertEqual([tuple(r) for r in detections], expected)
+
+    def test_detect_encoded_bytes(self):
+        pipeline = Pipeline(self.config)
+        _, encoded = cv2.imencode(".png", self.image)
+
+        np.testing.assert_array_equal(pipeline.detect(encoded.tobytes()).records,
+                                      pipeline.detect(self.image).records)
+
+    def test_batch(self):
+        clean = np.full((200, 200, 3), 150, dtype=np.uint8)
+        with Pipeline(self.config) as pipeline:
+            results = pipeline.detect_batch(np.stack([self.image, clean]))
+            records = pipeline.detect_batch_array([self.image, clean])
+
+        self.assertEqual(len(results), 2)
+        # Sin defectos no se devuelve la detección vacía de relleno
+        self.assertEqual(len(results[1]), 0)
+
+        self.assertEqual(records.dtype, BATCH_DTYPE)
+        self.assertEqual(len(records), len(results[0]))
+        self.assertTrue(np.all(records["image"] == 0))
+        np.testing.assert_array_equal(records["px"], results[0].records["px"])
+
+
+class TestOutputWriters(unittest.TestCase):
+
+    def setUp(self):
+        self.detections = DetectionSet.from_boxes([(1, 2, 3, 4), (0, 0, 0, 0)], defect_class=DEFECT_PATCH)
+
+    def test_text(self):
+        stream = io.StringIO()
+        TextWriter(stream, batch=True).write([DetectionResult(1, 2, 3, 4)], "a.jpg")
+        TextWriter(stream, batch=True).write(None, "b.jpg")
+        # Un DetectionSet vacío mantiene la línea vacía del formato histórico
+        TextWriter(stream, batch=True).write(DetectionSet(), "c.jpg")
+        self.assertEqual(stream.getvalue(), "image=a.jpg\nx=1, y=2, w=3, h=4\n"
+                                            "image=b.jpg\nerror=No se pudo procesar la imagen\n"
+                                            "image=c.jpg\nx=0, y=0, w=0, h=0\n")
+
+    def test_jsonl(self):
+        stream = io.StringIO()
+        writer = JsonLinesWriter(stream)
+        writer.write(self.detections, "a.jpg")
+        writer.write([DetectionResult(0, 0, 0, 0)], "b.jpg")
+
+        first, second = [json.loads(line) for line in stream.getvalue().splitlines()]
+        self.assertEqual(first["detections"], [{"x": 1, "y": 2, "w": 3, "h": 4, "class": "patch", "score": 12.0}])
+        self.assertEqual(second, {"image": "b.jpg", "detections": []})
+
+    def test_binary_round_trip(self):
+        stream = io.BytesIO()
+        writer = BinaryWriter(stream)
+        writer.write(self.detections, "placa_ñ.jpg")
+        writer.write(None, "b.jpg")
+
+        (name, records), (error_name, error_records) = read_binary(stream.getvalue())
+        self.assertEqual(name, "placa_ñ.jpg")
+        np.testing.assert_array_equal(records, self.detections.valid().records)
+        self.assertEqual(error_name, "b.jpg")
+        self.assertIsNone(error_records)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import os
+import unittest
+import numpy as np
+from metal.batch import BatchManager
+from metal.manager import MainManager
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.path.join(BASE_DIR, 'config.json')
+IMAGES_DIR = os.path.join(BASE_DIR, 'test_images')
+
+
+class TestBatchManager(unittest.TestCase):
+
+    def test_list_images_sorted(self):
+        images = BatchManager.list_images(IMAGES_DIR)
+
+        self.assertTrue(len(images) > 0)
+        self.assertEqual(images, sorted(images))
+
+    def test_run_matches_sequential(self):
+        image_paths = BatchManager.list_images(IMAGES_DIR)
+
+        # Resultados de referencia imagen a imagen
+        expected = []
+        for path in image_paths:
+            with MainManager(CONFIG_PATH, path) as manager:
+                expected.append(manager.inspect_source(path, array=True).records)
+
+        # Ejecutar en lote con varios procesos y en el propio proceso
+        for workers in (2, 1):
+            results = BatchManager(CONFIG_PATH, workers=workers).run(image_paths)
+
+            # El orden de salida es el de entrada y se conservan la clase y la puntuación
+            self.assertEqual([path for path, _ in results], image_paths)
+            for (_, detections), records in zip(results, expected):
+                np.testing.assert_array_equal(detections.records, records)
+
+    def test_run_missing_image(self):
+        results = BatchManager(CONFIG_PATH, workers=1).run(['missing.jpg'])
+
+        self.assertEqual(results, [('missing.jpg', None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import unittest
+import numpy as np
+from metal import benchmark
+from metal.detection import DEFECT_PATCH, DEFECT_SCRATCH
+
+
+class TestSyntheticPlate(unittest.TestCase):
+
+    def test_deterministic(self):
+        first = benchmark.synthetic_plate(120, 160, seed=3)
+        second = benchmark.synthetic_plate(120, 160, seed=3)
+
+        np.testing.assert_array_equal(first.image, second.image)
+        np.testing.assert_array_equal(first.boxes, second.boxes)
+
+    def test_boxes_cover_defects(self):
+        plate = benchmark.synthetic_plate(300, 400, scratch_density=30, patch_density=30, seed=1)
+
+        self.assertEqual(plate.image.dtype, np.uint8)
+        self.assertEqual(plate.mask.shape, (300, 400))
+        self.assertEqual(len(plate.boxes), len(plate.classes))
+        self.assertIn(DEFECT_SCRATCH, plate.classes)
+        self.assertIn(DEFECT_PATCH, plate.classes)
+
+        covered = np.zeros_like(plate.mask, dtype=bool)
+        for x, y, w, h in plate.boxes:
+            self.assertGreater(w, 0)
+            self.assertGreater(h, 0)
+            self.assertLessEqual(x + w, 400)
+            self.assertLessEqual(y + h, 300)
+            covered[y:y + h, x:x + w] = True
+        # Todos los píxeles de defecto están dentro de alguna caja
+        self.assertFalse(np.any((plate.mask > 0) & ~covered))
+
+    def test_density_scales_with_resolution(self):
+        small = benchmark.synthetic_plate(1000, 1000, scratch_density=10, patch_density=0)
+        large = benchmark.synthetic_plate(2000, 2000, scratch_density=10, patch_density=0)
+
+        self.assertEqual(len(small.boxes), 10)
+        self.assertEqual(len(large.boxes), 40)
+
+
+class TestBenchmarkSuite(unittest.TestCase):
+
+    def test_cases_cover_all_methods(self):
+        names = {name for name, _ in benchmark.default_cases()}
+
+        self.assertIn("preprocessing.GaussianBlurMethod", names)
+        self.assertIn("preprocessing.BrightScratchMethod", names)
+        self.assertIn("detection.MultiDefectDetectionMethod", names)
+        self.assertIn("pipeline.MainManager.start", names)
+        self.assertNotIn("preprocessing.PreprocessingMethod", names)
+
+    def test_run_reports_statistics(self):
+        suite = benchmark.BenchmarkSuite(resolutions=["64x96"], repeats=2, warmup=0,
+                                         patterns=["preprocessing.InvertMethod", "pipeline.*"])
+
+        report = suite.run()
+
+        self.assertEqual(set(report["results"]),
+                         {"preprocessing.InvertMethod@64x96", "pipeline.MainManager.start@64x96"})
+        stats = report["results"]["pipeline.MainManager.start@64x96"]
+        for key in ("p50_ms", "p95_ms", "p99_ms", "throughput_ips", "megapixels_per_s", "peak_bytes"):
+            self.assertIn(key, stats)
+        self.assertLessEqual(stats["p50_ms"], stats["p99_ms"])
+        self.assertEqual(report["metadata"]["repeats"], 2)
+
+
+class TestBaselineComparison(unittest.TestCase):
+
+    def setUp(self):
+        self.baseline = {"results": {"a@200": {"p50_ms": 10.0}, "b@200": {"p50_ms": 10.0}}}
+
+    def test_detects_regression(self):
+        report = {"results": {"a@200": {"p50_ms": 12.0}, "b@200": {"p50_ms": 10.5}, "c@200": {"p50_ms": 99.0}}}
+
+        regressions = benchmark.compare(report, self.baseline, threshold=0.1)
+
+        self.assertEqual([r["case"] for r in regressions], ["a@200"])
+        self.assertAlmostEqual(regressions[0]["ratio"], 1.2)
+
+    def test_deadline_violations(self):
+        report = {"results": {"pipeline.MainManager.start@200": {"p95_ms": 20.0},
+                              "pipeline.MainManager.start@4k": {"p95_ms": 450.0},
+                              "preprocessing.X@4k": {"p95_ms": 900.0}}}
+
+        self.assertEqual(benchmark.deadline_violations(report, 200), ["pipeline.MainManager.start@4k"])
+
+
+if __name__ == "__main__":
+    unittest.main()
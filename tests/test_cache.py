@@ -0,0 +1,185 @@
+import json
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest.mock import patch
+import numpy as np
+from metal.cache import DiskCache, ResultCache, image_digest, pipeline_fingerprint, encode_results, decode_results
+from metal.detection import DetectionResult, DetectionSet, DEFECT_PATCH
+from metal.manager import MainManager
+
+
+class TestCacheKeys(unittest.TestCase):
+
+    def test_image_digest(self):
+        image = np.zeros((20, 30), dtype=np.uint8)
+        other = image.copy()
+        other[5, 5] = 1
+
+        self.assertEqual(image_digest(image), image_digest(image.copy()))
+        self.assertNotEqual(image_digest(image), image_digest(other))
+        # Mismos bytes con otra forma
+        self.assertNotEqual(image_digest(image), image_digest(image.reshape(30, 20)))
+
+    def test_fingerprint_follows_parameters(self):
+        manager = MainManager(None).load()
+        self.addCleanup(manager.close)
+        fingerprint = pipeline_fingerprint(manager)
+
+        with MainManager(None) as other:
+            self.assertEqual(pipeline_fingerprint(other), fingerprint)
+
+        manager.patches_manager.methods[0].sigma = 2.0
+        self.assertNotEqual(pipeline_fingerprint(manager), fingerprint)
+
+    def test_encode_round_trip(self):
+        detections = DetectionSet.from_boxes([(1, 2, 3, 4), (5, 6, 7, 8)], defect_class=DEFECT_PATCH)
+
+        decoded = decode_results(encode_results(detections))
+        np.testing.assert_array_equal(decoded.records, detections.records)
+
+        results = decode_results(encode_results([DetectionResult(1, 2, 3, 4)]))
+        self.assertEqual([tuple(r) for r in results], [(1, 2, 3, 4)])
+
+        single = decode_results(encode_results(DetectionResult(0, 0, 0, 0)))
+        self.assertIsInstance(single, DetectionResult)
+        self.assertIsNone(encode_results(([], [])))
+
+
+class TestResultCache(unittest.TestCase):
+
+    def test_memory_lru(self):
+        cache = ResultCache(max_entries=2)
+        for key in ("a", "b"):
+            cache.put(key, [DetectionResult(1, 1, 1, 1)])
+
+        cache.get("a")
+        cache.put("c", [DetectionResult(2, 2, 2, 2)])
+
+        # "b" era la entrada usada hace más tiempo
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_returns_independent_copies(self):
+        cache = ResultCache()
+        cache.put("a", [DetectionResult(1, 2, 3, 4)])
+
+        cache.get("a")[0].px = 100
+
+        self.assertEqual(cache.get("a")[0].px, 1)
+
+    def test_disk_tier_persists_and_evicts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "cache.sqlite")
+            cache = ResultCache(max_entries=1, path=path, max_bytes=10 ** 6)
+            cache.put("a", [DetectionResult(1, 2, 3, 4)])
+            cache.close()
+
+            reopened = ResultCache(path=path, max_bytes=10 ** 6)
+            self.assertEqual([tuple(r) for r in reopened.get("a")], [(1, 2, 3, 4)])
+            self.assertEqual(reopened.stats()["disk_hits"], 1)
+
+            # Cada entrada ocupa 1 + 28 bytes por detección: con 200 bytes caben pocas
+            reopened.disk.max_bytes = 200
+            for i in range(20):
+                reopened.put(f"k{i}", [DetectionResult(i, i, i, i)] * 2)
+            self.assertLessEqual(reopened.disk.size(), 200)
+            self.assertIsNotNone(reopened.disk.get("k19"))
+            self.assertIsNone(reopened.disk.get("k0"))
+            reopened.close()
+
+    def test_disk_tier_tracks_size_and_evicts_lru(self):
+        with tempfile.TemporaryDirectory() as directory:
+            disk = DiskCache(os.path.join(directory, "cache.sqlite"), max_bytes=100)
+
+            def stored():
+                return disk.connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+            for key in "abcd":
+                disk.put(key, b"x" * 25)
+            # Reemplazar una entrada descuenta su tamaño anterior
+            disk.put("a", b"x" * 10)
+            self.assertEqual(disk.size(), stored())
+            self.assertEqual(disk.size(), 85)
+
+            # El acierto en "b" la hace más reciente: al pasarse del límite solo sale "c"
+            self.assertIsNotNone(disk.get("b"))
+            disk.put("e", b"x" * 30)
+            self.assertEqual(disk.size(), 90)
+            self.assertIsNone(disk.get("c"))
+            for key in "abde":
+                self.assertIsNotNone(disk.get(key))
+
+            disk.clear()
+            self.assertEqual(disk.size(), 0)
+            disk.close()
+
+
+class TestManagerCache(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.directory.name, "config.json")
+        with open(self.config_path, "w") as file:
+            json.dump({"defect_type": "patches", "cache": {"enabled": True}}, file)
+        rng = np.random.default_rng(0)
+        self.image = rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_repeated_inspection_hits_cache(self):
+        manager = MainManager(self.config_path).load()
+        self.addCleanup(manager.close)
+        expected = [tuple(r) for r in manager.inspect(self.image)]
+
+        with patch.object(manager, "_inspect", wraps=manager._inspect) as inspect:
+            cached = [tuple(r) for r in manager.inspect(self.image.copy())]
+            inspect.assert_not_called()
+
+        self.assertEqual(cached, expected)
+        self.assertEqual(manager.cache.stats()["hits"], 1)
+
+    def test_parameter_change_invalidates(self):
+        manager = MainManager(self.config_path).load()
+        self.addCleanup(manager.close)
+        manager.inspect(self.image)
+
+        manager.patches_detector_manager.method.area_min = 1
+        with patch.object(manager, "_inspect", wraps=manager._inspect) as inspect:
+            manager.inspect(self.image)
+            inspect.assert_called_once()
+
+    def test_close_flushes_disk_access_times(self):
+        path = os.path.join(self.directory.name, "cache.sqlite")
+        config = {"defect_type": "patches", "cache": {"enabled": True, "path": path}}
+        with MainManager(config) as manager:
+            manager.inspect(self.image)
+
+        def accessed():
+            connection = sqlite3.connect(path)
+            try:
+                return connection.execute("SELECT accessed FROM results").fetchone()[0]
+            finally:
+                connection.close()
+
+        stored = accessed()
+        time.sleep(0.01)
+
+        # Acierto en disco desde otro manager: la fecha de acceso llega a la base al cerrarlo
+        with MainManager(config) as manager:
+            manager.inspect(self.image)
+            self.assertEqual(manager.cache.stats()["disk_hits"], 1)
+        self.assertIsNone(manager.cache)
+        self.assertGreater(accessed(), stored)
+
+    def test_disabled_by_default(self):
+        with MainManager(None) as manager:
+            self.assertIsNone(manager.cache)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -28,6 +28,103 @@ class TestDetectionResult(unittest.TestCase):
         self.assertEqual(w, 30)
         self.assertEqual(h, 40)
 
+class TestDetectionSet(unittest.TestCase):
+
+    def setUp(self):
+        self.boxes = [(0, 0, 10, 10), (5, 5, 2, 50), (20, 20, 4, 25), (30, 30, 1, 1)]
+        self.detections = DetectionSet.from_boxes(self.boxes, score=[1, 4, 3, 2],
+                                                  defect_class=DEFECT_PATCH, source=3)
+
+    def test_from_boxes(self):
+        self.assertEqual(len(self.detections), 4)
+        self.assertEqual(self.detections.records["area"].tolist(), [100, 100, 100, 1])
+        self.assertTrue(np.all(self.detections.records["defect_class"] == DEFECT_PATCH))
+        np.testing.assert_array_equal(self.detections.boxes, np.array(self.boxes))
+
+    def test_iter_returns_detection_results(self):
+        results = list(self.detections)
+
+        self.assertIsInstance(results[0], DetectionResult)
+        self.assertEqual([tuple(r) for r in results], self.boxes)
+        self.assertEqual(tuple(self.detections[1]), (5, 5, 2, 50))
+
+    def test_sort_is_stable(self):
+        # Las tres primeras cajas tienen la misma área y conservan su orden
+        ordered = self.detections.sort("area")
+        self.assertEqual([tuple(r) for r in ordered], self.boxes)
+
+        ordered = self.detections.sort("score")
+        self.assertEqual(ordered.records["score"].tolist(), [4, 3, 2, 1])
+
+    def test_top_k_matches_sort(self):
+        for k in range(1, 6):
+            for key in ("area", "score"):
+                expected = [tuple(r) for r in self.detections.sort(key)[:k]]
+                self.assertEqual([tuple(r) for r in self.detections.top_k(k, key)], expected)
+
+        # k = 0 (p. ej. max_results=0 en la configuración) devuelve una colección vacía
+        self.assertEqual(len(self.detections.top_k(0)), 0)
+
+    def test_concatenate_and_valid(self):
+        empty = DetectionSet.from_results([DetectionResult(0, 0, 0, 0)])
+        combined = DetectionSet.concatenate([empty, self.detections]).valid()
+
+        self.assertEqual(len(combined), 4)
+
+    def test_to_results_empty(self):
+        empty = DetectionSet()
+
+        self.assertEqual([tuple(r) for r in empty.to_results()], [(0, 0, 0, 0)])
+        self.assertEqual(empty.to_results(empty_result=False), [])
+
+    def test_detect_array_tags_source(self):
+        image = np.zeros((100, 100), dtype=np.uint8)
+        image[10:80, 50:53] = 255
+
+        detections = ScratchDetectionMethod().detect_array(image)
+
+        self.assertEqual(len(detections), 1)
+        self.assertEqual(detections.records["defect_class"][0], DEFECT_SCRATCH)
+        self.assertEqual(DETECTION_SOURCES[detections.records["source"][0]], "ScratchDetectionMethod")
+
+
+class TestComponentDetectors(unittest.TestCase):
+
+    def setUp(self):
+        # Imagen con ruido puntual, una mancha central, una mancha en el borde y un rayón
+        rng = np.random.default_rng(0)
+        self.image = ((rng.random((200, 200)) > 0.995) * 255).astype(np.uint8)
+        self.image[74:116, 74:116] = 0
+        self.image[0:22, 148:172] = 0
+        self.image[18:122, 28:35] = 0
+        self.image[80:110, 80:110] = 255
+        self.image[0:20, 150:170] = 255
+        self.image[20:120, 30:33] = 255
+
+    def test_connected_components_filters_by_area(self):
+        results = ConnectedComponentsDetectionMethod(area_min=50, area_max=1000).detect(self.image)
+
+        self.assertEqual([tuple(r) for r in results], [(80, 80, 30, 30), (150, 0, 20, 20), (30, 20, 3, 100)])
+
+    def test_enhanced_components_filters_border_and_aspect(self):
+        results = EnhancedConnectedComponentsDetectionMethod(area_min=200, border_threshold=10).detect(self.image)
+
+        # La mancha del borde es pequeña y el rayón demasiado alargado
+        self.assertEqual([tuple(r) for r in results], [(80, 80, 30, 30)])
+
+    def test_scratch_detection_filters_line_like(self):
+        results = ScratchDetectionMethod(min_length=30, max_width=20).detect(self.image)
+
+        self.assertEqual([tuple(r) for r in results], [(30, 20, 3, 100)])
+
+    def test_no_components(self):
+        empty = np.zeros((50, 50), dtype=np.uint8)
+
+        for method in (ConnectedComponentsDetectionMethod(), EnhancedConnectedComponentsDetectionMethod(),
+                       ScratchDetectionMethod()):
+            self.assertEqual([tuple(r) for r in method.detect(empty)], [(0, 0, 0, 0)])
+
+
 class TestDetectorManager(unittest.TestCase):
 
     def test_execute(self):
@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+import cv2
+import numpy as np
+from metal.benchmark import synthetic_plate
+from metal.evaluation import Evaluator, calibrate_gate, match_detections, parse_ground_truth
+from metal.manager import MainManager
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.path.join(BASE_DIR, 'config.json')
+IMAGES_DIR = os.path.join(BASE_DIR, 'test_images')
+
+
+def write_annotation(path, boxes):
+    objects = "".join(
+        f"<object><name>defect</name><bndbox><xmin>{x}</xmin><ymin>{y}</ymin>"
+        f"<xmax>{x + w}</xmax><ymax>{y + h}</ymax></bndbox></object>"
+        for x, y, w, h in boxes
+    )
+    with open(path, "w") as file:
+        file.write(f"<annotation><filename>{os.path.basename(path)}</filename>{objects}</annotation>")
+
+
+class TestEvaluation(unittest.TestCase):
+
+    def setUp(self):
+        self.dataset = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dataset)
+
+    def test_parse_ground_truth(self):
+        path = os.path.join(self.dataset, "placa.xml")
+        write_annotation(path, [(10, 20, 30, 40), (0, 0, 5, 5)])
+
+        np.testing.assert_array_equal(parse_ground_truth(path), [[10, 20, 30, 40], [0, 0, 5, 5]])
+
+    def test_match_detections_greedy(self):
+        ground_truth = np.array([[0, 0, 10, 10], [100, 100, 10, 10]])
+        predictions = np.array([[0, 0, 10, 10], [1, 0, 10, 10], [50, 50, 5, 5]])
+
+        # La segunda predicción solapa con una anotación ya emparejada: cuenta como falso positivo
+        tp, fp, fn, ious = match_detections(ground_truth, predictions, 0.8)
+
+        self.assertEqual((tp, fp, fn), (1, 2, 1))
+        self.assertEqual(ious.shape, (3, 2))
+
+    def test_evaluate_dataset(self):
+        names = ["patches_122.jpg", "scratches_136.jpg", "scratches_163.jpg"]
+        for name in names:
+            shutil.copy(os.path.join(IMAGES_DIR, name), self.dataset)
+
+        # Anotaciones: las propias detecciones en las dos primeras y un defecto inexistente en la tercera
+        for name in names[:2]:
+            with MainManager(CONFIG_PATH, os.path.join(IMAGES_DIR, name)) as manager:
+                boxes = [tuple(d) for d in manager.start() if d.width > 0 and d.height > 0]
+            write_annotation(os.path.join(self.dataset, name.replace(".jpg", ".xml")), boxes)
+        write_annotation(os.path.join(self.dataset, "scratches_163.xml"), [(1, 1, 2, 2)])
+        # Imagen sin anotación: no se evalúa
+        shutil.copy(os.path.join(IMAGES_DIR, "patches_test.jpg"), self.dataset)
+
+        report = Evaluator(CONFIG_PATH, workers=1).evaluate_directory(self.dataset)
+
+        self.assertEqual(report["images"], 3)
+        self.assertEqual(report["errors"], 0)
+        self.assertEqual(report["fn"], 1)
+        self.assertEqual(report["precision"], report["tp"] / (report["tp"] + report["fp"]))
+        self.assertEqual([os.path.basename(i["image"]) for i in report["per_image"]], sorted(names))
+        self.assertEqual(report["per_image"][0]["fp"], 0)
+        self.assertIn("p95_ms", report["latency"])
+
+    def test_calibrate_gate(self):
+        # Placas sintéticas: las anotadas con defectos y las limpias (anotación sin objetos)
+        for seed in range(4):
+            defects = synthetic_plate(512, 768, 3.0, 3.0, seed=seed)
+            cv2.imwrite(os.path.join(self.dataset, f"defecto_{seed}.png"), defects.image)
+            write_annotation(os.path.join(self.dataset, f"defecto_{seed}.xml"), defects.boxes.tolist())
+
+            cv2.imwrite(os.path.join(self.dataset, f"limpia_{seed}.png"), synthetic_plate(512, 768, 0, 0, seed=seed).image)
+            write_annotation(os.path.join(self.dataset, f"limpia_{seed}.xml"), [])
+
+        report = calibrate_gate({"gate": {"thresholds": {"blocks": 200, "pixels": 200}}},
+                                Evaluator.list_images(self.dataset), target_fnr=0.0)
+
+        self.assertEqual((report["defective_images"], report["clean_images"]), (4, 4))
+        self.assertEqual(report["false_negative_rate"], 0.0)
+        self.assertEqual(report["clean_rejection_rate"], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,91 @@
+import os
+import unittest
+from unittest.mock import patch
+import numpy as np
+from metal.benchmark import synthetic_plate
+from metal.cache import pipeline_fingerprint
+from metal.gate import CleanPlateGate
+from metal.manager import MainManager
+from metal.tools import Tools
+
+IMAGES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'test_images')
+
+
+def plate(scratch_density=0.0, patch_density=0.0, seed=0):
+    return synthetic_plate(512, 768, scratch_density, patch_density, seed=seed).image
+
+
+class TestCleanPlateGate(unittest.TestCase):
+
+    def setUp(self):
+        self.config = {"defect_type": "auto", "gate": {"enabled": True}}
+
+    def manager(self, config):
+        manager = MainManager(config).load()
+        self.addCleanup(manager.close)
+        return manager
+
+    def test_clean_plate_short_circuits(self):
+        manager = self.manager(self.config)
+
+        with patch.object(manager, "_inspect_full") as inspect_full:
+            results = manager.inspect(plate(seed=1))
+            self.assertEqual(len(manager.inspect_array(plate(seed=2))), 0)
+
+        inspect_full.assert_not_called()
+        self.assertEqual([tuple(r) for r in results], [(0, 0, 0, 0)])
+        self.assertEqual(manager.gate.counters["rejected"], 2)
+
+    def test_defective_plate_runs_pipeline(self):
+        image = plate(patch_density=3.0)
+        manager = self.manager(self.config)
+        expected = self.manager({"defect_type": "auto"}).inspect_array(image)
+
+        np.testing.assert_array_equal(manager.inspect_array(image).records, expected.records)
+        # La primera etapa ya marca la placa: la segunda no se evalúa
+        self.assertEqual(manager.gate.counters, {"images": 1, "rejected": 0, "blocks": 1, "pixels": 0})
+
+    def test_real_defects_pass(self):
+        gate = CleanPlateGate()
+        for name in ("patches_122.jpg", "scratches_136.jpg"):
+            self.assertFalse(gate.is_clean(Tools.read_image(os.path.join(IMAGES_DIR, name))))
+
+    def test_disabled_stage(self):
+        image = plate(scratch_density=3.0, seed=3)
+        self.assertFalse(CleanPlateGate().is_clean(image))
+
+        # Sin la etapa de píxeles el rayón no mueve lo bastante la media de ningún bloque
+        gate = CleanPlateGate(thresholds={"pixels": None})
+        self.assertTrue(gate.is_clean(image))
+        self.assertEqual(gate.counters["rejected"], 1)
+
+    def test_calibrate_meets_target(self):
+        defective = [plate(scratch_density=3.0, seed=seed) for seed in range(6)]
+        clean = [plate(seed=seed) for seed in range(3)]
+
+        # Umbrales demasiado altos: la calibración los baja hasta no perder ninguna placa defectuosa
+        gate = CleanPlateGate(thresholds={"blocks": 200, "pixels": 200})
+        report = gate.calibrate(defective, clean, target_fnr=0.0)
+
+        self.assertEqual(report["false_negative_rate"], 0.0)
+        self.assertEqual(report["clean_rejection_rate"], 1.0)
+        self.assertFalse(any(gate.is_clean(image) for image in defective))
+
+        # Con un objetivo del 50 % se admiten como mucho 3 de 6 placas defectuosas descartadas
+        report = CleanPlateGate().calibrate(defective, target_fnr=0.5)
+        self.assertLessEqual(report["false_negative_rate"], 0.5)
+        self.assertIsNone(report["clean_rejection_rate"])
+
+        with self.assertRaises(ValueError):
+            CleanPlateGate().calibrate([])
+
+    def test_fingerprint_includes_gate(self):
+        fingerprint = pipeline_fingerprint(self.manager(self.config))
+        self.assertNotEqual(pipeline_fingerprint(self.manager({"defect_type": "auto"})), fingerprint)
+
+        self.config["gate"]["thresholds"] = {"pixels": 30}
+        self.assertNotEqual(pipeline_fingerprint(self.manager(self.config)), fingerprint)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import tempfile
+import unittest
+import numpy as np
+import cv2
+from metal.detection import DetectionResult, DetectionSet, ScratchDetectionMethod
+from metal.ingest import ImageLoader
+from metal.tools import Tools
+
+
+class TestImageLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        rng = np.random.default_rng(0)
+        self.image = rng.integers(0, 256, (64, 80, 3), dtype=np.uint8)
+        self.path = os.path.join(self.tmpdir.name, "placa.png")
+        cv2.imwrite(self.path, self.image)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_default_matches_tools(self):
+        loader = ImageLoader()
+        np.testing.assert_array_equal(loader.read(self.path), Tools.read_image(self.path))
+        self.assertEqual(loader.channels, 3)
+
+    def test_grayscale(self):
+        loader = ImageLoader(grayscale=True)
+        image = loader.read(self.path)
+
+        self.assertEqual(image.shape, (64, 80))
+        np.testing.assert_array_equal(image, cv2.imread(self.path, cv2.IMREAD_GRAYSCALE))
+        self.assertEqual(loader.channels, 1)
+
+    def test_reduced_decode(self):
+        loader = ImageLoader(reduce=2)
+        self.assertEqual(loader.read(self.path).shape, (32, 40, 3))
+
+        with open(self.path, "rb") as file:
+            self.assertEqual(loader.decode(file.read()).shape, (32, 40, 3))
+
+        with self.assertRaises(ValueError):
+            ImageLoader(reduce=3)
+
+    def test_load_sources(self):
+        loader = ImageLoader(grayscale=True, reduce=2)
+        with open(self.path, "rb") as file:
+            data = file.read()
+
+        self.assertEqual(loader.load(data).shape, (32, 40))
+        self.assertEqual(loader.load(self.image).shape, (32, 40))
+
+        with self.assertRaises(ValueError):
+            loader.load(os.path.join(self.tmpdir.name, "no_existe.png"))
+
+    def test_raw_frames(self):
+        npy_path = os.path.join(self.tmpdir.name, "frame.npy")
+        raw_path = os.path.join(self.tmpdir.name, "frame.raw")
+        np.save(npy_path, self.image)
+        self.image.tofile(raw_path)
+
+        np.testing.assert_array_equal(ImageLoader().read(npy_path), self.image)
+        np.testing.assert_array_equal(ImageLoader(raw_shape=(64, 80, 3)).read(raw_path), self.image)
+
+        # Sin forma no se puede interpretar un fichero raw
+        with self.assertRaises(ValueError):
+            ImageLoader().read(raw_path)
+
+    def test_prefetch_keeps_order(self):
+        sources = [self.image[:, :, i].copy() for i in range(3)] + ["no_existe.png"]
+        loaded = list(ImageLoader().prefetch(sources, depth=2))
+
+        self.assertEqual(len(loaded), 4)
+        for (source, image), expected in zip(loaded[:3], sources[:3]):
+            self.assertIs(source, expected)
+            np.testing.assert_array_equal(image, expected)
+
+        # El error de lectura se entrega en su posición sin detener el resto
+        self.assertIsInstance(loaded[3][1], ValueError)
+
+    def test_scale_results(self):
+        loader = ImageLoader(reduce=4)
+
+        self.assertEqual(tuple(loader.scale_results(DetectionResult(1, 2, 3, 4))), (4, 8, 12, 16))
+        self.assertEqual([tuple(r) for r in loader.scale_results([DetectionResult(1, 1, 2, 2)])],
+                         [(4, 4, 8, 8)])
+
+        detections = loader.scale_results(DetectionSet.from_boxes([(1, 2, 3, 4)]))
+        np.testing.assert_array_equal(detections.boxes, [[4, 8, 12, 16]])
+        self.assertEqual(int(detections.records["area"][0]), 12 * 16)
+        # Puntuación por área: se reescala con el área y el orden por puntuación y por área coincide
+        self.assertEqual(float(detections.records["score"][0]), 12 * 16)
+
+        # Puntuación por longitud (rayones): se reescala con las coordenadas
+        scratches = DetectionSet.from_boxes([(1, 2, 3, 40)], score=[40], source=ScratchDetectionMethod.source_id)
+        self.assertEqual(float(loader.scale_results(scratches).records["score"][0]), 160)
+
+
+if __name__ == '__main__':
+    unittest.main()
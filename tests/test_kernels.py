@@ -0,0 +1,175 @@
+import threading
+import unittest
+import numpy as np
+import cv2
+from unittest.mock import patch
+from metal.kernels import (LineFilterKernel, LocalContrastKernel, ThreadLocalFactory, directional_kernel,
+                           structuring_element)
+from metal.preprocessing import CLAHEMethod, DirectionalFilterMethod
+
+
+def reference_local_contrast(image, kernel_size, contrast_factor, offset):
+    # Implementación directa con temporales, usada como referencia
+    image_float = image.astype(np.float32)
+    mean_local = cv2.boxFilter(image_float, -1, (kernel_size, kernel_size), normalize=True)
+    mean_squared = cv2.boxFilter(image_float * image_float, -1, (kernel_size, kernel_size), normalize=True)
+    std_local = np.sqrt(np.maximum(mean_squared - mean_local * mean_local, 0))
+    result = ((image_float - mean_local) / (std_local + 1e-5)) * contrast_factor + offset
+    return np.uint8(np.clip(result, 0, 255))
+
+
+class TestLocalContrastKernel(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.test_image = rng.integers(0, 256, (64, 80), dtype=np.uint8)
+
+    def test_matches_reference(self):
+        kernel = LocalContrastKernel(kernel_size=15, contrast_factor=20, offset=128)
+
+        result = kernel.apply(self.test_image)
+
+        expected = reference_local_contrast(self.test_image, 15, 20, 128)
+        np.testing.assert_array_equal(result, expected)
+
+    def test_writes_into_out(self):
+        kernel = LocalContrastKernel(kernel_size=15, contrast_factor=20, offset=128)
+        out = np.empty_like(self.test_image)
+
+        result = kernel.apply(self.test_image, out=out)
+
+        self.assertIs(result, out)
+        np.testing.assert_array_equal(out, reference_local_contrast(self.test_image, 15, 20, 128))
+
+    def test_in_place(self):
+        kernel = LocalContrastKernel(kernel_size=15, contrast_factor=20, offset=128)
+        image = self.test_image.copy()
+
+        kernel.apply(image, out=image)
+
+        np.testing.assert_array_equal(image, reference_local_contrast(self.test_image, 15, 20, 128))
+
+    def test_reuses_buffers_per_shape(self):
+        kernel = LocalContrastKernel(kernel_size=15, contrast_factor=20, offset=128)
+
+        kernel.apply(self.test_image)
+        buffers = kernel._local.buffers
+        kernel.apply(self.test_image)
+        self.assertIs(kernel._local.buffers, buffers)
+
+        # Una forma distinta reserva buffers nuevos
+        kernel.apply(self.test_image[:32])
+        self.assertIsNot(kernel._local.buffers, buffers)
+
+    def test_thread_local_buffers(self):
+        kernel = LocalContrastKernel(kernel_size=15, contrast_factor=20, offset=128)
+        expected = reference_local_contrast(self.test_image, 15, 20, 128)
+        errors = []
+
+        def worker():
+            for _ in range(20):
+                if not np.array_equal(kernel.apply(self.test_image), expected):
+                    errors.append(True)
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+
+
+class TestKernelCache(unittest.TestCase):
+
+    def test_structuring_element_shared(self):
+        kernel = structuring_element(cv2.MORPH_ELLIPSE, (5, 5))
+
+        self.assertIs(structuring_element(cv2.MORPH_ELLIPSE, (5, 5)), kernel)
+        np.testing.assert_array_equal(kernel, cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5)))
+        # La instancia compartida no se puede modificar
+        with self.assertRaises(ValueError):
+            kernel[0, 0] = 1
+
+    def test_directional_kernel(self):
+        size = 7
+        expected = np.zeros((size, size), dtype=np.float32)
+        for i in range(size):
+            expected[i, size - i - 1] = 1
+        expected /= size
+
+        np.testing.assert_array_equal(directional_kernel(135, size), expected)
+        self.assertIs(directional_kernel(135, size), directional_kernel(135, size))
+        self.assertEqual(directional_kernel(0, size)[size // 2].sum(), 1)
+
+    def test_thread_local_factory(self):
+        factory = ThreadLocalFactory(object)
+        main_instance = factory.get()
+        other = []
+
+        thread = threading.Thread(target=lambda: other.append(factory.get()))
+        thread.start()
+        thread.join()
+
+        self.assertIs(factory.get(), main_instance)
+        self.assertIsNot(other[0], main_instance)
+
+    def test_clahe_created_once_per_thread(self):
+        method = CLAHEMethod(clip_limit=2.0, grid_size=(8, 8))
+        image = np.random.default_rng(0).integers(0, 256, (64, 64), dtype=np.uint8)
+
+        with patch('cv2.createCLAHE', wraps=cv2.createCLAHE) as create_clahe:
+            first = method.process(image)
+            second = method.process(image)
+
+        create_clahe.assert_called_once_with(clipLimit=2.0, tileGridSize=(8, 8))
+        np.testing.assert_array_equal(first, second)
+
+
+class TestLineFilterKernel(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.test_image = rng.integers(0, 256, (70, 90), dtype=np.uint8)
+
+    def test_matches_dense_filter(self):
+        for size in (4, 15, 31, 61):
+            kernel = LineFilterKernel([0, 45, 90, 135], size)
+
+            stack = kernel.apply(self.test_image)
+
+            self.assertEqual(stack.shape, (4, 70, 90))
+            for result, angle in zip(stack, [0, 45, 90, 135]):
+                expected = cv2.filter2D(self.test_image.astype(np.float32), -1, directional_kernel(angle, size))
+                np.testing.assert_allclose(result, expected, atol=1e-3, err_msg=f"{angle} {size}")
+
+    def test_other_angles_use_dense_kernel(self):
+        kernel = LineFilterKernel([30], 5)
+
+        # Mismo resultado que filter2D con el kernel denso (sin píxeles para 30°: todo NaN)
+        with np.errstate(invalid="ignore"):
+            result = kernel.apply(self.test_image)[0]
+            expected = cv2.filter2D(self.test_image.astype(np.float32), -1, directional_kernel(30, 5))
+        np.testing.assert_array_equal(np.isnan(result), np.isnan(expected))
+
+    def test_directional_filter_matches_reference(self):
+        image = self.test_image.copy()
+        cv2.line(image, (5, 35), (85, 35), 255, 1)
+        method = DirectionalFilterMethod(kernel_size=31)
+
+        result = method.process(image)
+
+        # Referencia: filtro denso por orientación y máximo de las diferencias absolutas
+        image_float = image.astype(np.float32)
+        responses = [cv2.absdiff(cv2.filter2D(image_float, -1, directional_kernel(angle, 31)), image_float)
+                     for angle in [0, 45, 90, 135]]
+        combined = np.max(responses, axis=0)
+
+        self.assertEqual(result.dtype, np.float32)
+        peaks = result == 255
+        np.testing.assert_allclose(result[~peaks], combined[~peaks], atol=1e-3)
+        self.assertTrue(np.all(result >= combined - 1e-3))
+
+
+if __name__ == '__main__':
+    unittest.main()
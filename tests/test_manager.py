@@ -3,7 +3,7 @@ from unittest.mock import patch, MagicMock
 import numpy as np
 from metal.manager import MainManager
 from metal.preprocessing import PreprocessingManager
-from metal.detection import DetectorManager
+from metal.detection import DetectorManager, DetectionSet
 
 
 class TestMainManager(unittest.TestCase):
@@ -59,5 +59,40 @@ class TestMainManager(unittest.TestCase):
         # Verificar que se devolvieron los resultados esperados
         self.assertEqual(results, expected_results)
 
+    @patch('metal.tools.Tools.read_image')
+    @patch('metal.tools.Tools.parse_config')
+    def test_start_auto_runs_both_branches(self, mock_parse_config, mock_read_image):
+        # Configurar mocks
+        mock_read_image.return_value = self.test_image
+        mock_parse_config.return_value = {'defect_type': 'auto'}
+
+        # Cargar pipelines reales y sustituir las ramas por mocks
+        self.manager.load()
+        self.manager.scratches_manager = MagicMock()
+        self.manager.patches_manager = MagicMock()
+        self.manager.scratches_detector_manager = MagicMock()
+        self.manager.patches_detector_manager = MagicMock()
+        self.manager.scratches_detector_manager.execute_array.return_value = DetectionSet.from_boxes([(0, 0, 5, 60)])
+        self.manager.patches_detector_manager.execute_array.return_value = DetectionSet.from_boxes([(50, 50, 20, 20)])
+
+        results = self.manager.start()
+        self.manager.close()
+
+        # Ambas ramas reciben la imagen original, no la salida de la otra rama
+        self.assertIs(self.manager.scratches_manager.execute_all.call_args[0][0], self.test_image)
+        self.assertIs(self.manager.patches_manager.execute_all.call_args[0][0], self.test_image)
+
+        # Se conservan las detecciones de ambas ramas, ordenadas por área
+        self.assertEqual([tuple(r) for r in results], [(50, 50, 20, 20), (0, 0, 5, 60)])
+
+    def test_context_manager_releases_threads(self):
+        with MainManager({"defect_type": "auto"}) as manager:
+            self.assertTrue(manager.loaded)
+            executor = manager.branch_executor
+            self.assertIsNotNone(executor)
+
+        self.assertIsNone(manager.branch_executor)
+        self.assertTrue(executor._shutdown)
+
 if __name__ == '__main__':
     unittest.main()
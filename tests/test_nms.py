@@ -0,0 +1,71 @@
+import unittest
+import numpy as np
+from metal.detection import DetectionResult
+from metal.nms import box_overlap, non_max_suppression, batched_non_max_suppression, iou_matrix, IOU, IOMIN
+
+
+class TestNMS(unittest.TestCase):
+
+    def setUp(self):
+        # Dos cajas muy solapadas, una contenida en otra y una aislada
+        self.boxes = np.array([
+            [0, 0, 10, 10],
+            [1, 1, 10, 10],
+            [50, 50, 20, 20],
+            [52, 52, 5, 5],
+        ])
+
+    def test_box_overlap_iou(self):
+        overlap = box_overlap(self.boxes[0], self.boxes, IOU)
+
+        self.assertAlmostEqual(overlap[0], 1.0)
+        self.assertAlmostEqual(overlap[1], 81 / 119)
+        self.assertEqual(overlap[2], 0.0)
+
+    def test_iou_matrix(self):
+        matrix = iou_matrix(self.boxes[:3], self.boxes)
+
+        self.assertEqual(matrix.shape, (3, 4))
+        for i, box in enumerate(self.boxes[:3]):
+            np.testing.assert_allclose(matrix[i], box_overlap(box, self.boxes, IOU))
+        self.assertEqual(iou_matrix(np.empty((0, 4)), self.boxes).shape, (0, 4))
+
+    def test_box_overlap_iomin(self):
+        overlap = box_overlap(self.boxes[2], self.boxes, IOMIN)
+
+        # La caja pequeña está contenida por completo en la grande
+        self.assertAlmostEqual(overlap[3], 1.0)
+
+    def test_non_max_suppression_iou(self):
+        keep = non_max_suppression(self.boxes, 0.5)
+
+        # Se ordena por área: la caja contenida tiene IoU bajo y se conserva
+        self.assertEqual(keep.tolist(), [2, 0, 3])
+
+    def test_non_max_suppression_iomin_max_results(self):
+        keep = non_max_suppression(self.boxes, 0.7, criterion=IOMIN, max_results=1)
+
+        self.assertEqual(keep.tolist(), [2])
+
+    def test_non_max_suppression_detection_results(self):
+        boxes = [DetectionResult(*box) for box in self.boxes]
+
+        keep = non_max_suppression(boxes, 0.5, criterion=IOMIN)
+
+        self.assertEqual(keep.tolist(), [2, 0])
+
+    def test_non_max_suppression_empty(self):
+        self.assertEqual(len(non_max_suppression([], 0.5)), 0)
+
+    def test_batched_non_max_suppression(self):
+        # Las mismas cajas en dos imágenes distintas no se suprimen entre sí
+        boxes = np.vstack([self.boxes, self.boxes])
+        groups = np.repeat([0, 1], len(self.boxes))
+
+        keep = batched_non_max_suppression(boxes, groups, 0.5)
+
+        self.assertEqual(keep.tolist(), [2, 0, 3, 6, 4, 7])
+
+
+if __name__ == '__main__':
+    unittest.main()
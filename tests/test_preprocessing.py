@@ -91,6 +91,84 @@ class TestPreprocessingMethods(unittest.TestCase):
             mock_clahe.apply.assert_called_once()
             self.assertTrue(np.all(result == 150))
 
+    def test_bright_scratch_threshold_quantile(self):
+        method = BrightScratchMethod(bright_fraction=0.15)
+        image = np.repeat(np.arange(100, dtype=np.uint8), 100).reshape(100, 100)
+
+        # 16 niveles de 100 píxeles superan el 15 % de la imagen: el umbral es el nivel 84
+        self.assertEqual(method.bright_threshold(image), 84)
+        self.assertEqual(BrightScratchMethod(bright_fraction=0.5).bright_threshold(image), 49)
+
+    def test_bright_scratch_matches_reference(self):
+        rng = np.random.default_rng(2)
+        image = cv2.GaussianBlur(rng.integers(0, 256, (120, 90), dtype=np.uint8), (0, 0), 1.5)
+
+        # Implementación directa: umbral recorriendo el histograma, dos aperturas, OR y cierre
+        enhanced = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8)).apply(image)
+        hist = cv2.calcHist([enhanced], [0], None, [256], [0, 256]).ravel()
+        threshold = next(i for i in range(255, -1, -1) if hist[i:].sum() / enhanced.size > 0.15)
+        binary = cv2.threshold(enhanced, threshold, 255, cv2.THRESH_BINARY)[1]
+        opened = cv2.bitwise_or(cv2.morphologyEx(binary, cv2.MORPH_OPEN, np.ones((7, 1), np.uint8)),
+                                cv2.morphologyEx(binary, cv2.MORPH_OPEN, np.ones((1, 7), np.uint8)))
+        expected = cv2.morphologyEx(opened, cv2.MORPH_CLOSE, np.ones((9, 3), np.uint8))
+
+        method = BrightScratchMethod()
+        np.testing.assert_array_equal(method.process(image), expected)
+
+        out = np.empty(image.shape, dtype=np.uint8)
+        self.assertIs(method.process(image, out=out), out)
+        np.testing.assert_array_equal(out, expected)
+
+    def test_process_batch_matches_process(self):
+        rng = np.random.default_rng(3)
+        stack = cv2.GaussianBlur(rng.integers(0, 256, (40, 24, 24), dtype=np.uint8), (0, 0), 1)
+        stack[0] = 77  # Imagen constante
+        color = np.repeat(stack[..., None], 3, axis=3)
+
+        methods = [ThresholdMethod(0.6), InvertMethod(), NormalizeMethod(), AdaptiveStatsThresholdMethod(),
+                   LocalContrastMethod(), CLAHEMethod(), SobelGradientMethod()]
+        for method in methods:
+            expected = np.stack([method.process(image) for image in stack])
+            np.testing.assert_array_equal(method.process_batch(stack), expected, err_msg=type(method).__name__)
+
+        # Pila en color
+        method = AdaptiveStatsThresholdMethod()
+        np.testing.assert_array_equal(method.process_batch(color),
+                                      np.stack([method.process(image) for image in color]))
+
+        # Salida en un buffer proporcionado
+        out = np.empty(stack.shape, dtype=np.uint8)
+        self.assertIs(LocalContrastMethod().process_batch(stack, out=out), out)
+        self.assertIs(CLAHEMethod().process_batch(stack, out=out), out)
+        for method in (NormalizeMethod(), AdaptiveStatsThresholdMethod()):
+            out = np.empty(stack.shape, dtype=np.uint8)
+            self.assertIs(method.process_batch(stack, out=out), out)
+            np.testing.assert_array_equal(out, method.process_batch(stack), err_msg=type(method).__name__)
+
+        # Pila vacía
+        for method in methods:
+            self.assertEqual(len(method.process_batch(stack[:0])), 0, msg=type(method).__name__)
+
+    def test_execute_all_batch(self):
+        rng = np.random.default_rng(4)
+        stack = cv2.GaussianBlur(rng.integers(0, 256, (12, 48, 48), dtype=np.uint8), (0, 0), 2)
+
+        for buffer_pool in (None, BufferPool()):
+            manager = PreprocessingManager(buffer_pool=buffer_pool)
+            manager.add_method(GaussianBlurMethod(sigma=1.5))
+            manager.add_method(LocalContrastMethod(kernel_size=25, contrast_factor=25))
+            manager.add_method(AdaptiveThresholdMethod(block_size=35, C=7))
+            manager.add_method(MorphologyMethod(operation='close', kernel_size=7))
+            manager.add_method(MorphologyMethod(operation='open', kernel_size=3))
+            manager.compile(ImageFormat(1, np.uint8))
+
+            expected = np.stack([manager.execute_all(image).copy() for image in stack])
+            result = manager.execute_all_batch(stack)
+
+            self.assertEqual(result.shape, stack.shape)
+            np.testing.assert_array_equal(result, expected)
+            self.assertEqual(manager.execute_all_batch(stack[:0]).shape, (0, 48, 48))
+
     def test_preprocessing_manager(self):
         # Crear manager
         manager = PreprocessingManager()
@@ -117,6 +195,146 @@ class TestPreprocessingMethods(unittest.TestCase):
         expected = self.test_image.copy() + 100
         np.testing.assert_array_equal(result, expected)
 
+    def test_buffer_pool_ping_pong(self):
+        pool = BufferPool()
+
+        first = pool.get((10, 10), np.uint8)
+        second = pool.get((10, 10), np.uint8, avoid=first)
+
+        # Dos buffers distintos que se reutilizan entre llamadas
+        self.assertIsNot(first, second)
+        self.assertIs(pool.get((10, 10), np.uint8, avoid=second), first)
+        self.assertIs(pool.get((10, 10), np.uint8, avoid=first), second)
+
+        # Otra forma u otro dtype usan buffers propios
+        self.assertEqual(pool.get((5, 5), np.float32).dtype, np.float32)
+
+    def test_buffer_pool_evicts_least_recently_used(self):
+        pool = BufferPool(max_shapes=2)
+
+        first = pool.get((10, 10), np.uint8)
+        pool.get((20, 20), np.uint8)
+        self.assertIs(pool.get((10, 10), np.uint8), first)
+
+        # La forma (20, 20) es la menos usada y se descarta; (10, 10) se conserva
+        pool.get((30, 30), np.uint8)
+        self.assertEqual(len(pool._local.buffers), 2)
+        self.assertIs(pool.get((10, 10), np.uint8), first)
+        self.assertNotIn(((20, 20), np.dtype(np.uint8)), pool._local.buffers)
+
+    def test_preprocessing_manager_with_buffer_pool(self):
+        methods = [GaussianBlurMethod(sigma=1.5), LocalContrastMethod(), AdaptiveThresholdMethod(),
+                   MorphologyMethod('close', 7), MorphologyMethod('open', 3), SobelGradientMethod()]
+
+        manager = PreprocessingManager()
+        pooled_manager = PreprocessingManager(buffer_pool=BufferPool())
+        for method in methods:
+            manager.add_method(method)
+            pooled_manager.add_method(method)
+
+        original = self.test_image.copy()
+        expected = manager.execute_all(self.test_image)
+
+        # En régimen estacionario se reutilizan los mismos buffers y el resultado no cambia
+        for _ in range(3):
+            result = pooled_manager.execute_all(self.test_image)
+            np.testing.assert_array_equal(result, expected)
+
+        # La imagen de entrada nunca se modifica
+        np.testing.assert_array_equal(self.test_image, original)
+
+    def test_compiled_plan_fuses_morphology(self):
+        manager = PreprocessingManager()
+        manager.add_method(AdaptiveThresholdMethod())
+        manager.add_method(MorphologyMethod('close', 7))
+        manager.add_method(MorphologyMethod('open', 3))
+        manager.add_method(MorphologyMethod('close', (3, 9)))
+
+        plan = manager.compile(ImageFormat(1, np.uint8))
+
+        self.assertEqual(plan.describe(), ['0.AdaptiveThresholdMethod', '1-3.FusedMorphologyStep'])
+        # Dilatación 7, erosión 7+3-1, dilatación 3 + (3, 9) y erosión (3, 9); tamaños en (alto, ancho)
+        self.assertEqual([size for _, size, _ in plan.steps[1][1].primitives],
+                         [(7, 7), (9, 9), (11, 5), (9, 3)])
+
+    def test_compiled_plan_matches_methods(self):
+        rng = np.random.default_rng(0)
+        image = rng.integers(0, 256, (60, 80, 3), dtype=np.uint8)
+        methods = [GaussianBlurMethod(sigma=1.5), LocalContrastMethod(), AdaptiveThresholdMethod(),
+                   MorphologyMethod('close', 7), MorphologyMethod('open', (4, 2)), MorphologyMethod('erode', 5),
+                   UmbralizeMethod(), InvertMethod(), InvertMethod(), MorphologyMethod('dilate', 3)]
+
+        manager = PreprocessingManager()
+        compiled = PreprocessingManager(buffer_pool=BufferPool())
+        for method in methods:
+            manager.add_method(method)
+            compiled.add_method(method)
+        compiled.compile(ImageFormat.of(image))
+
+        # Umbralizar una imagen binaria y las dos inversiones se eliminan del plan
+        self.assertEqual(compiled.plan_for(ImageFormat.of(image)).describe(),
+                         ['0.GaussianBlurMethod', '1.LocalContrastMethod', '2.AdaptiveThresholdMethod',
+                          '3-9.FusedMorphologyStep'])
+
+        expected = manager.execute_all(image)
+        for _ in range(2):
+            np.testing.assert_array_equal(compiled.execute_all(image), expected)
+
+        # Otro formato de entrada obtiene su propio plan
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        np.testing.assert_array_equal(compiled.execute_all(gray), manager.execute_all(gray))
+        self.assertEqual(len(compiled.plans), 2)
+
+    def test_compiled_plan_binarizes_float_input(self):
+        rng = np.random.default_rng(2)
+        image = rng.integers(0, 256, (60, 80), dtype=np.uint8)
+        methods = [DirectionalFilterMethod(), MorphologyMethod('none'), UmbralizeMethod()]
+
+        manager = PreprocessingManager()
+        compiled = PreprocessingManager()
+        for method in methods:
+            manager.add_method(method)
+            compiled.add_method(method)
+        plan = compiled.compile(ImageFormat.of(image))
+
+        # La operación desconocida binariza la salida en coma flotante: no se elimina del plan
+        self.assertEqual(plan.describe(), ['0.DirectionalFilterMethod', '1.MorphologyMethod'])
+        self.assertEqual(plan.output_format, ImageFormat(1, np.uint8, True))
+        result = compiled.execute_all(image)
+        self.assertEqual(result.dtype, np.uint8)
+        np.testing.assert_array_equal(result, manager.execute_all(image))
+
+        # Sobre una imagen uint8 sí es la identidad
+        self.assertTrue(MorphologyMethod('none').is_identity(ImageFormat(1, np.uint8)))
+        self.assertFalse(MorphologyMethod('none').is_identity(ImageFormat()))
+
+    def test_compiled_plan_keeps_elliptic_kernels(self):
+        manager = PreprocessingManager()
+        manager.add_method(MorphologyMethod('close', 5, kernel_type=cv2.MORPH_ELLIPSE))
+        manager.add_method(MorphologyMethod('open', 3))
+
+        plan = manager.compile(ImageFormat(1, np.uint8))
+
+        self.assertEqual(plan.describe(), ['0.MorphologyMethod', '1.MorphologyMethod'])
+
+    def test_approximate_blur_contrast_fusion(self):
+        rng = np.random.default_rng(1)
+        image = cv2.GaussianBlur(rng.integers(0, 256, (64, 64), dtype=np.uint8), (0, 0), 2)
+
+        manager = PreprocessingManager()
+        manager.add_method(GaussianBlurMethod(sigma=1.5))
+        manager.add_method(LocalContrastMethod())
+        expected = manager.execute_all(image)
+
+        # Solo se combinan si se permite un resultado aproximado
+        self.assertEqual(len(manager.compile(ImageFormat(1, np.uint8)).steps), 2)
+        plan = manager.compile(ImageFormat(1, np.uint8), approximate=True)
+        self.assertEqual(plan.describe(), ['0-1.FusedBlurContrastStep'])
+
+        result = manager.execute_all(image)
+        self.assertEqual(result.dtype, np.uint8)
+        self.assertLess(np.mean(np.abs(result.astype(int) - expected)), 3)
+
 
 if __name__ == '__main__':
     unittest.main()
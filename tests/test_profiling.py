@@ -0,0 +1,138 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from metal.profiling import Profiler
+from metal.preprocessing import PreprocessingManager, ThresholdMethod, InvertMethod
+from metal.detection import DetectorManager, ContrastMethod
+from metal.manager import MainManager
+
+
+class TestProfiler(unittest.TestCase):
+
+    def test_from_config_disabled(self):
+        self.assertIsNone(Profiler.from_config({}))
+        self.assertIsNone(Profiler.from_config({"profiling": {"enabled": False}}))
+
+    def test_from_config_enabled(self):
+        profiler = Profiler.from_config({"profiling": {"enabled": True, "window": 50}})
+
+        self.assertIsInstance(profiler, Profiler)
+        self.assertEqual(profiler.window, 50)
+        self.assertFalse(profiler.trace_memory)
+
+    def test_records_stage_statistics(self):
+        profiler = Profiler()
+        output = np.zeros((10, 20), dtype=np.uint8)
+
+        for _ in range(3):
+            profiler.stop(profiler.start(), "stage", output)
+
+        summary = profiler.summary()["stage"]
+        self.assertEqual(summary["count"], 3)
+        self.assertEqual(summary["output_shape"], [10, 20])
+        self.assertEqual(summary["output_dtype"], "uint8")
+        self.assertEqual(summary["output_bytes"], 200)
+        self.assertLessEqual(summary["p50_ms"], summary["p99_ms"])
+        self.assertLessEqual(summary["p99_ms"], summary["max_ms"])
+
+    def test_trace_memory(self):
+        profiler = Profiler(trace_memory=True)
+
+        token = profiler.start()
+        data = [bytearray(1 << 16) for _ in range(4)]
+        profiler.stop(token, "alloc", None)
+
+        self.assertGreaterEqual(profiler.summary()["alloc"]["allocated_bytes"], 4 << 16)
+        del data
+
+    def test_trace_memory_nested(self):
+        profiler = Profiler(trace_memory=True)
+
+        # Una etapa interior no altera la medida de la exterior que la contiene
+        outer = profiler.start()
+        first = bytearray(1 << 18)
+        inner = profiler.start()
+        second = bytearray(1 << 16)
+        profiler.stop(inner, "inner", None)
+        profiler.stop(outer, "outer", None)
+
+        summary = profiler.summary()
+        self.assertGreaterEqual(summary["inner"]["allocated_bytes"], 1 << 16)
+        self.assertLess(summary["inner"]["allocated_bytes"], 1 << 18)
+        self.assertGreaterEqual(summary["outer"]["allocated_bytes"], (1 << 18) + (1 << 16))
+        del first, second
+
+    def test_prometheus_format(self):
+        profiler = Profiler()
+        profiler.stop(profiler.start(), "patches.0.GaussianBlurMethod", np.zeros(4, dtype=np.uint8))
+
+        text = profiler.to_prometheus()
+
+        self.assertIn('# TYPE metal_stage_seconds summary', text)
+        self.assertIn('metal_stage_seconds{stage="patches.0.GaussianBlurMethod",quantile="0.99"}', text)
+        self.assertIn('metal_stage_seconds_count{stage="patches.0.GaussianBlurMethod"} 1', text)
+        self.assertIn('metal_stage_output_bytes_total{stage="patches.0.GaussianBlurMethod"} 4', text)
+
+    def test_save_json(self):
+        profiler = Profiler()
+        profiler.stop(profiler.start(), "stage")
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "profile.json")
+            profiler.save(path)
+            with open(path) as file:
+                data = json.load(file)
+
+        self.assertEqual(data["stages"]["stage"]["count"], 1)
+
+
+class TestManagersProfiling(unittest.TestCase):
+
+    def setUp(self):
+        self.test_image = np.random.default_rng(0).integers(0, 256, (32, 32), dtype=np.uint8)
+
+    def test_preprocessing_stages(self):
+        profiler = Profiler()
+        manager = PreprocessingManager(profiler=profiler, name="scratches")
+        manager.add_method(ThresholdMethod(factor=0.5))
+        manager.add_method(InvertMethod())
+
+        manager.execute_all(self.test_image)
+
+        self.assertEqual(set(profiler.summary()),
+                         {"scratches.0.ThresholdMethod", "scratches.1.InvertMethod"})
+
+    def test_detector_stage(self):
+        profiler = Profiler()
+        manager = DetectorManager(ContrastMethod(), profiler=profiler, name="scratches.detector")
+
+        manager.execute(self.test_image)
+
+        self.assertIn("scratches.detector.ContrastMethod", profiler.summary())
+
+    def test_main_manager_from_config(self):
+        with tempfile.TemporaryDirectory() as directory:
+            config_path = os.path.join(directory, "config.json")
+            with open(config_path, "w") as file:
+                json.dump({"defect_type": "patches", "profiling": {"enabled": True}}, file)
+
+            manager = MainManager(config_path).load()
+            manager.inspect(self.test_image)
+
+        stages = manager.profiler.summary()
+        self.assertIn("total", stages)
+        self.assertIn("patches.0.GaussianBlurMethod", stages)
+        self.assertIn("patches.detector.EnhancedConnectedComponentsDetectionMethod", stages)
+
+    def test_main_manager_disabled_by_default(self):
+        manager = MainManager(None).load()
+
+        self.assertIsNone(manager.profiler)
+        self.assertIsNone(manager.patches_manager.profiler)
+        manager.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+from unittest.mock import patch
+import numpy as np
+import cv2
+from metal.benchmark import synthetic_plate
+from metal.cache import pipeline_fingerprint
+from metal.manager import MainManager
+
+
+class TestPyramidInspector(unittest.TestCase):
+
+    def setUp(self):
+        # Pipeline local (sin estadísticas globales): las regiones dan lo mismo que la imagen completa
+        self.config = {
+            "defect_type": "patches",
+            "patches_preprocessing": [
+                {"name": "MedianBlurMethod", "params": {"ksize": 3}},
+                {"name": "UmbralizeMethod", "params": {}},
+                {"name": "MorphologyMethod", "params": {"operation": "close", "kernel_size": 3}}
+            ],
+            "patches_detector": {
+                "name": "ConnectedComponentsDetectionMethod",
+                "params": {"area_min": 100, "area_max": 100000, "max_results": 50}
+            },
+            "pyramid": {"enabled": True, "factor": 4}
+        }
+
+        # Placa grande y casi limpia con unas pocas manchas, una de ellas en el borde
+        self.plate = np.full((1024, 1536), 50, dtype=np.uint8)
+        self.plate[100:130, 200:260] = 255
+        self.plate[600:700, 900:940] = 255
+        self.plate[0:40, 1500:1536] = 255
+
+    def full_config(self):
+        return {key: value for key, value in self.config.items() if key != "pyramid"}
+
+    def test_matches_full_image(self):
+        manager = MainManager(self.config).load()
+        expected = MainManager(self.full_config()).load().inspect_array(self.plate)
+
+        detections = manager.inspect_array(self.plate)
+
+        self.assertEqual(len(detections), 3)
+        self.assertEqual(sorted(detections.boxes.tolist()), sorted(expected.boxes.tolist()))
+        self.assertEqual(manager.pyramid.counters, {"images": 1, "full": 0, "clean": 0, "regions": 3})
+
+    def test_clean_plate_returns_empty_result(self):
+        manager = MainManager(self.config).load()
+        results = manager.inspect(np.full((1024, 1024), 50, dtype=np.uint8))
+
+        self.assertEqual([tuple(r) for r in results], [(0, 0, 0, 0)])
+        self.assertEqual(manager.pyramid.counters["clean"], 1)
+
+    def test_small_components_are_not_candidates(self):
+        # Por debajo de margin * area_min no merece la pena revisar la región
+        plate = np.full((1024, 1024), 50, dtype=np.uint8)
+        plate[500:504, 500:504] = 255
+
+        manager = MainManager(self.config).load()
+        self.assertEqual(len(manager.inspect_array(plate)), 0)
+        self.assertEqual(manager.pyramid.counters["clean"], 1)
+
+    def test_falls_back_to_full_image(self):
+        self.config["pyramid"]["max_regions"] = 2
+        manager = MainManager(self.config).load()
+        expected = MainManager(self.full_config()).load().inspect_array(self.plate)
+
+        np.testing.assert_array_equal(manager.inspect_array(self.plate).records, expected.records)
+        self.assertEqual(manager.pyramid.counters["full"], 1)
+
+    def test_small_images_are_processed_whole(self):
+        image = self.plate[:256, :256]
+        manager = MainManager(self.config).load()
+
+        np.testing.assert_array_equal(manager.inspect_array(image).records,
+                                      MainManager(self.full_config()).load().inspect_array(image).records)
+        self.assertEqual(manager.pyramid.counters["images"], 0)
+
+    def test_default_pipeline_keeps_large_defects(self):
+        plate = cv2.cvtColor(synthetic_plate(2048, 2048, 0.5, 0.5, seed=1).image, cv2.COLOR_GRAY2BGR)
+        config = {"defect_type": "patches", "pyramid": {"enabled": True}}
+
+        expected = MainManager({"defect_type": "patches"}).load().inspect_array(plate)
+        detections = MainManager(config).load().inspect_array(plate)
+
+        large = [box for box in expected.boxes.tolist() if box[2] * box[3] >= 10000]
+        self.assertTrue(large)
+        for box in large:
+            self.assertIn(box, detections.boxes.tolist())
+
+    def test_auto_mode_uses_branch_merger(self):
+        manager = MainManager({"defect_type": "auto", "pyramid": {"enabled": True}}).load()
+        self.addCleanup(manager.close)
+
+        merger = manager.branch_merger
+        with patch.object(merger, "select", wraps=merger.select) as select:
+            detections = manager.inspect_array(self.plate)
+
+        # Una selección por región (fusión de ramas) y la final sobre toda la placa
+        regions = manager.pyramid.counters["regions"]
+        self.assertGreater(regions, 0)
+        self.assertEqual(select.call_count, regions + 1)
+        self.assertLessEqual(len(detections), 5)
+
+    def test_fingerprint_includes_pyramid(self):
+        fingerprint = pipeline_fingerprint(MainManager(self.config).load())
+        self.assertNotEqual(pipeline_fingerprint(MainManager(self.full_config()).load()), fingerprint)
+
+        self.config["pyramid"]["margin"] = 0.25
+        self.assertNotEqual(pipeline_fingerprint(MainManager(self.config).load()), fingerprint)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+import base64
+import io
+import json
+import socket
+import threading
+import unittest
+from unittest.mock import MagicMock, patch
+import numpy as np
+import cv2
+from metal.detection import DetectionResult, DetectionSet, DEFECT_PATCH
+from metal.ingest import ImageLoader
+from metal.output import BINARY_DTYPE
+from metal.service import InspectionService, BinaryProtocol
+
+
+class TestInspectionService(unittest.TestCase):
+
+    def setUp(self):
+        # Crear manager mock que devuelve siempre la misma detección
+        self.manager = MagicMock()
+        self.manager.load.return_value = self.manager
+        self.manager.inspect.return_value = [DetectionResult(1, 2, 3, 4)]
+        self.manager.loader = ImageLoader()
+
+        self.service = InspectionService(self.manager)
+        self.test_image = np.zeros((20, 20), dtype=np.uint8)
+
+    @patch('metal.tools.Tools.read_image')
+    def test_serve_stream_paths(self, mock_read_image):
+        mock_read_image.return_value = self.test_image
+
+        input_stream = io.StringIO("a.jpg\n\nb.jpg\n")
+        output_stream = io.StringIO()
+        self.service.serve_stream(input_stream, output_stream)
+
+        # Los pipelines se cargan una sola vez para todas las imágenes
+        self.manager.load.assert_called_once()
+        self.assertEqual(self.manager.inspect.call_count, 2)
+        self.assertEqual(output_stream.getvalue(), "x=1, y=2, w=3, h=4\n\n" * 2)
+
+    def test_serve_stream_base64(self):
+        _, encoded = cv2.imencode('.png', self.test_image)
+        request = InspectionService.BASE64_PREFIX + base64.b64encode(encoded.tobytes()).decode()
+
+        output_stream = io.StringIO()
+        self.service.serve_stream(io.StringIO(request + "\n"), output_stream)
+
+        image = self.manager.inspect.call_args[0][0]
+        self.assertEqual(image.shape[:2], self.test_image.shape)
+        self.assertEqual(output_stream.getvalue(), "x=1, y=2, w=3, h=4\n\n")
+
+    @patch('metal.tools.Tools.read_image')
+    def test_serve_stream_error(self, mock_read_image):
+        mock_read_image.return_value = None
+
+        output_stream = io.StringIO()
+        self.service.serve_stream(io.StringIO("missing.jpg\n"), output_stream)
+
+        # Un error no detiene el servicio, se informa en la respuesta
+        self.assertTrue(output_stream.getvalue().startswith("error="))
+        self.manager.inspect.assert_not_called()
+
+
+class TestProtocols(unittest.TestCase):
+
+    def setUp(self):
+        self.manager = MagicMock()
+        self.manager.load.return_value = self.manager
+        self.manager.loader = ImageLoader()
+        self.manager.inspect_array.return_value = DetectionSet.from_boxes([(1, 2, 3, 4)], defect_class=DEFECT_PATCH)
+
+        _, encoded = cv2.imencode('.png', np.zeros((20, 20), dtype=np.uint8))
+        self.encoded = encoded.tobytes()
+
+    def test_ndjson_pipelined(self):
+        service = InspectionService(self.manager, protocol="ndjson", max_in_flight=2)
+        image = base64.b64encode(self.encoded).decode()
+        requests = [{"id": i, "image": image} for i in range(5)] + [{"id": 9, "path": "no_existe.png"}]
+
+        output_stream = io.StringIO()
+        service.serve_stream(io.StringIO("".join(json.dumps(r) + "\n" for r in requests) + "no es json\n"),
+                             output_stream)
+        responses = [json.loads(line) for line in output_stream.getvalue().splitlines()]
+
+        # Respuestas en el orden de las peticiones, con su identificador
+        self.assertEqual([r["id"] for r in responses], [0, 1, 2, 3, 4, 9, 6])
+        self.assertEqual(responses[0]["detections"], [{"x": 1, "y": 2, "w": 3, "h": 4, "class": "patch", "score": 12.0}])
+        self.assertIn("error", responses[5])
+        self.assertIn("error", responses[6])
+        self.assertEqual(self.manager.inspect_array.call_count, 5)
+
+    def test_binary_stream(self):
+        service = InspectionService(self.manager, protocol="binary")
+        header = BinaryProtocol.HEADER
+        request = (header.pack(7, 1, len(self.encoded)) + self.encoded +
+                   header.pack(8, 0, len(b"no_existe.png")) + b"no_existe.png")
+
+        output_stream = io.BytesIO()
+        service.serve_stream(io.BytesIO(request), output_stream)
+        data = output_stream.getvalue()
+
+        request_id, status, length = header.unpack_from(data)
+        self.assertEqual((request_id, status, length), (7, BinaryProtocol.OK, BINARY_DTYPE.itemsize))
+        records = np.frombuffer(data, dtype=BINARY_DTYPE, count=1, offset=header.size)
+        self.assertEqual(tuple(records[["px", "py", "width", "height"]][0]), (1, 2, 3, 4))
+
+        request_id, status, _ = header.unpack_from(data, header.size + length)
+        self.assertEqual((request_id, status), (8, BinaryProtocol.ERROR))
+
+    def test_tcp_persistent_connection(self):
+        service = InspectionService(self.manager, protocol="binary")
+        server = service.tcp_server(0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        header = BinaryProtocol.HEADER
+
+        try:
+            with socket.create_connection(server.server_address) as connection:
+                # Varias peticiones enviadas antes de leer ninguna respuesta
+                connection.sendall(b"".join(header.pack(i, 1, len(self.encoded)) + self.encoded for i in range(3)))
+                stream = connection.makefile("rb")
+                ids = []
+                for _ in range(3):
+                    request_id, status, length = header.unpack(stream.read(header.size))
+                    stream.read(length)
+                    ids.append((request_id, status))
+        finally:
+            server.shutdown()
+            server.server_close()
+            service.close()
+
+        self.assertEqual(ids, [(0, 0), (1, 0), (2, 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
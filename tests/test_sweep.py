@@ -0,0 +1,117 @@
+import json
+import os
+import unittest
+import numpy as np
+from metal.manager import MainManager
+from metal.preprocessing import ImageFormat
+from metal.sweep import ParameterSweep, SearchSpace, SweepTree, apply_parameters
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_PATH = os.path.join(BASE_DIR, 'config.json')
+IMAGES_DIR = os.path.join(BASE_DIR, 'test_images')
+
+
+class TestSweep(unittest.TestCase):
+
+    def setUp(self):
+        with open(CONFIG_PATH) as file:
+            self.config = json.load(file)
+        self.image_paths = [os.path.join(IMAGES_DIR, name) for name in ("patches_122.jpg", "scratches_136.jpg")]
+
+    def test_search_space(self):
+        space = SearchSpace({"a": [1, 2, 3], "b": [10, 20]})
+
+        grid = list(space.grid())
+        self.assertEqual(len(grid), 6)
+        self.assertEqual(grid[0], {"a": 1, "b": 10})
+
+        sample = space.sample(4, seed=1)
+        self.assertEqual(len(sample), 4)
+        self.assertEqual(len({tuple(p.items()) for p in sample}), 4)
+        self.assertTrue(all(p in grid for p in sample))
+        self.assertEqual(len(space.sample(100)), 6)
+
+    def test_apply_parameters(self):
+        config = apply_parameters(self.config, {
+            "patches_preprocessing.LocalContrastMethod.contrast_factor": 10,
+            "patches_preprocessing.2.block_size": 25,
+            "scratches_detector.min_length": 40,
+            "plan.enabled": False,
+        })
+
+        self.assertEqual(config["patches_preprocessing"][1]["params"]["contrast_factor"], 10)
+        self.assertEqual(config["patches_preprocessing"][2]["params"]["block_size"], 25)
+        self.assertEqual(config["scratches_detector"]["params"]["min_length"], 40)
+        self.assertEqual(config["plan"], {"enabled": False})
+        # La configuración original no cambia
+        self.assertEqual(self.config["scratches_detector"]["params"]["min_length"], 30)
+
+    def test_gate_and_pyramid_rejected(self):
+        # SweepTree no ejecuta la puerta ni la pirámide: todas las variantes darían el mismo F1
+        with self.assertRaises(ValueError):
+            apply_parameters(self.config, {"gate.thresholds.pixels": 20})
+        with self.assertRaises(ValueError):
+            apply_parameters(self.config, {"pyramid.factor": 2})
+
+        for section in ("gate", "pyramid"):
+            with self.assertRaises(ValueError):
+                SweepTree([dict(self.config, **{section: {"enabled": True}})])
+
+    def test_ingest_must_be_shared(self):
+        # Cada imagen se decodifica una vez para todas las variantes
+        with self.assertRaises(ValueError):
+            apply_parameters(self.config, {"ingest.reduce": 2})
+        with self.assertRaises(ValueError):
+            SweepTree([self.config, dict(self.config, ingest={"grayscale": True})])
+
+        tree = SweepTree([dict(self.config, ingest={"reduce": 2})] * 2)
+        self.assertEqual(tree.loader.reduce, 2)
+
+    def test_tree_matches_manager(self):
+        space = SearchSpace({"scratches_detector.min_length": [20, 40],
+                             "patches_preprocessing.MorphologyMethod.kernel_size": [5, 7]})
+        configs = [apply_parameters(self.config, point) for point in space.grid()]
+        tree = SweepTree(configs)
+
+        for image_path in self.image_paths:
+            detections, runs = tree.evaluate(tree.loader.load(image_path))
+            for config, result in zip(configs, detections):
+                with MainManager(config) as manager:
+                    expected = manager.inspect_source(image_path, array=True)
+                np.testing.assert_array_equal(result.records, expected.records)
+
+            # Rayones: 3 pasos comunes y 2 detectores. Manchas: 3 pasos comunes, la morfología
+            # fusionada con 2 valores y el mismo detector tras cada una
+            self.assertEqual(runs["preprocessing"], 3 + 3 + 2)
+            self.assertEqual(runs["detector"], 2 + 2)
+
+    def test_only_detector_varies(self):
+        space = SearchSpace({"patches_detector.area_min": [100, 150, 200, 250, 300]})
+        sweep = ParameterSweep({**self.config, "defect_type": "patches"}, space.grid())
+        tree = SweepTree(sweep.configs)
+
+        _, runs = tree.evaluate(tree.loader.load(self.image_paths[0]))
+
+        # El preprocesado se calcula una vez y solo el detector se ejecuta por variante
+        self.assertEqual(runs["detector"], 5)
+        with MainManager(sweep.configs[0]) as manager:
+            plan = manager.patches_manager.plan_for(ImageFormat(tree.loader.channels, np.uint8))
+        self.assertEqual(runs["preprocessing"], len(plan.steps))
+
+    def test_run_reports_f1(self):
+        space = SearchSpace({"patches_detector.area_min": [5000, 200]})
+        with MainManager(self.config) as manager:
+            ground_truth = [manager.inspect_source(path, array=True).boxes for path in self.image_paths]
+
+        report = ParameterSweep(self.config, space.grid()).run(self.image_paths, ground_truth)
+
+        self.assertEqual(report["variants"], 2)
+        self.assertEqual(report["errors"], 0)
+        # La variante con los parámetros de config.json reproduce exactamente las anotaciones
+        best = report["results"][0]
+        self.assertEqual(best["params"], {"patches_detector.area_min": 200})
+        self.assertEqual(best["f1"], 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
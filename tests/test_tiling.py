@@ -0,0 +1,119 @@
+import json
+import os
+import tempfile
+import unittest
+import numpy as np
+from metal.manager import MainManager
+from metal.tiling import TiledInspector, open_scan
+
+
+class TestTiledInspector(unittest.TestCase):
+
+    def setUp(self):
+        # Pipeline local (sin estadísticas globales) para comparar con la imagen completa
+        config = {
+            "defect_type": "patches",
+            "patches_preprocessing": [
+                {"name": "MedianBlurMethod", "params": {"ksize": 3}},
+                {"name": "UmbralizeMethod", "params": {}},
+                {"name": "MorphologyMethod", "params": {"operation": "close", "kernel_size": 3}}
+            ],
+            "patches_detector": {
+                "name": "ConnectedComponentsDetectionMethod",
+                "params": {"area_min": 20, "area_max": 100000, "max_results": 50}
+            }
+        }
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.tmp_dir.name, 'config.json')
+        with open(self.config_path, 'w') as file:
+            json.dump(config, file)
+
+        # Escaneo con manchas dentro de teselas, sobre costuras y en una esquina entre cuatro teselas
+        self.scan = np.full((700, 900), 50, dtype=np.uint8)
+        self.scan[30:60, 40:90] = 255
+        self.scan[180:230, 240:330] = 255
+        self.scan[380:420, 180:220] = 255
+        self.scan[500:690, 600:640] = 255
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_pipeline_halo(self):
+        manager = MainManager(self.config_path).load()
+
+        # Mediana 3x3 (1) + cierre 3x3 (2)
+        self.assertEqual(manager.pipeline_halo(), 3)
+
+    def test_tiles_cover_image(self):
+        inspector = TiledInspector(MainManager(self.config_path), tile_size=200, halo=10)
+        coverage = np.zeros(self.scan.shape, dtype=np.int32)
+
+        for (y0, x0, y1, x1), (ey0, ex0, ey1, ex1) in inspector.tiles(*self.scan.shape):
+            coverage[y0:y1, x0:x1] += 1
+            self.assertTrue(ey0 <= y0 and ex0 <= x0 and ey1 >= y1 and ex1 >= x1)
+
+        self.assertTrue(np.all(coverage == 1))
+
+    def test_matches_full_image(self):
+        manager = MainManager(self.config_path)
+        expected = sorted(tuple(d) for d in manager.inspect_array(self.scan))
+
+        result = TiledInspector(manager, tile_size=200).inspect(self.scan)
+
+        self.assertEqual(sorted(tuple(d) for d in result), expected)
+        self.assertEqual(len(expected), 4)
+
+    def test_overlapping_defects_not_fused_across_seam(self):
+        # Marco que cruza la costura x=200 y una mancha distinta dentro del marco que no llega a la
+        # costura pero sí al halo de la tesela vecina, donde solapa con su copia del marco
+        scan = np.full((400, 400), 50, dtype=np.uint8)
+        scan[100:200, 150:260] = 255
+        scan[110:190, 160:250] = 50
+        scan[130:145, 185:198] = 255
+
+        manager = MainManager(self.config_path)
+        expected = sorted(tuple(d) for d in manager.inspect_array(scan))
+        result = TiledInspector(manager, tile_size=200).inspect(scan)
+
+        self.assertEqual(sorted(tuple(d) for d in result), expected)
+        self.assertEqual(len(expected), 2)
+
+    def test_max_results_applies_to_whole_scan(self):
+        with open(self.config_path) as file:
+            config = json.load(file)
+        config["patches_detector"]["params"]["max_results"] = 3
+
+        # Cinco manchas de tamaños distintos en la misma tesela y otra en la tesela vecina
+        scan = np.full((400, 400), 50, dtype=np.uint8)
+        for i, size in enumerate((10, 12, 14, 16, 18)):
+            scan[20 + 35 * i:20 + 35 * i + size, 20:20 + size] = 255
+        scan[300:330, 300:330] = 255
+
+        manager = MainManager(config)
+        expected = [tuple(d) for d in manager.inspect_array(scan)]
+        result = TiledInspector(manager, tile_size=200).inspect(scan)
+
+        self.assertEqual([tuple(d) for d in result], expected)
+        self.assertEqual(len(expected), 3)
+
+    def test_open_scan_memmap(self):
+        path = os.path.join(self.tmp_dir.name, 'scan.npy')
+        np.save(path, self.scan)
+
+        scan = open_scan(path)
+
+        self.assertIsInstance(scan, np.memmap)
+        result = TiledInspector(MainManager(self.config_path), tile_size=256).inspect(scan)
+        self.assertEqual(len(result), 4)
+
+    def test_open_scan_raw_requires_shape(self):
+        path = os.path.join(self.tmp_dir.name, 'scan.raw')
+        self.scan.tofile(path)
+
+        with self.assertRaises(ValueError):
+            open_scan(path)
+        self.assertEqual(open_scan(path, shape=self.scan.shape).shape, self.scan.shape)
+
+
+if __name__ == '__main__':
+    unittest.main()